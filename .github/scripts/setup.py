@@ -15,7 +15,11 @@
 # limitations under the License.
 
 
+import importlib.util
+import os
+
 import setuptools
+from setuptools.command.build_py import build_py
 
 #     π =    3.141592653589793238462643383279502884197169399
 version = "1.3.1415926535897"
@@ -23,6 +27,29 @@ version = "1.3.1415926535897"
 with open("logica/README.md", "r") as f:
   long_description = f.read()
 
+
+class BuildPyWithCppParser(build_py):
+  """Also builds the C++ parser library into the package.
+
+  Building is best effort: without a C++20 compiler the package still
+  installs and Logica uses the Python parser, or builds the library on
+  first use when a compiler is available later.
+  """
+  def run(self):
+    super().run()
+    package_dir = os.path.join(self.build_lib, 'logica', 'parser_cpp')
+    try:
+      spec = importlib.util.spec_from_file_location(
+        'logica_parse_cpp', os.path.join(package_dir, 'logica_parse_cpp.py'))
+      bridge = importlib.util.module_from_spec(spec)
+      spec.loader.exec_module(bridge)
+      bridge.BuildCppParserSharedObject(
+        os.path.join(package_dir, 'logica_parse.cpp'),
+        bridge.PrebuiltLibraryPath(package_dir))
+    except Exception as e:
+      print('Not building C++ parser: %s' % e)
+
+
 setuptools.setup(
   name = "logica",
   version = version,
@@ -36,9 +63,11 @@ setuptools.setup(
   package_data={
     # The release script clones the repo into a `logica/` folder and builds a
     # namespace package, so this package is named `logica.parser_cpp`.
-    # Ship the C++ source so the runtime bridge can build liblogica_parse_cpp.so.
+    # Ship the C++ source so the runtime bridge can check the library built
+    # at install time, or build liblogica_parse_cpp.so itself.
     'logica.parser_cpp': ['logica_parse.cpp'],
   },
+  cmdclass={'build_py': BuildPyWithCppParser},
   classifiers = [
       "Topic :: Database",
       "License :: OSI Approved :: Apache Software License"
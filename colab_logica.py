@@ -18,7 +18,6 @@
 
 from decimal import Decimal
 import getpass
-import io
 import json
 import re
 
@@ -93,6 +92,9 @@ DEFAULT_ENGINE = 'duckdb'
 
 CLINGO_AD_HOC_PROTECTION = True
 
+# Dataframes registered as predicates via DuckdbRunner.Register.
+REGISTERED_TABLES = {}
+
 def SetPreamble(preamble):
   global PREAMBLE
   PREAMBLE = preamble
@@ -223,17 +225,9 @@ def RunSQL(sql, engine, connection=None, is_final=False):
     # For non-final statements we execute raw statements (DDL-safe).
     if is_final:
       try:
-        engine_settings = dict(connection or {})
-        engine_settings['settings'] = dict(engine_settings.get('settings') or {})
-        engine_settings['settings']['output_format_json_named_tuples_as_objects'] = 1
-
-        json_text = clickhouse_logica.RunQuery(
-          sql,
-          output_format='json',
-          engine_settings=engine_settings)
-        if not json_text.strip():
-          return pandas.DataFrame()
-        return pandas.read_json(io.StringIO(json_text), lines=True)
+        header, rows = clickhouse_logica.RunQueryHeaderRows(
+          sql, engine_settings=connection)
+        return pandas.DataFrame(rows, columns=header)
       except clickhouse_logica.ClickHouseQueryError as e:
         print("\n--- SQL ---")
         print(sql)
@@ -271,12 +265,16 @@ class SqliteRunner(object):
 
 
 class DuckdbRunner(object):
-  def __init__(self, logic_program_for_clingo_context=None):
+  def __init__(self, logic_program_for_clingo_context=None,
+               engine_settings=None):
     if logic_program_for_clingo_context:
       self.connection = duckdb_logica.GetConnection(
         logic_program_for_clingo_context)
+      for name, dataframe in REGISTERED_TABLES.items():
+        self.connection.register(name, dataframe)
     else:
       self.connection = self.GetGlobalConnection()
+      duckdb_logica.Configure(self.connection, engine_settings)
 
   def  __call__(self, sql, engine, is_final):
     return RunSQL(sql, engine, self.connection, is_final)
@@ -290,7 +288,8 @@ class DuckdbRunner(object):
   
   @classmethod
   def Register(cls, name, dataframe):
-    DB_CONNECTION.register(name, dataframe)
+    REGISTERED_TABLES[name] = dataframe
+    cls.GetGlobalConnection().register(name, dataframe)
 
 
 class PostgresRunner(object):
@@ -456,7 +455,9 @@ def Logica(line, cell, run_query):
     elif engine == 'psql':
       sql_runner = PostgresRunner()
     elif engine == 'duckdb':
-      if program.NeedsClingo():
+      engine_settings = duckdb_logica.EngineSettings(program)
+      if program.NeedsClingo() or 'database_file' in engine_settings:
+        # Clingo context and database file need a dedicated connection.
         sql_runner = DuckdbRunner(program)
         # Storing connection for debugging.
         global CONNECTION_USED
@@ -464,7 +465,7 @@ def Logica(line, cell, run_query):
       else:
         # Let users set stuff in default connection unless
         # clingo is actually needed.
-        sql_runner = DuckdbRunner()
+        sql_runner = DuckdbRunner(engine_settings=engine_settings)
     elif engine == 'bigquery':
       EnsureAuthenticatedUser()
       sql_runner = RunSQL
@@ -556,6 +557,5 @@ colab_logica.SetDbConnection(connection)
 def UseCppParser():
   os.environ['LOGICA_PARSER'] = 'CPP'
   from .parser_cpp import logica_parse_cpp  # type: ignore
-  so_path = logica_parse_cpp.EnsureCppParserSharedObject()
-  logica_parse_cpp.LoadCppParserLib()
-  return so_path
+  lib = logica_parse_cpp.LoadCppParserLib()
+  return lib._name
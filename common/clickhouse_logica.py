@@ -31,13 +31,18 @@ Environment variables:
 from __future__ import annotations
 
 import csv
+import datetime
+import decimal
 import io
+import ipaddress
 import os
 import re
 import base64
+import struct
 import urllib.parse
 import urllib.request
 import urllib.error
+import uuid
 
 if '.' not in __package__:
   from common import sqlite3_logica
@@ -134,23 +139,14 @@ class Connection(object):
     return HttpRequest(sql, settings=self.settings)
 
   def RunQueryHeaderRows(self, sql):
-    body = HttpQuery(sql, settings=self.settings, fmt='TabSeparatedWithNames')
-    if not body.strip():
-      return [], []
-    reader = csv.reader(io.StringIO(body), delimiter='\t')
-    try:
-      header = next(reader)
-    except StopIteration:
-      return [], []
-    rows = [row for row in reader]
-    return header, rows
+    return HeaderRowsFromSettings(sql, self.settings)
 
   def RunQuery(self, sql, output_format='pretty'):
     if output_format == 'csv':
       return HttpQuery(sql, settings=self.settings, fmt='CSVWithNames')
     if output_format == 'json':
       return HttpQuery(sql, settings=self.settings, fmt='JSONEachRow')
-    (header, rows) = self.RunQueryHeaderRows(sql)
+    (header, rows) = HeaderTextRowsFromSettings(sql, self.settings)
     if not header and not rows:
       return ''
     return sqlite3_logica.ArtisticTable(header, rows)
@@ -180,6 +176,12 @@ def ClickHouseConnect(logic_program_or_engine_settings=None):
 
 
 def HttpRequest(sql, *, settings):
+  with HttpOpen(sql, settings=settings) as resp:
+    return resp.read().decode('utf-8', errors='replace')
+
+
+def HttpOpen(sql, *, settings):
+  """Sends the query and returns the HTTP response to read the body from."""
   # Use POST to avoid URL length limits (compiled SQL can be large).
   params = {'database': settings['database']}
   for k, v in (settings.get('settings') or {}).items():
@@ -210,8 +212,7 @@ def HttpRequest(sql, *, settings):
   req.add_header('Content-Type', 'text/plain; charset=utf-8')
 
   try:
-    with urllib.request.urlopen(req, timeout=30) as resp:
-      return resp.read().decode('utf-8', errors='replace')
+    return urllib.request.urlopen(req, timeout=30)
   except urllib.error.HTTPError as e:
     # ClickHouse sometimes returns query errors with HTTP status codes like
     # 404 and a useful plain-text body. Surface that body to the user.
@@ -248,8 +249,30 @@ def RunStatement(sql, *, engine_settings=None):
 
 
 def RunQueryHeaderRows(sql, *, engine_settings=None):
-  """Run a query and return (header, rows) for Concertina runners."""
+  """Run a query and return (header, rows) for Concertina runners.
+
+  Values are decoded from RowBinary, so they come with their Python types.
+  """
   settings = GetConnectionSettings(engine_settings)
+  return HeaderRowsFromSettings(sql, settings)
+
+
+def HeaderRowsFromSettings(sql, settings):
+  if FORMAT_RE.search(sql):
+    # User chose the format, so we can only give back the text.
+    return HeaderTextRowsFromSettings(sql, settings)
+  binary_sql = sql.rstrip().rstrip(';') + ' FORMAT RowBinaryWithNamesAndTypes'
+  with HttpOpen(binary_sql, settings=settings) as resp:
+    try:
+      return DecodeRowBinary(io.BufferedReader(resp, buffer_size=1 << 16))
+    except UnsupportedBinaryTypeError:
+      pass
+  # Results of this query have types we can't decode, falling back to text.
+  return HeaderTextRowsFromSettings(sql, settings)
+
+
+def HeaderTextRowsFromSettings(sql, settings):
+  """Run a query and return (header, rows) with values as strings."""
   body = HttpQuery(sql, settings=settings, fmt='TabSeparatedWithNames')
   if not body.strip():
     return [], []
@@ -274,7 +297,210 @@ def RunQuery(sql, output_format='pretty', engine_settings=None):
     return HttpQuery(sql, settings=settings, fmt='JSONEachRow')
 
   # pretty / artistictable
-  (header, rows) = RunQueryHeaderRows(sql, engine_settings=engine_settings)
+  (header, rows) = HeaderTextRowsFromSettings(sql, settings)
   if not header and not rows:
     return ''
   return sqlite3_logica.ArtisticTable(header, rows)
+
+
+class UnsupportedBinaryTypeError(Exception):
+  """Raised when RowBinary values of a ClickHouse type can not be decoded."""
+
+
+class RowBinaryReader(object):
+  """Reads primitive values of RowBinary format from a buffered stream."""
+
+  def __init__(self, stream):
+    self.stream = stream
+
+  def Read(self, n):
+    data = self.stream.read(n)
+    while len(data) < n:
+      chunk = self.stream.read(n - len(data))
+      if not chunk:
+        raise ClickHouseQueryError(
+            'Unexpected end of RowBinary response from ClickHouse.')
+      data += chunk
+    return data
+
+  def AtEnd(self):
+    return not self.stream.peek(1)
+
+  def ReadVarUInt(self):
+    result = 0
+    shift = 0
+    while True:
+      byte = self.Read(1)[0]
+      result |= (byte & 0x7f) << shift
+      if byte < 0x80:
+        return result
+      shift += 7
+
+  def ReadString(self):
+    return self.Read(self.ReadVarUInt()).decode('utf-8', errors='replace')
+
+
+def SplitTypeArguments(arguments):
+  """Splits 'A, B(C, D), E' into ['A', 'B(C, D)', 'E']."""
+  result = []
+  depth = 0
+  quoted = False
+  start = 0
+  for i, c in enumerate(arguments):
+    if c == "'" and (i == 0 or arguments[i - 1] != '\\'):
+      quoted = not quoted
+    elif quoted:
+      continue
+    elif c == '(':
+      depth += 1
+    elif c == ')':
+      depth -= 1
+    elif c == ',' and depth == 0:
+      result.append(arguments[start:i].strip())
+      start = i + 1
+  result.append(arguments[start:].strip())
+  return [r for r in result if r]
+
+
+FIXED_SIZE_FORMATS = {
+    'Int8': '<b', 'UInt8': '<B', 'Int16': '<h', 'UInt16': '<H',
+    'Int32': '<i', 'UInt32': '<I', 'Int64': '<q', 'UInt64': '<Q',
+    'Float32': '<f', 'Float64': '<d'
+}
+
+WIDE_INTEGER_SIZES = {
+    'Int128': (16, True), 'UInt128': (16, False),
+    'Int256': (32, True), 'UInt256': (32, False)
+}
+
+NAMED_TUPLE_ELEMENT_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*|`[^`]+`) (.+)$')
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+EPOCH_DATETIME = datetime.datetime(1970, 1, 1)
+
+
+def RowBinaryDecoder(type_name):
+  """Returns a function reading a value of the given type from a reader."""
+  type_name = type_name.strip()
+  if '(' in type_name:
+    constructor = type_name[:type_name.index('(')]
+    arguments = SplitTypeArguments(
+        type_name[type_name.index('(') + 1:type_name.rindex(')')])
+  else:
+    constructor = type_name
+    arguments = []
+
+  if constructor in FIXED_SIZE_FORMATS:
+    packer = struct.Struct(FIXED_SIZE_FORMATS[constructor])
+    return lambda reader: packer.unpack(reader.Read(packer.size))[0]
+  if constructor in WIDE_INTEGER_SIZES:
+    size, signed = WIDE_INTEGER_SIZES[constructor]
+    return lambda reader: int.from_bytes(reader.Read(size), 'little',
+                                         signed=signed)
+  if constructor == 'Bool':
+    return lambda reader: reader.Read(1) != b'\x00'
+  if constructor == 'String':
+    return lambda reader: reader.ReadString()
+  if constructor == 'FixedString':
+    size = int(arguments[0])
+    return lambda reader: reader.Read(size).decode(
+        'utf-8', errors='replace').rstrip('\x00')
+  if constructor in ('Date', 'Date32'):
+    days = RowBinaryDecoder('UInt16' if constructor == 'Date' else 'Int32')
+    return lambda reader: EPOCH_DATE + datetime.timedelta(days=days(reader))
+  if constructor == 'DateTime':
+    seconds = RowBinaryDecoder('UInt32')
+    return lambda reader: EPOCH_DATETIME + datetime.timedelta(
+        seconds=seconds(reader))
+  if constructor == 'DateTime64':
+    precision = int(arguments[0])
+    ticks = RowBinaryDecoder('Int64')
+    return lambda reader: EPOCH_DATETIME + datetime.timedelta(
+        microseconds=ticks(reader) * 10 ** 6 / 10 ** precision)
+  if constructor.startswith('Decimal'):
+    if constructor == 'Decimal':
+      precision, scale = int(arguments[0]), int(arguments[1])
+    else:
+      precision = {'Decimal32': 9, 'Decimal64': 18,
+                   'Decimal128': 38, 'Decimal256': 76}[constructor]
+      scale = int(arguments[0])
+    size = 4 if precision <= 9 else 8 if precision <= 18 else (
+        16 if precision <= 38 else 32)
+    return lambda reader: decimal.Decimal(
+        int.from_bytes(reader.Read(size), 'little', signed=True)
+    ).scaleb(-scale)
+  if constructor == 'UUID':
+    def ReadUuid(reader):
+      high, low = struct.unpack('<QQ', reader.Read(16))
+      return uuid.UUID(int=(high << 64) | low)
+    return ReadUuid
+  if constructor == 'IPv4':
+    address = RowBinaryDecoder('UInt32')
+    return lambda reader: ipaddress.IPv4Address(address(reader))
+  if constructor == 'IPv6':
+    return lambda reader: ipaddress.IPv6Address(reader.Read(16))
+  if constructor in ('Enum8', 'Enum16'):
+    names = {}
+    for a in arguments:
+      name, value = a.rsplit('=', 1)
+      names[int(value)] = name.strip().strip("'")
+    code = RowBinaryDecoder('Int8' if constructor == 'Enum8' else 'Int16')
+    return lambda reader: names[code(reader)]
+  if constructor == 'Nullable':
+    element = RowBinaryDecoder(arguments[0])
+    return lambda reader: None if reader.Read(1) != b'\x00' else (
+        element(reader))
+  if constructor == 'LowCardinality':
+    return RowBinaryDecoder(arguments[0])
+  if constructor == 'SimpleAggregateFunction':
+    return RowBinaryDecoder(arguments[1])
+  if constructor == 'Array':
+    element = RowBinaryDecoder(arguments[0])
+    return lambda reader: [element(reader)
+                           for _ in range(reader.ReadVarUInt())]
+  if constructor == 'Map':
+    key = RowBinaryDecoder(arguments[0])
+    value = RowBinaryDecoder(arguments[1])
+    def ReadMap(reader):
+      result = {}
+      for _ in range(reader.ReadVarUInt()):
+        k = key(reader)
+        result[k] = value(reader)
+      return result
+    return ReadMap
+  if constructor == 'Tuple':
+    named_elements = [NAMED_TUPLE_ELEMENT_RE.match(a) for a in arguments]
+    if all(named_elements):
+      # Named tuples are how Logica records are stored, so they come back
+      # as dictionaries.
+      fields = [(m.group(1).strip('`'), RowBinaryDecoder(m.group(2)))
+                for m in named_elements]
+      return lambda reader: {f: decode(reader) for f, decode in fields}
+    elements = [RowBinaryDecoder(a) for a in arguments]
+    return lambda reader: tuple(decode(reader) for decode in elements)
+  raise UnsupportedBinaryTypeError(type_name)
+
+
+def DecodeRowBinary(stream):
+  """Decodes RowBinaryWithNamesAndTypes stream into (header, rows).
+
+  Rows are decoded one at a time as the stream is read, so the whole
+  response is never held in memory as bytes or text.
+  """
+  reader = RowBinaryReader(stream)
+  if reader.AtEnd():
+    return [], []
+  num_columns = reader.ReadVarUInt()
+  header = [reader.ReadString() for _ in range(num_columns)]
+  decoders = [RowBinaryDecoder(reader.ReadString())
+              for _ in range(num_columns)]
+  rows = []
+  try:
+    while not reader.AtEnd():
+      rows.append([decode(reader) for decode in decoders])
+  except (struct.error, KeyError, ValueError) as e:
+    # ClickHouse reports errors that happen mid-stream by writing the
+    # message into the body.
+    raise ClickHouseQueryError(
+        'Could not decode RowBinary response from ClickHouse: %s' % e)
+  return header, rows
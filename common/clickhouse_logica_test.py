@@ -0,0 +1,78 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unitests for RowBinary decoding in clickhouse_logica.py."""
+
+import datetime
+import decimal
+import io
+import struct
+import unittest
+
+from common import clickhouse_logica
+
+
+def VarString(s):
+  data = s.encode('utf-8')
+  return bytes([len(data)]) + data
+
+
+def Response(names, types, row_bytes):
+  return io.BufferedReader(io.BytesIO(
+      bytes([len(names)]) +
+      b''.join(VarString(n) for n in names) +
+      b''.join(VarString(t) for t in types) +
+      row_bytes))
+
+
+class ClickHouseLogicaTest(unittest.TestCase):
+  def test_Scalars(self):
+    header, rows = clickhouse_logica.DecodeRowBinary(Response(
+        ['item', 'quantity', 'price', 'day'],
+        ['String', 'Int64', 'Float64', 'Date'],
+        VarString('Soap') + struct.pack('<qdH', 20, 3.5, 1) +
+        VarString('Milk') + struct.pack('<qdH', -1, 0.25, 0)))
+    self.assertEqual(header, ['item', 'quantity', 'price', 'day'])
+    self.assertEqual(rows, [
+        ['Soap', 20, 3.5, datetime.date(1970, 1, 2)],
+        ['Milk', -1, 0.25, datetime.date(1970, 1, 1)]])
+
+  def test_Composites(self):
+    header, rows = clickhouse_logica.DecodeRowBinary(Response(
+        ['r', 'a', 'n', 'd'],
+        ['Tuple(name String, size UInt8)', 'Array(Nullable(Int32))',
+         'LowCardinality(Nullable(String))', 'Decimal(9, 2)'],
+        VarString('x') + b'\x07' +
+        b'\x02' + b'\x01' + b'\x00' + struct.pack('<i', 5) +
+        b'\x00' + VarString('y') +
+        struct.pack('<i', 1234)))
+    self.assertEqual(rows, [[
+        {'name': 'x', 'size': 7}, [None, 5], 'y',
+        decimal.Decimal('12.34')]])
+
+  def test_Empty(self):
+    self.assertEqual(
+        clickhouse_logica.DecodeRowBinary(
+            io.BufferedReader(io.BytesIO(b''))),
+        ([], []))
+
+  def test_UnsupportedType(self):
+    with self.assertRaises(clickhouse_logica.UnsupportedBinaryTypeError):
+      clickhouse_logica.RowBinaryDecoder('AggregateFunction(uniq, UInt64)')
+
+
+if __name__ == '__main__':
+  unittest.main()
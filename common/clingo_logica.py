@@ -14,6 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import threading
+
 
 SUPPORTED_PREDICATES = [
     '=', '<', '>', '<=', '>=', '!=', '+', '-', '*', '/', '%',
@@ -227,32 +230,136 @@ def RenderVariable(v):
   return v['var_name'].upper()
 
 
+####################
+# Clingo sessions.
+
+# Number of grounded programs kept for reuse.
+CLINGO_SESSION_CACHE_SIZE = 16
+# Largest number of facts that a session accumulates from calls.
+CLINGO_SESSION_MAX_FACTS = 10000
+
+
+class ClingoSession(object):
+  """Program grounded once and solved many times for different facts.
+
+  Facts are declared as free externals of the base program, so each call
+  solves the same ground program with assumptions selecting its facts,
+  instead of adding and grounding the whole program again. Every solve
+  assumes values of all the externals, so that facts of one call never leak
+  into another. Solving configuration is fixed when the session is created.
+  """
+
+  def __init__(self, program, facts, configuration):
+    import clingo
+    self.lock = threading.Lock()
+    self.facts = frozenset(facts)
+    self.control = clingo.Control()
+    for key, value in configuration:
+      setattr(self.control.configuration.solve, key, value)
+    self.control.add('base', [], '\n'.join(
+        [program] + ['#external %s. [free]' % f for f in sorted(self.facts)]))
+    self.control.ground([('base', [])])
+    self.symbols = {f: clingo.parse_term(f) for f in self.facts}
+
+  def Covers(self, facts):
+    return self.facts.issuperset(facts)
+
+  def Assumptions(self, facts):
+    facts = set(facts)
+    return [(symbol, fact in facts) for fact, symbol in self.symbols.items()]
+
+
+CLINGO_SESSIONS = collections.OrderedDict()
+CLINGO_SESSIONS_LOCK = threading.Lock()
+
+
+def SolveConfiguration(models, clingo_settings, opt_mode=None):
+  """Solve configuration of Clingo for the settings, as a hashable tuple."""
+  threads = clingo_settings.get('threads', 1)
+  assert isinstance(threads, int) and threads > 0, (
+      'Clingo threads must be a positive integer, got: %s' % threads)
+  configuration = [('models', str(models)), ('parallel_mode', str(threads))]
+  if opt_mode:
+    configuration.append(('opt_mode', opt_mode))
+  return tuple(configuration)
+
+
+def GetClingoSession(program, facts=(), configuration=()):
+  """Returns session for the program that can solve it with given facts.
+
+  Sessions are shared by calls with the same program and configuration.
+  Clingo does not instantiate rules of a grounded part for atoms of parts
+  grounded later, so facts can not be added to a session. Instead a session
+  lacking facts of the call is replaced by one grounded for facts of both,
+  and calls with facts of any of the earlier calls reuse it. Up to
+  CLINGO_SESSION_MAX_FACTS are accumulated.
+  """
+  key = (program, configuration)
+  facts = frozenset(facts)
+  with CLINGO_SESSIONS_LOCK:
+    session = CLINGO_SESSIONS.get(key)
+    if session is not None and session.Covers(facts):
+      CLINGO_SESSIONS.move_to_end(key)
+      return session
+    if (session is not None and
+        len(session.facts | facts) <= CLINGO_SESSION_MAX_FACTS):
+      facts = session.facts | facts
+  # Grounding happens outside of the lock, other programs can be served.
+  session = ClingoSession(program, facts, configuration)
+  with CLINGO_SESSIONS_LOCK:
+    CLINGO_SESSIONS[key] = session
+    CLINGO_SESSIONS.move_to_end(key)
+    while len(CLINGO_SESSIONS) > CLINGO_SESSION_CACHE_SIZE:
+      CLINGO_SESSIONS.popitem(last=False)
+  return session
+
+
 ####################
 # Running Clingo.
 
-def RunClingo(program, clingo_settings=None):
-  """Running program on clingo, returning models."""
-  import clingo
-  import json
+def RunClingo(program, clingo_settings=None, facts=None):
+  """Running program on clingo, returning models.
+
+  Facts are given as atoms without the final dot, e.g. 'edge(1,2)'. Program
+  is grounded once for the session and reused when called with other facts.
+  """
+  return list(IterateClingoModels(program, clingo_settings, facts))
+
+
+def IterateClingoModels(program, clingo_settings=None, facts=None):
+  """Yields models of the program as Clingo finds them."""
   clingo_settings = clingo_settings or {}
+  facts = facts or []
   assert set(clingo_settings.keys()) <= {'models_limit', 'time_limit',
-                                         'models_limit_soft'}, (
+                                         'models_limit_soft', 'threads'}, (
       'Unexpected clingo settings:' + str(clingo_settings))
-  ctl = clingo.Control()
-  ctl.add("base", [], program)
+  configuration = SolveConfiguration(
+      clingo_settings.get('models_limit', -1) + 1, clingo_settings)
+  session = GetClingoSession(program, facts, configuration)
+  if not session.lock.acquire(blocking=False):
+    # Models of the session are being iterated by a caller that may never
+    # finish, so this call solves on its own.
+    session = ClingoSession(program, facts, configuration)
+    session.lock.acquire()
+  try:
+    yield from SolveClingoSession(session, program, facts, clingo_settings)
+  finally:
+    session.lock.release()
+
+
+def SolveClingoSession(session, program, facts, clingo_settings):
+  """Solves session program for the facts, yielding models."""
+  import json
+  ctl = session.control
   models_limit = clingo_settings.get('models_limit', -1)
   time_limit = clingo_settings.get('time_limit', -1)
   models_limit_soft = clingo_settings.get('models_limit_soft', False)
-  ctl.configuration.solve.models = models_limit + 1
-  if False:
-    ctl.configuration.solve.opt_mode = 'opt'
-  ctl.ground([("base", [])])
-  result = []
-  with ctl.solve(yield_=True, async_=True) as handle:
+  with ctl.solve(yield_=True, async_=True,
+                 assumptions=session.Assumptions(facts)) as handle:
     completed_computation = handle.wait(time_limit)
     if not completed_computation:
       print('Clingo program:')
-      print(program)
+      print(ProgramWithFacts(program, facts))
       print('[ \033[91m Timeout \033[0m ] Clingo timed out.')
       print('\033[1m For settings\033[0m:')
       print(clingo_settings)
@@ -260,39 +367,48 @@ def RunClingo(program, clingo_settings=None):
     import itertools  # Too much glory for a tool to import on top!
     first_model = handle.model()
     if not first_model:
-      return []
+      return
     for model_id, model in enumerate(
         itertools.chain([first_model], handle)):
+      if models_limit > 0:
+        assert model_id <= models_limit, 'This should never happen!'
+      if (models_limit > 0 and model_id == models_limit and
+          not models_limit_soft):
+        print('Clingo program:')
+        print(ProgramWithFacts(program, facts))
+        print('[ \033[91m Model limit exceeded \033[0m ] Clingo has too many models.')
+        print('\033[1m For settings\033[0m:')
+        print(clingo_settings)
+        assert False, 'Combinatorial explosion.'
       entry = []
       for s in model.symbols(atoms=True):
         entry.append({'predicate': Pascalize(s.name),
                       'args': [str(json.loads(str(a))) for 
                                a in s.arguments]})
-      result.append({'model': entry, 'model_id': model_id})
-    if models_limit > 0:
-      assert len(result) <= models_limit + 1, 'This should never happen!'
-    if models_limit > 0 and len(result) > models_limit and not models_limit_soft:
-      print('Clingo program:')
-      print(program)
-      print('[ \033[91m Model limit exceeded \033[0m ] Clingo has too many models.')
-      print('\033[1m For settings\033[0m:')
-      print(clingo_settings)
-      assert False, 'Combinatorial explosion.'
+      yield {'model': entry, 'model_id': model_id}
 
-  return result
+
+def ProgramWithFacts(program, facts):
+  """Renders program with facts the way it is solved."""
+  return '\n'.join([f + '.' for f in facts] + [program])
 
 #############################
 # Rendering clingo models.
 
-def RenderKlingonCall(c, from_logica=False):
-  """Renders a Klingon call."""
+def RenderKlingonAtom(c, from_logica=False):
+  """Renders a Klingon call as an atom."""
   def RenderArgs(args):
     return ','.join(args)
   def RenderPredicate(p):
     if from_logica:
       return Snakify(p)
     return p
-  return RenderPredicate(c['predicate']) + '(' + RenderArgs(c['args']) + ').'
+  return RenderPredicate(c['predicate']) + '(' + RenderArgs(c['args']) + ')'
+
+
+def RenderKlingonCall(c, from_logica=False):
+  """Renders a Klingon call."""
+  return RenderKlingonAtom(c, from_logica=from_logica) + '.'
 
 
 def RenderKlingonModel(calls, from_logica=False):
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unitests for Clingo sessions in clingo_logica.py."""
+
+import unittest
+from unittest import mock
+
+import duckdb
+
+from common import clingo_logica
+from common import duckdb_logica
+from common import logica_lib
+
+PROGRAM = 'b :- f(1). {c; d}.'
+
+
+def Models(models):
+  return sorted(
+      sorted('%s(%s)' % (a['predicate'], ','.join(a['args']))
+             for a in m['model'])
+      for m in models)
+
+
+class ClingoSessionTest(unittest.TestCase):
+  def setUp(self):
+    clingo_logica.CLINGO_SESSIONS.clear()
+
+  def test_SessionIsReusedForCoveredFacts(self):
+    configuration = clingo_logica.SolveConfiguration(0, {})
+    session = clingo_logica.GetClingoSession(PROGRAM, ['f(1)', 'f(2)'],
+                                             configuration)
+    self.assertIs(
+        clingo_logica.GetClingoSession(PROGRAM, ['f(2)'], configuration),
+        session)
+    self.assertIs(clingo_logica.GetClingoSession(PROGRAM, [], configuration),
+                  session)
+    self.assertIsNot(
+        clingo_logica.GetClingoSession(
+            PROGRAM, [], clingo_logica.SolveConfiguration(1, {})),
+        session)
+
+  def test_SessionIsGroundedForFactsOfEarlierCalls(self):
+    groundings = []
+    class CountingSession(clingo_logica.ClingoSession):
+      def __init__(self, program, facts, configuration):
+        groundings.append(sorted(facts))
+        super().__init__(program, facts, configuration)
+    with mock.patch.object(clingo_logica, 'ClingoSession', CountingSession):
+      for _ in range(3):
+        for fact in ['f(1)', 'f(2)', 'f(3)']:
+          models = clingo_logica.RunClingo(PROGRAM, facts=[fact])
+          self.assertEqual(len(models), 4)
+          self.assertEqual('B()' in Models(models)[0], fact == 'f(1)')
+    self.assertEqual(groundings, [['f(1)'], ['f(1)', 'f(2)'],
+                                  ['f(1)', 'f(2)', 'f(3)']])
+
+  def test_AbandonedIterationDoesNotBlockOtherCalls(self):
+    models = clingo_logica.IterateClingoModels(PROGRAM, facts=['f(1)'])
+    next(models)
+    self.assertEqual(len(clingo_logica.RunClingo(PROGRAM, facts=['f(1)'])),
+                     4)
+    models.close()
+    session = clingo_logica.GetClingoSession(
+        PROGRAM, ['f(1)'], clingo_logica.SolveConfiguration(0, {}))
+    self.assertFalse(session.lock.locked())
+
+  def test_FactsOfCallsAreIsolated(self):
+    with_fact = clingo_logica.RunClingo(PROGRAM, facts=['f(1)'])
+    self.assertEqual(Models(with_fact), [
+        ['B()', 'C()', 'D()', 'F(1)'], ['B()', 'C()', 'F(1)'],
+        ['B()', 'D()', 'F(1)'], ['B()', 'F(1)']])
+    self.assertEqual(Models(clingo_logica.RunClingo(PROGRAM)),
+                     [[], ['C()'], ['C()', 'D()'], ['D()']])
+    self.assertEqual(
+        Models(clingo_logica.RunClingo(PROGRAM, facts=['f(1)'])),
+        Models(with_fact))
+
+  def test_DuckDBFunctionDoesNotSeeFactsOfOtherCalls(self):
+    connection = duckdb.connect()
+    duckdb_logica.ConnectClingo(connection)
+    query = 'SELECT len(RunClingo(?))'
+    self.assertEqual(connection.execute(query, ['b :- f(1).']).fetchone(),
+                     (1,))
+    clingo_logica.RunClingo('b :- f(1).', facts=['f(1)'])
+    self.assertEqual(connection.execute(query, ['b :- f(1).']).fetchone(),
+                     (1,))
+
+  def test_SettingsOfCallsAreIsolated(self):
+    connection = duckdb.connect()
+    duckdb_logica.ConnectClingo(connection, default_num_models=1)
+    query = 'SELECT len(RunClingo(?))'
+    self.assertEqual(connection.execute(query, [PROGRAM]).fetchone(), (1,))
+    self.assertEqual(len(clingo_logica.RunClingo(PROGRAM)), 4)
+    self.assertEqual(
+        len(clingo_logica.RunClingo(PROGRAM, {'models_limit': 2,
+                                              'models_limit_soft': True})),
+        3)
+    self.assertEqual(connection.execute(query, [PROGRAM]).fetchone(), (1,))
+
+  def test_ModelsAreIteratedWithThreads(self):
+    models = list(clingo_logica.IterateClingoModels(PROGRAM, {'threads': 2}))
+    self.assertEqual(Models(models), Models(clingo_logica.RunClingo(PROGRAM)))
+    self.assertEqual(sorted(m['model_id'] for m in models), [0, 1, 2, 3])
+
+  def test_ModelsAreStreamedToPrograms(self):
+    reader = duckdb_logica.ClingoModelsReader(PROGRAM, {'threads': 2},
+                                              facts=['f(1)'], batch_size=3)
+    result = logica_lib.RunPredicateFromString(
+        '@Engine("duckdb");\n'
+        'Q(model_id:, atoms: Size(model)) :- Models(model_id:, model:);',
+        'Q', tables={'Models': reader})
+    self.assertEqual(sorted(result['model_id']), [0, 1, 2, 3])
+    self.assertEqual(sorted(result['atoms']), [2, 3, 3, 4])
+
+
+if __name__ == '__main__':
+  unittest.main()
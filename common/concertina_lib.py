@@ -26,13 +26,14 @@ else:
 class ConcertinaQueryEngine(object):
   def __init__(self, final_predicates, sql_runner,
                print_running_predicate=True,
-               observer=None):
+               observer=None, statistics_recorder=None):
     self.final_predicates = final_predicates
     self.final_result = {}
     self.sql_runner = sql_runner
     self.print_running_predicate = print_running_predicate
     self.completion_time = {}
     self.observer = observer
+    self.statistics_recorder = statistics_recorder
 
   def Run(self, action):
     assert action['launcher'] in ('query', 'none')
@@ -51,6 +52,8 @@ class ConcertinaQueryEngine(object):
         self.final_result[predicate] = result
         if self.observer:
           self.observer.ObserveTable(predicate, result)
+      elif self.statistics_recorder:
+        self.statistics_recorder(predicate)
 
 
 class ConcertinaDryRunEngine(object):
@@ -553,10 +556,17 @@ def ExecuteLogicaProgram(logica_executions, sql_runner, sql_engine,
                             data_dependency_edges,
                             final_predicates)
  
+  def RecordTableStatistics(predicate):
+    connection = getattr(sql_runner, 'connection', None)
+    for e in logica_executions:
+      if predicate in e.table_to_export_map:
+        e.RecordTableStatistics(predicate, connection)
+        return
+
   engine = ConcertinaQueryEngine(
       final_predicates=final_predicates, sql_runner=sql_runner,
       print_running_predicate=(display_mode == 'colab'),
-      observer=observer)
+      observer=observer, statistics_recorder=RecordTableStatistics)
 
   preambles = set(e.preamble for e in logica_executions)
   # Due to change of types from predicate to predicate preables are not
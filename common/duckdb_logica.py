@@ -39,9 +39,55 @@ display_style = ';'.join([
 display_id_counter = 0
 
 
-def GetConnection(logica_program=None):
+# Settings of @Engine("duckdb", ...) that are passed to DuckDB as the
+# configuration of the connection.
+CONNECTION_CONFIG_SETTINGS = [
+    'threads', 'memory_limit', 'temp_directory', 'max_temp_directory_size',
+    'preserve_insertion_order']
+
+
+def EngineSettings(logica_program):
+  """Returns arguments of @Engine("duckdb", ...) annotation of the program."""
+  a = logica_program.annotations.annotations
+  return a.get('@Engine', {}).get('duckdb', {})
+
+
+def ConnectionConfig(engine_settings):
+  engine_settings = engine_settings or {}
+  return {k: engine_settings[k]
+          for k in CONNECTION_CONFIG_SETTINGS
+          if k in engine_settings}
+
+
+def Connect(engine_settings=None):
+  """Connects to DuckDB as requested by the engine settings.
+
+  If database_file is given, then the database is persisted to this file and
+  grounded tables survive between runs. Otherwise in-memory database is used.
+  """
   import duckdb
-  connection = duckdb.connect()
+  engine_settings = engine_settings or {}
+  database = engine_settings.get('database_file', ':memory:')
+  return duckdb.connect(database, config=ConnectionConfig(engine_settings))
+
+
+def SqlSettingValue(value):
+  if isinstance(value, bool):
+    return 'true' if value else 'false'
+  if isinstance(value, (int, float)):
+    return str(value)
+  return "'%s'" % str(value).replace("'", "''")
+
+
+def Configure(connection, engine_settings):
+  """Applies engine settings to an already existing connection."""
+  for k, v in ConnectionConfig(engine_settings).items():
+    connection.execute('SET %s = %s' % (k, SqlSettingValue(v)))
+
+
+def GetConnection(logica_program=None):
+  engine_settings = EngineSettings(logica_program) if logica_program else {}
+  connection = Connect(engine_settings)
   if logica_program:
     a = logica_program.annotations.annotations
     clingo_settings = a.get('@Engine', {}).get('duckdb', {}).get('clingo', False)
@@ -57,6 +103,38 @@ def GetConnection(logica_program=None):
   return connection
 
 
+# Number of models in each batch streamed to DuckDB.
+CLINGO_MODELS_BATCH_SIZE = 1000
+
+
+def ClingoModelsReader(program, clingo_settings=None, facts=None,
+                       batch_size=CLINGO_MODELS_BATCH_SIZE):
+  """Returns Arrow reader streaming models of the program in batches.
+
+  Rows have the same model and model_id columns as elements of the list
+  returned by RunClingo. Models are solved as DuckDB reads the batches, so
+  they are never all kept in memory. Pass the reader as a table of
+  logica_lib.RunPredicateToPandas to make it a predicate of the program.
+  The reader can be scanned once.
+  """
+  import pyarrow
+  atom_type = pyarrow.struct([('predicate', pyarrow.string()),
+                              ('args', pyarrow.list_(pyarrow.string()))])
+  schema = pyarrow.schema([('model', pyarrow.list_(atom_type)),
+                           ('model_id', pyarrow.int64())])
+  def Batches():
+    batch = []
+    for model in clingo_logica.IterateClingoModels(
+        program, clingo_settings, facts):
+      batch.append(model)
+      if len(batch) == batch_size:
+        yield pyarrow.RecordBatch.from_pylist(batch, schema=schema)
+        batch = []
+    if batch:
+      yield pyarrow.RecordBatch.from_pylist(batch, schema=schema)
+  return pyarrow.RecordBatchReader.from_batches(schema, Batches())
+
+
 def ConnectClingo(connection,
                   display_code=False,
                   default_num_models=0,
@@ -65,7 +143,6 @@ def ConnectClingo(connection,
                   logica_program=None,
                   clingo_settings=None,
                   debug_printing=False):
-  import clingo
   import duckdb
   from IPython.display import HTML
   from IPython.display import display
@@ -81,19 +158,21 @@ def ConnectClingo(connection,
                               'value': str}))
 
   def RunClingo(program: str) -> list_of_models_type:
-    # Создаем контроллер и загружаем программу.
-    ctl = clingo.Control()
-    ctl.add("base", [], program)
-    ctl.configuration.solve.models = default_num_models
-    if default_opt_mode:
-      ctl.configuration.solve.opt_mode = default_opt_mode
+    # Берем сессию, где программа уже "заземлена" (подготовлена к решению).
+    session = clingo_logica.GetClingoSession(program,
+                                             configuration=configuration)
+    with session.lock:
+      return SolveSession(session)
 
-    # Просим Clingo "заземлить" правила (подготовить к решению).
-    ctl.ground([("base", [])])
+  configuration = clingo_logica.SolveConfiguration(
+      default_num_models, clingo_settings or {}, opt_mode=default_opt_mode)
 
+  def SolveSession(session):
+    ctl = session.control
     # Решаем и выводим результат.
     result = []
-    with ctl.solve(yield_=True) as handle:
+    with ctl.solve(yield_=True,
+                   assumptions=session.Assumptions([])) as handle:
       for model_id, model in enumerate(handle):
         entry = []
         for s in model.symbols(atoms=True):
@@ -168,8 +247,8 @@ def ConnectClingo(connection,
       pass
   connection.create_function('RunClingoFileTemplate', RunClingoFileTemplate)
 
-  def CompileClingo(predicates: duckdb.list_type(str),
-                    within_model: model_type) -> str:
+  def CompileClingoParts(predicates, within_model):
+    """Returns facts of the model and program of the predicates."""
     if logica_program:
       for p in predicates:
         if p not in logica_program.functors.args_of:
@@ -188,11 +267,16 @@ def ConnectClingo(connection,
             print('This is required to avoid debugging caused by forgotten ')
             print('predicates.')
             assert False, 'Your happiness is my priority.'
-    context = '\n'.join(clingo_logica.RenderKlingonModel(
-        within_model, from_logica=True))
+    facts = [clingo_logica.RenderKlingonAtom(c, from_logica=True)
+             for c in within_model]
     program = clingo_logica.Klingon(logical_context, predicates)
-    full_program = context + '\n' + program
-    return full_program
+    return facts, program
+
+  def CompileClingo(predicates: duckdb.list_type(str),
+                    within_model: model_type) -> str:
+    facts, program = CompileClingoParts(predicates, within_model)
+    return clingo_logica.ProgramWithFacts(program, facts)
+
   try:
       connection.remove_function('CompileClingo')
   except:
@@ -201,13 +285,15 @@ def ConnectClingo(connection,
 
   def Clingo(predicates: duckdb.list_type(str),
              within_model: model_type) -> list_of_models_type:
-    full_program = CompileClingo(predicates, within_model)
+    # Rules are grounded once per session, facts of the model vary per call.
+    facts, program = CompileClingoParts(predicates, within_model)
     if debug_printing:
       print('=== Running Clingo ===')
       print('Predicates:', predicates)
       print('Within model:', within_model)
-      print('Full Clingo Program:\n', full_program)
-    return clingo_logica.RunClingo(full_program, clingo_settings)
+      print('Full Clingo Program:\n',
+            clingo_logica.ProgramWithFacts(program, facts))
+    return clingo_logica.RunClingo(program, clingo_settings, facts=facts)
 
   try:
       connection.remove_function('Clingo')
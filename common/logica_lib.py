@@ -17,6 +17,7 @@
 # Lint as: python3
 """Common utilities for Logica predicate compilation and execution."""
 
+import datetime
 import os
 import subprocess
 import sys
@@ -58,11 +59,13 @@ def ParseOrExit(filename, import_root=None):
   return parsed_rules
 
 
-def GetProgramOrExit(filename, user_flags=None, import_root=None):
+def GetProgramOrExit(filename, user_flags=None, import_root=None,
+                     main_predicates=None):
   """Get program object from a file."""
   parsed_rules = ParseOrExit(filename, import_root=import_root)
   try:
-    p = universe.LogicaProgram(parsed_rules, user_flags=user_flags)
+    p = universe.LogicaProgram(parsed_rules, user_flags=user_flags,
+                               main_predicates=main_predicates)
   except rule_translate.RuleCompileException as rule_compilation_exception:
     rule_compilation_exception.ShowMessage()
     sys.exit(1)
@@ -118,8 +121,7 @@ def RunQuery(sql,
                           ['--output-format=ALIGNED'],
                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
   elif engine == 'duckdb':
-    import duckdb
-    connection = duckdb.connect()
+    connection = duckdb_logica.Connect(settings)
     if 'clingo' in settings and settings['clingo'] != False:
       duckdb_logica.ConnectClingo(connection, logical_context=logical_context)
     df = connection.sql(sql).df()
@@ -135,34 +137,139 @@ def RunQuery(sql,
   return o.decode()
 
 
+def EngineSettings(program):
+  """Returns arguments of the @Engine annotation of the program."""
+  engine = program.annotations.Engine()
+  return program.annotations.annotations.get('@Engine', {}).get(engine, {})
+
+
 def RunPredicate(filename, predicate,
                  output_format='pretty', user_flags=None,
                  import_root=None):
   """Run a predicate on BigQuery."""
   p = GetProgramOrExit(filename, user_flags=user_flags,
-                       import_root=import_root)
+                       import_root=import_root, main_predicates=[predicate])
   sql = p.FormattedPredicateSql(predicate)
   engine = p.annotations.Engine()
-  if ('@Engine' in p.annotations.annotations and
-      engine in p.annotations.annotations['@Engine']):
-    settings = p.annotations.annotations['@Engine'][engine]
-  else:
-    settings = {}
+  settings = EngineSettings(p)
   return RunQuery(sql, settings,
                   output_format, engine=engine,
                   logical_context=p.raw_rules)
 
 
-def RunQueryPandas(sql, engine, connection=None):
-  """Running SQL query on the engine, returning Pandas dataframe."""
+def ExistingTables(connection, engine):
+  """Lowercased names of tables and views visible on the connection."""
+  if engine == 'duckdb':
+    rows = connection.execute(
+        'SELECT table_name FROM information_schema.tables').fetchall()
+    return {name.lower() for name, in rows}
+  names = set()
+  for _, schema, _ in connection.execute('PRAGMA database_list').fetchall():
+    master = ('sqlite_temp_master' if schema == 'temp' else
+              '"%s".sqlite_master' % schema.replace('"', '""'))
+    rows = connection.execute('SELECT name FROM %s' % master).fetchall()
+    names |= {name.lower() for name, in rows}
+  return names
+
+
+def SqliteValue(value):
+  """Value of a dataframe cell that SQLite can store."""
+  if isinstance(value, datetime.datetime):
+    return value.isoformat(' ')
+  if hasattr(value, 'item'):
+    return value.item()
+  return value
+
+
+def CreateSqliteTempTable(connection, name, table):
+  """Copies the dataframe into a new TEMP table of SQLite."""
   import pandas
+  quote = lambda identifier: '"%s"' % str(identifier).replace('"', '""')
+  connection.execute('CREATE TEMP TABLE %s (%s)' % (
+      quote(name), ', '.join(map(quote, table.columns))))
+  cells = table.astype(object).where(pandas.notna(table), None)
+  rows = [tuple(map(SqliteValue, row))
+          for row in cells.itertuples(index=False, name=None)]
+  if rows:
+    connection.executemany('INSERT INTO temp.%s VALUES (%s)' % (
+        quote(name), ', '.join('?' * len(table.columns))), rows)
+
+
+def BindTables(connection, engine, tables):
+  """Binds in-memory tables to the predicates named by the keys of tables.
+
+  Values can be Pandas dataframes, Arrow tables or Arrow record batch
+  readers. DuckDB scans them in place, streaming batches of readers, and
+  SQLite gets a copy in a TEMP table. Names of tables that already
+  exist are refused, so that data of the connection is never replaced.
+
+  Returns:
+    Names of bound tables, to be passed to UnbindTables.
+  """
+  import pandas
+  if engine not in ('duckdb', 'sqlite'):
+    raise Exception('Binding in-memory tables is only supported for '
+                    'DuckDB and SQLite.')
+  existing = ExistingTables(connection, engine)
+  colliding = sorted(name for name in tables if name.lower() in existing)
+  if colliding:
+    raise Exception('Can not bind in-memory tables %s, as tables with these '
+                    'names already exist.' % ', '.join(colliding))
+  bound = []
+  try:
+    for name, table in tables.items():
+      if engine == 'duckdb':
+        connection.register(name, table)
+      else:
+        if hasattr(table, 'read_pandas'):
+          table = table.read_pandas()
+        elif not isinstance(table, pandas.DataFrame):
+          table = table.to_pandas()
+        CreateSqliteTempTable(connection, name, table)
+      bound.append(name)
+  except:
+    UnbindTables(connection, engine, bound)
+    raise
+  return bound
+
+
+def UnbindTables(connection, engine, bound):
+  for name in bound:
+    if engine == 'duckdb':
+      connection.unregister(name)
+    elif engine == 'sqlite':
+      connection.execute('DROP TABLE temp."%s"' % name.replace('"', '""'))
+
+
+def RunQueryPandas(sql, engine, connection=None, tables=None, settings=None):
+  """Running SQL query on the engine, returning Pandas dataframe.
+
+  Args:
+    sql: SQL to run.
+    engine: Engine to run SQL on.
+    connection: Connection to the engine. Optional for SQLite and DuckDB.
+    tables: Optional map from predicate name to a Pandas dataframe or Arrow
+      table, bound to the connection only for the duration of the query.
+    settings: Arguments of @Engine annotation, used to connect to DuckDB
+      when no connection is given.
+  """
   if connection is None and engine == 'sqlite':
     connection = sqlite3_logica.SqliteConnect()
   if connection is None and engine == 'duckdb':
-    import duckdb
-    connection = duckdb.connect()
+    connection = duckdb_logica.Connect(settings)
   if connection is None:
     assert False, 'Connection is required for engines other than SQLite.'
+  if not tables:
+    return RunQueryPandasOnConnection(sql, engine, connection)
+  bound = BindTables(connection, engine, tables)
+  try:
+    return RunQueryPandasOnConnection(sql, engine, connection)
+  finally:
+    UnbindTables(connection, engine, bound)
+
+
+def RunQueryPandasOnConnection(sql, engine, connection):
+  import pandas
   if engine == 'bigquery':
     return connection.query(sql).to_dataframe()
   elif engine == 'psql':
@@ -187,12 +294,14 @@ def RunQueryPandas(sql, engine, connection=None):
 
 
 def RunPredicateToPandas(filename, predicate,
-                         user_flags=None, import_root=None, connection=None):
+                         user_flags=None, import_root=None, connection=None,
+                         tables=None):
   p = GetProgramOrExit(filename, user_flags=user_flags,
-                       import_root=import_root)
+                       import_root=import_root, main_predicates=[predicate])
   sql = p.FormattedPredicateSql(predicate)
   engine = p.annotations.Engine()
-  return RunQueryPandas(sql, engine, connection=connection)
+  return RunQueryPandas(sql, engine, connection=connection, tables=tables,
+                        settings=EngineSettings(p))
 
 
 class SqlReceiver:
@@ -207,6 +316,15 @@ def HandleException(exception):
 def CompilePredicateFromString(logica_string,
                                predicate_name,
                                user_flags=None):
+  sql, engine, _ = CompilePredicateAndSettingsFromString(
+      logica_string, predicate_name, user_flags)
+  return sql, engine
+
+
+def CompilePredicateAndSettingsFromString(logica_string,
+                                          predicate_name,
+                                          user_flags=None):
+  """Returns SQL of the predicate, engine and arguments of @Engine."""
   try:
     rules = parse.ParseFile(logica_string)['rule']
   except parse.ParsingException as parsing_exception:
@@ -214,9 +332,11 @@ def CompilePredicateFromString(logica_string,
     return HandleException(parsing_exception)
 
   try:
-    program = universe.LogicaProgram(rules, user_flags=user_flags)
+    program = universe.LogicaProgram(rules, user_flags=user_flags,
+                                     main_predicates=[predicate_name])
     sql = program.FormattedPredicateSql(predicate_name)
     engine = program.execution.annotations.Engine()
+    settings = EngineSettings(program)
   except rule_translate.RuleCompileException as rule_compilation_exception:
     rule_compilation_exception.ShowMessage()
     return HandleException(rule_compilation_exception)
@@ -229,17 +349,19 @@ def CompilePredicateFromString(logica_string,
   except parse.ParsingException as parsing_exception:
     parsing_exception.ShowMessage()
     return HandleException(parsing_exception)
-  return sql, engine
+  return sql, engine, settings
 
 
 def RunPredicateFromString(logica_string,
                            predicate_name,
                            connection=None,
                            user_flags=None,
-                           sql_receiver: SqlReceiver = None):
-  sql, engine = CompilePredicateFromString(logica_string, predicate_name,
-                                           user_flags)
+                           sql_receiver: SqlReceiver = None,
+                           tables=None):
+  sql, engine, settings = CompilePredicateAndSettingsFromString(
+      logica_string, predicate_name, user_flags)
   if sql_receiver:
     sql_receiver.sql = sql
 
-  return RunQueryPandas(sql, engine, connection)
\ No newline at end of file
+  return RunQueryPandas(sql, engine, connection, tables=tables,
+                        settings=settings)
\ No newline at end of file
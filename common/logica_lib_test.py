@@ -0,0 +1,92 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unitests for binding of in-memory tables in logica_lib.py."""
+
+import os
+import tempfile
+import unittest
+
+import duckdb
+import pandas
+import pyarrow
+
+from common import logica_lib
+from common import sqlite3_logica
+
+SQL = 'SELECT T.x, T.y FROM T ORDER BY T.x;'
+
+
+class BindTablesTest(unittest.TestCase):
+  def setUp(self):
+    self.frame = pandas.DataFrame({'x': [1, 2], 'y': ['a', None]})
+
+  def Connect(self, engine):
+    if engine == 'sqlite':
+      return sqlite3_logica.SqliteConnect()
+    return duckdb.connect()
+
+  def test_TablesAreBoundForTheQuery(self):
+    for engine in ['sqlite', 'duckdb']:
+      for table in [self.frame, pyarrow.Table.from_pandas(self.frame)]:
+        with self.subTest(engine=engine, table=type(table).__name__):
+          connection = self.Connect(engine)
+          result = logica_lib.RunQueryPandas(SQL, engine,
+                                             connection=connection,
+                                             tables={'T': table})
+          self.assertEqual(result['x'].tolist(), [1, 2])
+          self.assertEqual(result['y'][0], 'a')
+          self.assertTrue(pandas.isna(result['y'][1]))
+          self.assertEqual(logica_lib.ExistingTables(connection, engine),
+                           set())
+
+  def test_ExistingTablesAreKept(self):
+    for engine in ['sqlite', 'duckdb']:
+      with self.subTest(engine=engine):
+        connection = self.Connect(engine)
+        connection.execute('CREATE TABLE T (x INTEGER, y TEXT)')
+        connection.execute("INSERT INTO T VALUES (10, 'b')")
+        with self.assertRaisesRegex(Exception, 'already exist'):
+          logica_lib.RunQueryPandas(SQL, engine, connection=connection,
+                                    tables={'t': self.frame})
+        self.assertEqual(connection.execute(SQL).fetchall(), [(10, 'b')])
+
+  def test_TablesAreUnboundWhenQueryFails(self):
+    for engine in ['sqlite', 'duckdb']:
+      with self.subTest(engine=engine):
+        connection = self.Connect(engine)
+        with self.assertRaises(Exception):
+          logica_lib.RunQueryPandas('SELECT missing FROM T;', engine,
+                                    connection=connection,
+                                    tables={'T': self.frame})
+        self.assertEqual(logica_lib.ExistingTables(connection, engine),
+                         set())
+
+
+class RunPredicateFromStringTest(unittest.TestCase):
+  def test_DuckDBIsConnectedWithEngineSettings(self):
+    with tempfile.TemporaryDirectory() as directory:
+      database_file = os.path.join(directory, 'logica.duckdb')
+      result = logica_lib.RunPredicateFromString(
+          '@Engine("duckdb", database_file: "%s", threads: 1);\n'
+          'Q(threads: SqlExpr("current_setting(\'threads\')", {}));' %
+          database_file, 'Q')
+      self.assertEqual(result['threads'].tolist(), [1])
+      self.assertTrue(os.path.exists(database_file))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hoisting of repeated subqueries of a statement into its WITH clause.
+
+Predicates that are not compiled to WITH tables are inlined as subqueries,
+so a statement may evaluate the same subquery in many places. Copies differ
+only in names of tables and variables that the compiler allocates for each
+copy, so subqueries are compared up to renaming of names they define.
+Subqueries that refer to names defined outside of them are correlated and
+are left in place.
+
+Strings are tokenized as in standard SQL, where quotes are escaped by
+doubling them, unless the dialect also escapes characters with a backslash.
+"""
+
+import bisect
+import collections
+import re
+
+DEFAULT_MIN_LENGTH = 200
+
+
+def TokenRe(string_re):
+  return re.compile(
+      r"(?P<string>%s|`[^`]*`)|"
+      r"(?P<word>[A-Za-z_][A-Za-z0-9_]*)|"
+      r"(?P<space>\s+)|"
+      r"(?P<other>.)" % string_re, re.DOTALL)
+
+
+TOKEN_RE = TokenRe(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+BACKSLASH_TOKEN_RE = TokenRe(
+    r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+
+# Names of tables and variables allocated by the compiler.
+ALLOCATED_NAME_RE = re.compile(r'(x_\d+|t_\d+_\w*)$')
+
+# Functions with a new value at each call, which a WITH table would share.
+VOLATILE_FUNCTIONS = frozenset(['RAND', 'RANDOM', 'UUID', 'GEN_RANDOM_UUID',
+                                'GENERATE_UUID', 'NEWID'])
+
+
+class Statement(object):
+  """Tokens of a part of the statement: a WITH table or the main query."""
+
+  def __init__(self, text, backslash_escapes=False):
+    self.text = text
+    token_re = BACKSLASH_TOKEN_RE if backslash_escapes else TOKEN_RE
+    self.tokens = [(m.lastgroup, m.start(), m.end())
+                   for m in token_re.finditer(text)]
+
+  def Subqueries(self):
+    """Yields (first, last) token indices of parentheses around SELECTs."""
+    stack = []
+    for i, (kind, start, stop) in enumerate(self.tokens):
+      if kind != 'other':
+        continue
+      c = self.text[start]
+      if c == '(':
+        stack.append(i)
+      elif c == ')' and stack:
+        first = stack.pop()
+        j = first + 1
+        while j < i and self.tokens[j][0] == 'space':
+          j += 1
+        if j < i and self.Word(j).upper() == 'SELECT':
+          yield first, i
+
+  def Word(self, i):
+    kind, start, stop = self.tokens[i]
+    return self.text[start:stop] if kind == 'word' else ''
+
+  def IsName(self, i):
+    """Whether i-th token is a name, rather than a field of a name."""
+    return (self.tokens[i][0] == 'word' and
+            not (i > 0 and self.text[self.tokens[i - 1][1]] == '.'))
+
+  def DefinedNameList(self, first, last):
+    """Names defined via AS in the range of tokens, with repetitions."""
+    result = []
+    previous_word = ''
+    for i in range(first, last + 1):
+      kind = self.tokens[i][0]
+      if kind == 'space':
+        continue
+      word = self.Word(i)
+      if word and previous_word.upper() == 'AS':
+        result.append(word)
+      previous_word = word
+    return result
+
+  def DefinedNames(self, first, last):
+    return set(self.DefinedNameList(first, last))
+
+  def Names(self, first, last):
+    return {self.Word(i) for i in range(first, last + 1) if self.IsName(i)}
+
+  def QualifierNames(self, first, last):
+    return {self.Word(i) for i in range(first, last)
+            if self.IsName(i) and self.text[self.tokens[i + 1][1]] == '.'}
+
+  def LocalNames(self, first, last):
+    """Names of tables and variables that the range of tokens defines."""
+    return {n for n in self.DefinedNames(first, last)
+            if ALLOCATED_NAME_RE.match(n) or
+            n in self.QualifierNames(first, last)}
+
+  def Fingerprint(self, first, last):
+    """Text of the range up to whitespace and renaming of local names."""
+    local_names = self.LocalNames(first, last)
+    renaming = {}
+    result = []
+    for i in range(first, last + 1):
+      kind, start, stop = self.tokens[i]
+      if kind == 'space':
+        result.append(' ')
+      elif self.IsName(i) and self.Word(i) in local_names:
+        word = self.Word(i)
+        renaming.setdefault(word, '\0%d' % len(renaming))
+        result.append(renaming[word])
+      else:
+        result.append(self.text[start:stop])
+    return ''.join(result)
+
+  def Span(self, first, last):
+    return self.tokens[first][1], self.tokens[last][2]
+
+
+def HoistCommonSubqueries(with_tables, sql, min_length=DEFAULT_MIN_LENGTH,
+                          backslash_escapes=False):
+  """Moves subqueries that repeat in the statement to its WITH clause.
+
+  Args:
+    with_tables: List of pairs of name and SQL of WITH tables, in order.
+    sql: SQL of the main query.
+    min_length: Shortest subquery to hoist, in characters.
+    backslash_escapes: Whether strings of the dialect escape characters with
+      a backslash.
+
+  Returns:
+    Pair of new with_tables and sql.
+  """
+  with_tables = list(with_tables)
+  taken_names = set()
+  for text in [sql] + [t for _, t in with_tables]:
+    statement = Statement(text, backslash_escapes)
+    taken_names |= statement.Names(0, len(statement.tokens) - 1)
+  # Each pass hoists subqueries that do not overlap, so subqueries repeating
+  # within hoisted ones are hoisted by the following passes.
+  while True:
+    statements = ([Statement(t, backslash_escapes) for _, t in with_tables] +
+                  [Statement(sql, backslash_escapes)])
+    hoisted = HoistRepeats(with_tables, statements, min_length, taken_names)
+    if not hoisted:
+      break
+    with_tables, sql = hoisted
+  return (DeduplicateWithTables(with_tables, min_length, backslash_escapes),
+          sql)
+
+
+def HoistRepeats(with_tables, statements, min_length, taken_names):
+  """Hoists repeated subqueries, longest first, returns None if none."""
+  # Hoisting a subquery that is not longer than its replacement is useless.
+  shortest = max(min_length,
+                 len('(SELECT * FROM %s)' % NewName('common_subquery',
+                                                    taken_names)) + 1)
+  occurrences = {}
+  definition_counts = collections.Counter()
+  for s, statement in enumerate(statements):
+    definition_counts.update(
+        statement.DefinedNameList(0, len(statement.tokens) - 1))
+    for first, last in statement.Subqueries():
+      start, stop = statement.Span(first, last)
+      if stop - start < shortest:
+        continue
+      fingerprint = statement.Fingerprint(first, last)
+      occurrences.setdefault(fingerprint, []).append((s, first, last))
+  table_names = [name for name, _ in with_tables]
+  # Character spans of hoisted subqueries, by statement.
+  hoisted_spans = collections.defaultdict(list)
+  # Hoisted WITH tables, by index of WITH table to precede.
+  new_tables = collections.defaultdict(list)
+  replacements = collections.defaultdict(list)
+  for fingerprint in sorted(occurrences, key=len, reverse=True):
+    places = occurrences[fingerprint]
+    if len(places) < 2:
+      continue
+    spans = [(s, statements[s].Span(first, last)) for s, first, last in places]
+    if any(Overlaps(hoisted_spans[s], span) for s, span in spans):
+      continue
+    s, first, last = places[0]
+    statement = statements[s]
+    names = statement.Names(first, last)
+    if {n.upper() for n in names} & VOLATILE_FUNCTIONS:
+      continue
+    # Tables of WITH defined after the first occurrence can not be used.
+    if any(table_names.index(t) >= s for t in names & set(table_names)):
+      continue
+    if IsCorrelated(statements, places, definition_counts):
+      continue
+    name = NewName('common_subquery', taken_names)
+    taken_names.add(name)
+    start, stop = statement.Span(first, last)
+    # Dropping the parentheses.
+    new_tables[s].append((name, statement.text[start + 1:stop - 1].strip()))
+    for place_s, span in spans:
+      bisect.insort(hoisted_spans[place_s], span)
+      replacements[place_s].append((span, '(SELECT * FROM %s)' % name))
+  if not new_tables:
+    return None
+  texts = []
+  for s, statement in enumerate(statements):
+    pieces = []
+    position = 0
+    for (start, stop), replacement in sorted(replacements[s]):
+      pieces.extend([statement.text[position:start], replacement])
+      position = stop
+    pieces.append(statement.text[position:])
+    texts.append(''.join(pieces))
+  new_with_tables = []
+  for s, (name, _) in enumerate(with_tables):
+    new_with_tables.extend(new_tables[s])
+    new_with_tables.append((name, texts[s]))
+  new_with_tables.extend(new_tables[len(with_tables)])
+  return new_with_tables, texts[-1]
+
+
+def Overlaps(spans, span):
+  """Whether the span overlaps any of the sorted disjoint spans."""
+  start, stop = span
+  i = bisect.bisect_left(spans, span)
+  return ((i > 0 and spans[i - 1][1] > start) or
+          (i < len(spans) and spans[i][0] < stop))
+
+
+def IsCorrelated(statements, places, definition_counts):
+  """Whether the subqueries refer to names defined outside of them.
+
+  Args:
+    statements: Parts of the statement.
+    places: Statement index and token range of each subquery.
+    definition_counts: Counter of definitions of names in the statement.
+  """
+  names = set()
+  inside_counts = collections.Counter()
+  for s, first, last in places:
+    names |= statements[s].Names(first, last)
+    inside_counts.update(statements[s].DefinedNameList(first, last))
+  # Names that subqueries define themselves, like column names, may repeat
+  # outside of them.
+  return any(definition_counts[n] and not inside_counts[n] for n in names)
+
+
+def DeduplicateWithTables(with_tables, min_length, backslash_escapes=False):
+  """Makes WITH tables that repeat earlier ones read from those."""
+  result = []
+  first_with_fingerprint = {}
+  for name, text in with_tables:
+    statement = Statement(text, backslash_escapes)
+    fingerprint = statement.Fingerprint(0, len(statement.tokens) - 1).strip()
+    if len(text) >= min_length and fingerprint in first_with_fingerprint:
+      text = 'SELECT * FROM %s' % first_with_fingerprint[fingerprint]
+    else:
+      first_with_fingerprint.setdefault(fingerprint, name)
+    result.append((name, text))
+  return result
+
+
+def NewName(prefix, taken_names):
+  i = 0
+  while '%s_%d' % (prefix, i) in taken_names:
+    i += 1
+  return '%s_%d' % (prefix, i)
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from compiler import common_subqueries
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+@NoWith(B);
+A(x) :- x in [1, 2, 3];
+B(x, y) :- A(x), A(y), x < y;
+B(x, y) :- A(x), A(y), x > y + 1;
+C(x) distinct :- B(x, y), B(y, x), B(x, z);
+"""
+
+
+def Subquery(v):
+  return ('(SELECT %s.value AS col0 FROM JSON_EACH(JSON_ARRAY(1, 2)) as %s '
+          'WHERE %s.value > 1)' % (v, v, v))
+
+
+class CommonSubqueriesTest(unittest.TestCase):
+  def Hoist(self, with_tables, sql, min_length=0):
+    return common_subqueries.HoistCommonSubqueries(with_tables, sql,
+                                                   min_length)
+
+  def testHoistsSubqueriesUpToAllocatedNames(self):
+    sql = 'SELECT * FROM %s AS t_0_B, %s AS t_1_B' % (Subquery('x_1'),
+                                                     Subquery('x_2'))
+    with_tables, sql = self.Hoist([], sql)
+    self.assertEqual(with_tables, [('common_subquery_0', Subquery('x_1')[1:-1])])
+    self.assertEqual(sql, 'SELECT * FROM (SELECT * FROM common_subquery_0) '
+                     'AS t_0_B, (SELECT * FROM common_subquery_0) AS t_1_B')
+
+  def testKeepsCorrelatedSubqueries(self):
+    subquery = '(SELECT MAX(y) FROM T AS t_1_T WHERE t_1_T.x = A.x)'
+    sql = 'SELECT %s, %s FROM A AS A' % (subquery, subquery)
+    self.assertEqual(self.Hoist([], sql), ([], sql))
+
+  def testKeepsShortSubqueries(self):
+    sql = 'SELECT %s, %s' % (Subquery('x_1'), Subquery('x_2'))
+    self.assertEqual(self.Hoist([], sql, min_length=1000), ([], sql))
+
+  def testKeepsVolatileSubqueries(self):
+    sql = 'SELECT (SELECT RANDOM()), (SELECT RANDOM())'
+    self.assertEqual(self.Hoist([], sql), ([], sql))
+
+  def testHoistsAfterUsedWithTables(self):
+    subquery = '(SELECT MAX(A.x) AS largest_x FROM A WHERE A.x > 0)'
+    with_tables = [('A', 'SELECT 1 AS x'), ('B', 'SELECT %s AS y' % subquery)]
+    with_tables, sql = self.Hoist(with_tables, 'SELECT %s' % subquery)
+    self.assertEqual([n for n, _ in with_tables],
+                     ['A', 'common_subquery_0', 'B'])
+    self.assertEqual(sql, 'SELECT (SELECT * FROM common_subquery_0)')
+
+  def testDeduplicatesWithTables(self):
+    with_tables = [('A', Subquery('x_1')[1:-1]), ('B', Subquery('x_2')[1:-1])]
+    with_tables, _ = self.Hoist(with_tables, 'SELECT * FROM A, B')
+    self.assertEqual(with_tables[1], ('B', 'SELECT * FROM A'))
+
+  def testStringsAreTokenizedPerDialect(self):
+    subquery = "(SELECT 'a\\' AS x, MAX(y) AS y FROM T AS t_1_T)"
+    sql = 'SELECT %s, %s' % (subquery, subquery)
+    with_tables, hoisted_sql = self.Hoist([], sql)
+    self.assertEqual(with_tables, [('common_subquery_0', subquery[1:-1])])
+    self.assertEqual(hoisted_sql, 'SELECT (SELECT * FROM common_subquery_0), '
+                     '(SELECT * FROM common_subquery_0)')
+    # With backslash escapes the string does not end, so nothing is hoisted.
+    self.assertEqual(common_subqueries.HoistCommonSubqueries(
+        [], sql, 0, backslash_escapes=True), ([], sql))
+
+  def testProgramSubqueriesAreHoisted(self):
+    rules = parse.ParseFile(PROGRAM)['rule']
+    hoisted_rules = parse.ParseFile(PROGRAM + '@NoHoist(C);')['rule']
+    sql = universe.LogicaProgram(rules).FormattedPredicateSql('C')
+    self.assertTrue(sql.startswith('WITH common_subquery_0 AS ('))
+    self.assertEqual(sql.count('UNION ALL'), 1)
+    sql = universe.LogicaProgram(hoisted_rules).FormattedPredicateSql('C')
+    self.assertNotIn('common_subquery', sql)
+    self.assertEqual(sql.count('UNION ALL'), 3)
+
+  def testHoistingIsChosenPerEngine(self):
+    for engine, settings, hoisted in [
+        ('duckdb', '', False),
+        ('duckdb', ', hoist_subqueries: true', True),
+        ('sqlite', ', hoist_subqueries: false', False)]:
+      program = PROGRAM.replace('@Engine("sqlite")',
+                                '@Engine("%s"%s)' % (engine, settings))
+      rules = parse.ParseFile(program)['rule']
+      sql = universe.LogicaProgram(rules).FormattedPredicateSql('C')
+      self.assertEqual('common_subquery' in sql, hoisted, (engine, settings))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Degree-partitioned joins of tables that a rule joins in a triangle.
+
+A rule like Triangle(a, b, c) :- E(a, b), E(b, c), E(c, a) joins each pair
+of its tables on a different variable. Any join of two of the tables first
+builds all paths of length two, which on a skewed graph are far more than
+the triangles.
+
+Values of a are split by the number of rows that they have in the table
+x = E(a, b). A light value has few rows, so joining x with z = E(c, a) from
+light values builds few paths, which y = E(b, c) then checks. There are
+few heavy values, so each of them is paired with every row of y, and x and
+z are then looked up by both of their columns. The two joins are
+concatenated, each row of the triangle comes from exactly one of them.
+
+Only triangles are partitioned, longer cycles are joined as written.
+Dialects opt in with PartitionsTriangles.
+"""
+
+import collections
+import itertools
+
+
+class Triangle(object):
+  """Three tables of a rule, each pair joined on its own class of columns.
+
+  Tables x and y are joined on b, y and z on c, z and x on a.
+  """
+
+  def __init__(self, x, y, z, columns):
+    self.x, self.y, self.z = x, y, z
+    # Map (alias, variable) -> column, for variables 'a', 'b', 'c'.
+    self.columns = columns
+
+  def Aliases(self):
+    return [self.x, self.y, self.z]
+
+  def Column(self, alias, variable):
+    return '%s.%s' % (alias, self.columns[alias, variable])
+
+  def JoinedColumns(self):
+    """Pairs of (alias, column) that the joins of the triangle equate."""
+    return [((left, self.columns[left, v]), (right, self.columns[right, v]))
+            for left, right, v in [(self.x, self.z, 'a'),
+                                   (self.x, self.y, 'b'),
+                                   (self.y, self.z, 'c')]]
+
+  def Joins(self, left, right):
+    return any({left, right} == set(pair) for pair in self.JoinedColumns())
+
+  def JoinConditions(self):
+    return ['%s.%s = %s.%s' % (left + right)
+            for left, right in self.JoinedColumns()]
+
+  def HeavyValues(self, table_sql):
+    """Values of a with more rows in x than the square root of |y|."""
+    return ('(SELECT %s AS value FROM %s AS %s WHERE %s IS NOT NULL '
+            'GROUP BY %s HAVING COUNT(*) * COUNT(*) > '
+            '(SELECT COUNT(*) FROM %s))' % (
+                self.Column(self.x, 'a'), table_sql[self.x], self.x,
+                self.Column(self.x, 'a'), self.Column(self.x, 'a'),
+                table_sql[self.y]))
+
+  def Sql(self, table_sql, columns, ordered_join_separator, allocate_table):
+    """SQL of the join of the tables, as a subquery.
+
+    Heavy values and tables given by subqueries are computed once, in the
+    WITH clause of the subquery.
+
+    Args:
+      table_sql: Map from alias of a table to its SQL in FROM.
+      columns: (alias, column) pairs that the subquery selects, named with
+        OutputColumn.
+      ordered_join_separator: Separator of tables in FROM that keeps their
+        order, see Dialect.OrderedJoinSeparator.
+      allocate_table: Function returning a new name of a table.
+    """
+    with_tables = []
+    # Map from SQL of a table to its name in the WITH clause.
+    named = {}
+    for alias in self.Aliases():
+      if table_sql[alias].startswith('(') and table_sql[alias] not in named:
+        named[table_sql[alias]] = allocate_table()
+        with_tables.append((named[table_sql[alias]], table_sql[alias]))
+    table_sql = {alias: named.get(sql, sql) for alias, sql in table_sql.items()}
+    heavy_values_table = allocate_table()
+    with_tables.append((heavy_values_table, self.HeavyValues(table_sql)))
+
+    select = ', '.join('%s.%s AS %s' % (alias, column,
+                                        OutputColumn(alias, column))
+                       for alias, column in columns)
+    def From(aliases, separator):
+      return separator.join('%s AS %s' % (table_sql[alias], alias)
+                            for alias in aliases)
+    light = 'SELECT %s\nFROM %s\nWHERE %s' % (
+        select, From([self.x, self.z, self.y], ordered_join_separator),
+        ' AND '.join(self.JoinConditions() + [
+            '%s NOT IN (SELECT value FROM %s)' % (self.Column(self.x, 'a'),
+                                                   heavy_values_table)]))
+    heavy = 'SELECT %s\nFROM %s%s%s\nWHERE %s' % (
+        select, heavy_values_table, ordered_join_separator,
+        From([self.y, self.x, self.z], ordered_join_separator),
+        ' AND '.join(self.JoinConditions() + [
+            '%s = %s.value' % (self.Column(self.x, 'a'), heavy_values_table),
+            '%s = %s.value' % (self.Column(self.z, 'a'), heavy_values_table)]))
+    return '(WITH %s\n%s\nUNION ALL\n%s)' % (
+        ',\n'.join('%s AS %s' % (name, sql) for name, sql in with_tables),
+        light, heavy)
+
+
+def OutputColumn(alias, column):
+  return '%s_%s' % (alias, column)
+
+
+def FindTriangle(aliases, equalities):
+  """Returns a Triangle of the tables, or None if their joins are acyclic.
+
+  Args:
+    aliases: Aliases of tables of the rule, in the order of the body.
+    equalities: Pairs of (alias, column) that the rule requires to be equal.
+  """
+  parent = {}
+  def Find(member):
+    parent.setdefault(member, member)
+    while parent[member] != member:
+      member = parent[member]
+    return member
+  for left, right in equalities:
+    parent[Find(left)] = Find(right)
+  # Map alias -> class of columns -> a column of the alias in the class.
+  column_of = collections.defaultdict(dict)
+  for member in sorted(parent):
+    alias, column = member
+    column_of[alias].setdefault(Find(member), column)
+  def Shared(first, second, third):
+    classes = (set(column_of[first]) & set(column_of[second]) -
+               set(column_of[third]))
+    return min(classes) if classes else None
+  for x, y, z in itertools.combinations(aliases, 3):
+    a, b, c = Shared(x, z, y), Shared(x, y, z), Shared(y, z, x)
+    if a is None or b is None or c is None:
+      continue
+    columns = {}
+    for alias, variable, the_class in [(x, 'a', a), (z, 'a', a),
+                                       (x, 'b', b), (y, 'b', b),
+                                       (y, 'c', c), (z, 'c', c)]:
+      columns[alias, variable] = column_of[alias][the_class]
+    return Triangle(x, y, z, columns)
+  return None
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import unittest
+from unittest import mock
+
+from compiler import cyclic_joins
+from compiler import dialects
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+E(0, x) :- x in Range(30), x > 0;
+E(x, 0) :- x in Range(30), x > 0;
+E(x, y) :- x in Range(30), y == (x * 7 + 1) % 30, x != y;
+Q(a, b, c) :- E(a, b), E(b, c), E(c, a);
+"""
+
+
+class CyclicJoinsTest(unittest.TestCase):
+  def Run(self, program, predicate):
+    rules = parse.ParseFile(program)['rule']
+    sql = universe.LogicaProgram(rules).FormattedPredicateSql(predicate)
+    return sql, sorted(sqlite3.connect(':memory:').execute(sql).fetchall())
+
+  def testTriangleIsFound(self):
+    triangle = cyclic_joins.FindTriangle(
+        ['x', 'y', 'z'],
+        [(('x', 'col1'), ('y', 'col0')), (('y', 'col1'), ('z', 'col0')),
+         (('z', 'col1'), ('x', 'col0'))])
+    self.assertEqual(triangle.Aliases(), ['x', 'y', 'z'])
+    self.assertEqual(triangle.columns[('x', 'a')], 'col0')
+    self.assertEqual(triangle.columns[('z', 'a')], 'col1')
+    self.assertTrue(triangle.Joins(('y', 'col0'), ('x', 'col1')))
+    self.assertFalse(triangle.Joins(('y', 'col0'), ('x', 'col0')))
+
+  def testAcyclicJoinsHaveNoTriangle(self):
+    path = [(('x', 'col1'), ('y', 'col0')), (('y', 'col1'), ('z', 'col0'))]
+    self.assertIsNone(cyclic_joins.FindTriangle(['x', 'y', 'z'], path))
+    star = [(('x', 'col0'), ('y', 'col0')), (('y', 'col0'), ('z', 'col0'))]
+    self.assertIsNone(cyclic_joins.FindTriangle(['x', 'y', 'z'], star))
+
+  def testPartitionedJoinComputesTheSame(self):
+    sql, partitioned = self.Run(PROGRAM, 'Q')
+    self.assertIn(' NOT IN ', sql)
+    self.assertEqual(sql.count('HAVING'), 1)
+    sql, inlined = self.Run(PROGRAM + '@NoWith(E);\n@NoHoist(E);', 'Q')
+    self.assertIn(' NOT IN ', sql)
+    with mock.patch.object(dialects.SqLiteDialect, 'PartitionsTriangles',
+                           lambda self: False):
+      sql, plain = self.Run(PROGRAM, 'Q')
+    self.assertNotIn(' NOT IN ', sql)
+    self.assertEqual(partitioned, plain)
+    self.assertEqual(inlined, plain)
+    self.assertIn((0, 1, 8), plain)
+
+  def testOtherEnginesJoinAsWritten(self):
+    rules = parse.ParseFile(PROGRAM.replace('"sqlite"', '"duckdb"'))['rule']
+    sql = universe.LogicaProgram(rules).FormattedPredicateSql('Q')
+    self.assertNotIn(' NOT IN ', sql)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Elimination of rules and columns that the compiled predicates do not use.
+
+A program brings along rules of the library of the dialect, rules that
+functors created and rules that the compiled predicates never call. Rules
+that are not reachable from the compiled predicates are removed, so type
+inference and building of UDFs do not process them.
+
+Fields of predicates that none of the calls use are removed from heads of
+rules too, so subqueries do not select them. Only predicates that are not
+distinct are pruned this way, as a distinct predicate has a row for each
+combination of values of all of its fields. A call argument that is a
+variable occurring nowhere else in the rule is then unused as well, so
+pruning repeats until nothing changes.
+"""
+
+import collections
+
+if '.' not in __package__:
+  from compiler import functors
+else:
+  from ..compiler import functors
+
+# Annotations that do not depend on fields of the predicates they annotate.
+FIELD_AGNOSTIC_ANNOTATIONS = frozenset([
+    '@With', '@NoWith', '@NoInject', '@NoHoist', '@Limit'])
+
+
+def ReferencedPredicates(x):
+  return functors.Walk(
+      x, lambda y: [y['predicate_name']] if isinstance(y, dict) and
+      'predicate_name' in y else [])
+
+
+def AnnotationSubject(rule):
+  """Predicate that the annotation is about, or None."""
+  for field_value in rule['head']['record']['field_value']:
+    if field_value['field'] == 0:
+      literal = field_value['value'].get('expression', {}).get('literal', {})
+      if 'the_predicate' in literal:
+        return literal['the_predicate']['predicate_name']
+  return None
+
+
+def RemoveDeadRules(rules, main_predicates):
+  """Returns rules that the main predicates depend on.
+
+  Annotations of removed predicates are removed as well. Annotations that
+  are not about a defined predicate, like @Engine, are kept and the
+  predicates that they mention are kept too.
+  """
+  rules_of = collections.defaultdict(list)
+  for rule in rules:
+    rules_of[rule['head']['predicate_name']].append(rule)
+  annotations_of = collections.defaultdict(list)
+  live = set()
+  queue = list(main_predicates)
+  for rule in rules:
+    if not rule['head']['predicate_name'].startswith('@'):
+      continue
+    subject = AnnotationSubject(rule)
+    if subject in rules_of and not subject.startswith('@'):
+      annotations_of[subject].append(rule)
+    else:
+      queue.extend(ReferencedPredicates(rule))
+  while queue:
+    p = queue.pop()
+    if p in live:
+      continue
+    live.add(p)
+    for rule in rules_of.get(p, []) + annotations_of[p]:
+      queue.extend(ReferencedPredicates(rule))
+  return [r for r in rules
+          if r['head']['predicate_name'] in live or
+          (r['head']['predicate_name'].startswith('@') and
+           AnnotationSubject(r) not in annotations_of.keys() - live)]
+
+
+def CollectUses(x, uses, opaque):
+  """Collects fields used by calls, and predicates used in other ways."""
+  if isinstance(x, list):
+    for v in x:
+      CollectUses(v, uses, opaque)
+  elif isinstance(x, dict):
+    call = x.get('predicate')
+    if isinstance(call, dict) and 'predicate_name' in call:
+      uses[call['predicate_name']] |= {
+          fv['field'] for fv in call['record']['field_value']}
+      CollectUses(call['record'], uses, opaque)
+      for k, v in x.items():
+        if k != 'predicate':
+          CollectUses(v, uses, opaque)
+      return
+    if 'predicate_name' in x:
+      opaque.add(x['predicate_name'])
+    for v in x.values():
+      CollectUses(v, uses, opaque)
+
+
+def VariableCounts(x):
+  counts = collections.Counter()
+  def Count(y):
+    if isinstance(y, list):
+      for v in y:
+        Count(v)
+    elif isinstance(y, dict):
+      if 'var_name' in y:
+        counts[y['var_name']] += 1
+      for v in y.values():
+        Count(v)
+  Count(x)
+  return counts
+
+
+def IsPrunable(rule):
+  return ('distinct_denoted' not in rule and
+          all(fv['field'] != '*' and 'aggregation' not in fv['value']
+              for fv in rule['head']['record']['field_value']))
+
+
+def RemoveDeadColumns(rules, main_predicates):
+  """Removes fields of predicates that no call uses, modifying the rules.
+
+  Predicates that are compiled, used as functions or passed to functors
+  or to annotations that may depend on fields, like @OrderBy, keep all of
+  their fields.
+  """
+  rules_of = collections.defaultdict(list)
+  for rule in rules:
+    rules_of[rule['head']['predicate_name']].append(rule)
+  prunable = {p for p, p_rules in rules_of.items()
+              if not p.startswith('@') and p not in main_predicates and
+              all(map(IsPrunable, p_rules))}
+  while True:
+    uses = collections.defaultdict(set)
+    opaque = set()
+    for rule in rules:
+      if rule['head']['predicate_name'] in FIELD_AGNOSTIC_ANNOTATIONS:
+        continue
+      CollectUses(rule['head']['record'], uses, opaque)
+      for k, v in rule.items():
+        if k not in ('head', 'full_text'):
+          CollectUses(v, uses, opaque)
+    changed = False
+    for p in prunable - opaque:
+      if '*' in uses[p] or not uses[p]:
+        continue
+      for rule in rules_of[p]:
+        field_values = rule['head']['record']['field_value']
+        kept = [fv for fv in field_values if fv['field'] in uses[p]]
+        if len(kept) < len(field_values):
+          field_values[:] = kept
+          changed = True
+    # Arguments that bind variables that nothing else uses are unused.
+    for rule in rules:
+      counts = VariableCounts({k: v for k, v in rule.items()
+                               if k != 'full_text'})
+      changed |= RemoveUnusedArguments(rule.get('body'), prunable - opaque,
+                                       counts)
+    if not changed:
+      return rules
+
+
+def RemoveUnusedArguments(x, prunable, counts):
+  """Removes call arguments that are variables used only there."""
+  changed = False
+  if isinstance(x, list):
+    for v in x:
+      changed |= RemoveUnusedArguments(v, prunable, counts)
+  elif isinstance(x, dict):
+    call = x.get('predicate')
+    if isinstance(call, dict) and call.get('predicate_name') in prunable:
+      field_values = call['record']['field_value']
+      kept = [fv for fv in field_values
+              if not IsUnusedVariable(fv['value'], counts)]
+      if kept and len(kept) < len(field_values):
+        field_values[:] = kept
+        changed = True
+    for v in x.values():
+      changed |= RemoveUnusedArguments(v, prunable, counts)
+  return changed
+
+
+def IsUnusedVariable(value, counts):
+  variable = value.get('expression', {}).get('variable')
+  return (variable is not None and
+          counts[variable['var_name']] == 1)
+
+
+def EliminateDeadCode(rules, main_predicates):
+  """Returns rules needed to compile the main predicates, with columns pruned.
+
+  Args:
+    rules: Rules of the program, which are modified.
+    main_predicates: Predicates that are going to be compiled.
+  """
+  main_predicates = set(main_predicates)
+  rules = RemoveDeadRules(rules, main_predicates)
+  return RemoveDeadColumns(rules, main_predicates)
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import unittest
+
+from compiler import dead_code
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+@With(T);
+T(a:, b:, c:) :- a in [1, 2, 3], b == 2 * a, c == ToString(a);
+U(a:, d:) :- T(a:, b:), d == b + 1;
+V(a:, c:) distinct :- T(a:, c:);
+@OrderBy(Unused, "x");
+Unused(x:) :- T(a: x);
+Q(a:, d:) :- U(a:, d:);
+R(a:) :- V(a:);
+"""
+
+
+class DeadCodeTest(unittest.TestCase):
+  def Parse(self, program=PROGRAM):
+    return parse.ParseFile(program)['rule']
+
+  def HeadFields(self, rules):
+    result = {}
+    for rule in rules:
+      result[rule['head']['predicate_name']] = [
+          fv['field'] for fv in rule['head']['record']['field_value']]
+    return result
+
+  def testDeadRulesAndAnnotationsAreRemoved(self):
+    rules = dead_code.EliminateDeadCode(self.Parse(), ['Q'])
+    self.assertEqual(set(self.HeadFields(rules)),
+                     {'@Engine', '@With', 'T', 'U', 'Q'})
+
+  def testUnusedFieldsAreRemoved(self):
+    fields = self.HeadFields(dead_code.EliminateDeadCode(self.Parse(), ['Q']))
+    self.assertEqual(fields['T'], ['a', 'b'])
+    self.assertEqual(fields['Q'], ['a', 'd'])
+
+  def testDistinctPredicatesKeepFields(self):
+    fields = self.HeadFields(dead_code.EliminateDeadCode(self.Parse(), ['R']))
+    self.assertEqual(fields['V'], ['a', 'c'])
+    self.assertEqual(fields['T'], ['a', 'c'])
+
+  def testPrunedProgramComputesTheSame(self):
+    for predicate in ['Q', 'R']:
+      rules = self.Parse()
+      sql = universe.LogicaProgram(
+          rules, main_predicates=[predicate]).FormattedPredicateSql(predicate)
+      self.assertNotIn('Unused', sql)
+      full_sql = universe.LogicaProgram(rules).FormattedPredicateSql(predicate)
+      connection = sqlite3.connect(':memory:')
+      self.assertEqual(sorted(connection.execute(sql).fetchall()),
+                       sorted(connection.execute(full_sql).fetchall()))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -54,12 +54,39 @@ class Dialect(object):
   def IsPostgreSQLish(self):
     return False
 
+  def OrderedJoinSeparator(self):
+    """Separator of tables in FROM, keeping the join order if possible."""
+    return ', '
+
+  def LargestTableFirst(self):
+    """Whether joins are cheaper when larger tables are to the left."""
+    return False
+
+  def PartitionsTriangles(self):
+    """Whether triangles of joins are split by degrees, see cyclic_joins."""
+    return False
+
+  def HoistsCommonSubqueries(self):
+    """Whether repeated subqueries go to WITH tables, see common_subqueries."""
+    return False
+
+  def BackslashEscapesInStrings(self):
+    """Whether string literals escape characters with a backslash."""
+    return False
+
+  def NullSafeEqualityPhrase(self):
+    """Comparison of two values, where nulls are equal."""
+    return '(%s IS NOT DISTINCT FROM %s)'
+
 class BigQueryDialect(Dialect):
   """BigQuery SQL dialect."""
 
   def Name(self):
     return 'BigQuery'
 
+  def BackslashEscapesInStrings(self):
+    return True
+
   def BuiltInFunctions(self):
     return {}
 
@@ -142,6 +169,23 @@ class SqLiteDialect(Dialect):
   def UnnestPhrase(self):
     return 'JSON_EACH({0}) as {1}'
 
+  def OrderedJoinSeparator(self):
+    # SQLite never reorders tables of a CROSS JOIN.
+    return ' CROSS JOIN '
+
+  def PartitionsTriangles(self):
+    # SQLite joins by nested loops over indexes, so it builds every path of
+    # length two of a triangle.
+    return True
+
+  def NullSafeEqualityPhrase(self):
+    return '(%s IS %s)'
+
+  def HoistsCommonSubqueries(self):
+    # SQLite evaluates each copy of a subquery, while a WITH table that is
+    # used more than once is materialized.
+    return True
+
   def ArrayPhrase(self):
     return 'JSON_ARRAY(%s)'
 
@@ -251,6 +295,9 @@ class ClickHouseDialect(Dialect):
   def Name(self):
     return 'ClickHouse'
 
+  def BackslashEscapesInStrings(self):
+    return True
+
   def BuiltInFunctions(self):
     return {
         'Range': 'range(%s)',
@@ -287,6 +334,10 @@ class ClickHouseDialect(Dialect):
   def LibraryProgram(self):
     return clickhouse_library.library
 
+  def LargestTableFirst(self):
+    # Tables to the right of a join are loaded to memory.
+    return True
+
   def UnnestPhrase(self):
     # ClickHouse doesn't support arrayJoin(...) as a table function in FROM.
     # Use a subquery that produces a single column.
@@ -416,6 +467,9 @@ class Databricks(Dialect):
     def Name(self):
         return 'Databricks'
 
+    def BackslashEscapesInStrings(self):
+        return True
+
     def BuiltInFunctions(self):
         return {
             'ToString': 'CAST(%s AS STRING)',
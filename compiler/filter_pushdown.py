@@ -0,0 +1,271 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pushing conditions of calls into predicates that are not injected.
+
+A predicate that is grounded or compiled to a WITH table is computed in
+full before the rules calling it filter its rows. When every call of the
+predicate is in a conjunction with the same condition on the fields of the
+call, e.g. Sales(date:, ...), date == "2024-01-01", rows that violate it
+are never used. The condition is then added to the rules of the predicate,
+with fields replaced by expressions of their heads. Calls keep their
+conditions, so the rewriting is safe when rules of the predicate produce
+a value in several ways.
+
+This needs all the calls of the predicate, so it only runs when the
+predicates to compile are known.
+"""
+
+import collections
+import copy
+import json
+
+if '.' not in __package__:
+  from compiler import dead_code
+  from compiler import rule_translate
+else:
+  from ..compiler import dead_code
+  from ..compiler import rule_translate
+
+# Annotations that allow conditions to be pushed into their subject.
+FILTERABLE_ANNOTATIONS = frozenset([
+    '@Ground', '@With', '@NoWith', '@NoInject', '@NoHoist', '@OrderBy'])
+
+# Annotations that make a predicate compiled separately from its calls.
+NON_INJECTING_ANNOTATIONS = frozenset([
+    '@Ground', '@With', '@NoInject', '@OrderBy'])
+
+
+def Variables(x):
+  result = set()
+  def Collect(y):
+    if isinstance(y, list):
+      for v in y:
+        Collect(v)
+    elif isinstance(y, dict):
+      if 'variable' in y:
+        result.add(y['variable']['var_name'])
+      for v in y.values():
+        Collect(v)
+  Collect(x)
+  return result
+
+
+def HasCombine(x):
+  if isinstance(x, list):
+    return any(map(HasCombine, x))
+  if isinstance(x, dict):
+    return 'combine' in x or any(map(HasCombine, x.values()))
+  return False
+
+
+def Substitute(x, substitution, keep_heritage=True):
+  """Returns copy of x with variables replaced."""
+  if isinstance(x, list):
+    return [Substitute(v, substitution, keep_heritage) for v in x]
+  if isinstance(x, dict):
+    if 'variable' in x and x['variable']['var_name'] in substitution:
+      return copy.deepcopy(substitution[x['variable']['var_name']])
+    # Heritage is needed to inline calls of functions.
+    return {k: Substitute(v, substitution, keep_heritage)
+            for k, v in x.items()
+            if keep_heritage or k != 'expression_heritage'}
+  return x
+
+
+def Key(x):
+  return json.dumps(Substitute(x, {}, keep_heritage=False), sort_keys=True,
+                    default=str)
+
+
+def IsCondition(conjunct):
+  if 'unification' in conjunct:
+    return True
+  return ('predicate' in conjunct and
+          conjunct['predicate']['predicate_name'] in
+          rule_translate.CONSTRAINT_PREDICATES)
+
+
+def CallSites(x, sites):
+  """Collects pairs of conjunction and call in it, by called predicate."""
+  if isinstance(x, list):
+    for v in x:
+      CallSites(v, sites)
+  elif isinstance(x, dict):
+    if 'conjunction' in x and 'conjunct' in x['conjunction']:
+      conjuncts = x['conjunction']['conjunct']
+      for c in conjuncts:
+        if 'predicate' in c:
+          sites[c['predicate']['predicate_name']].append((conjuncts, c))
+    for v in x.values():
+      CallSites(v, sites)
+
+
+def CallCounts(x, counts):
+  if isinstance(x, list):
+    for v in x:
+      CallCounts(v, counts)
+  elif isinstance(x, dict):
+    call = x.get('predicate')
+    if isinstance(call, dict) and 'predicate_name' in call:
+      counts[call['predicate_name']] += 1
+    for v in x.values():
+      CallCounts(v, counts)
+
+
+def Conditions(conjuncts, call):
+  """Conditions on fields of the call in the conjunction, by their key."""
+  field_of = {}
+  for field_value in call['predicate']['record']['field_value']:
+    variable = field_value['value'].get('expression', {}).get('variable')
+    if variable and variable['var_name'] != '_':
+      field_of.setdefault(variable['var_name'], field_value['field'])
+  result = {}
+  for c in conjuncts:
+    if c is call or not IsCondition(c) or HasCombine(c):
+      continue
+    variables = Variables(c)
+    if not variables or not variables <= set(field_of):
+      continue
+    condition = Substitute(
+        c, {v: {'variable': {'var_name': ('field', f)}}
+            for v, f in field_of.items()})
+    result[Key(condition)] = (
+        condition, {v: field_of[v] for v in variables})
+  return result
+
+
+class FilterPusher(object):
+  """Pushes conditions shared by calls of predicates into their rules."""
+
+  def __init__(self, rules, main_predicates):
+    self.rules = rules
+    self.main_predicates = set(main_predicates)
+    self.rules_of = collections.defaultdict(list)
+    self.annotations_of = collections.defaultdict(set)
+    for rule in rules:
+      predicate_name = rule['head']['predicate_name']
+      self.rules_of[predicate_name].append(rule)
+      if predicate_name.startswith('@'):
+        subject = dead_code.AnnotationSubject(rule)
+        if subject:
+          self.annotations_of[subject].add(predicate_name)
+    self.pushed = collections.defaultdict(set)
+
+  def Opaque(self):
+    """Predicates that are used other than by calls in conjunctions."""
+    uses = collections.defaultdict(set)
+    opaque = set()
+    for rule in self.rules:
+      predicate_name = rule['head']['predicate_name']
+      if predicate_name in FILTERABLE_ANNOTATIONS:
+        field_values = [fv for fv in rule['head']['record']['field_value']
+                        if fv['field'] != 0]
+        dead_code.CollectUses(field_values, uses, opaque)
+      else:
+        dead_code.CollectUses(rule['head']['record'], uses, opaque)
+      dead_code.CollectUses(rule.get('body'), uses, opaque)
+    return opaque
+
+  def IsFilterable(self, predicate_name):
+    rules = self.rules_of[predicate_name]
+    annotations = self.annotations_of[predicate_name]
+    if (not rules or predicate_name.startswith('@') or
+        predicate_name in self.main_predicates or
+        not annotations <= FILTERABLE_ANNOTATIONS):
+      return False
+    # Injected predicates are compiled along with the conditions of calls.
+    return (len(rules) > 1 or 'distinct_denoted' in rules[0] or
+            bool(annotations & NON_INJECTING_ANNOTATIONS))
+
+  def HeadExpressions(self, predicate_name, fields):
+    """Expressions of the fields in heads of rules, or None."""
+    result = []
+    for rule in self.rules_of[predicate_name]:
+      head_values = {}
+      for field_value in rule['head']['record']['field_value']:
+        head_values[field_value['field']] = field_value['value']
+      if '*' in head_values:
+        return None
+      expressions = {}
+      for f in fields:
+        value = head_values.get(f, {})
+        if 'expression' not in value or HasCombine(value['expression']):
+          return None
+        expressions[f] = value['expression']
+      result.append(expressions)
+    return result
+
+  def Push(self, predicate_name, condition, field_of):
+    head_expressions = self.HeadExpressions(predicate_name,
+                                            set(field_of.values()))
+    if head_expressions is None:
+      return False
+    for rule, expressions in zip(self.rules_of[predicate_name],
+                                 head_expressions):
+      conjunct = Substitute(
+          condition, {('field', f): e for f, e in expressions.items()})
+      if 'body' not in rule:
+        rule['body'] = {'conjunction': {'conjunct': []}}
+      conjuncts = rule['body']['conjunction']['conjunct']
+      if Key(conjunct) not in map(Key, conjuncts):
+        conjuncts.append(conjunct)
+    return True
+
+  def PushOnce(self):
+    """Pushes conditions of calls that are not pushed yet."""
+    sites = collections.defaultdict(list)
+    counts = collections.Counter()
+    for rule in self.rules:
+      CallSites(rule.get('body'), sites)
+      CallSites(rule['head']['record'], sites)
+      CallCounts(rule.get('body'), counts)
+      CallCounts(rule['head']['record'], counts)
+    opaque = self.Opaque()
+    changed = False
+    for predicate_name in sorted(sites, key=str):
+      if (predicate_name in opaque or
+          counts[predicate_name] != len(sites[predicate_name]) or
+          not self.IsFilterable(predicate_name)):
+        continue
+      common = None
+      for conjuncts, call in sites[predicate_name]:
+        conditions = Conditions(conjuncts, call)
+        if common is None:
+          common = conditions
+        else:
+          common = {k: v for k, v in common.items() if k in conditions}
+      for key, (condition, field_of) in sorted(common.items()):
+        if key in self.pushed[predicate_name]:
+          continue
+        self.pushed[predicate_name].add(key)
+        changed |= self.Push(predicate_name, condition, field_of)
+    return changed
+
+  def PushAll(self):
+    while self.PushOnce():
+      pass
+    return self.rules
+
+
+def PushDownFilters(rules, main_predicates):
+  """Pushes conditions into the rules of called predicates, modifying them.
+
+  Args:
+    rules: Rules of the program that the main predicates use.
+    main_predicates: Predicates that are going to be compiled.
+  """
+  return FilterPusher(rules, main_predicates).PushAll()
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from common import sqlite3_logica
+from compiler import filter_pushdown
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+@With(P);
+P(x:, z:) :- y in Range(5), x == y * 2, z == y;
+P(x:, z:) :- x in [100, 4], z == 7;
+Q(z:) :- P(x:, z:), x == 4, z > 0;
+R(z:) :- P(x:, z:), z > 0, x == 4;
+"""
+
+
+class FilterPushdownTest(unittest.TestCase):
+  def Parse(self, program):
+    return parse.ParseFile(program)['rule']
+
+  def Conjuncts(self, rules, predicate_name):
+    return [r['body']['conjunction']['conjunct'] for r in rules
+            if r['head']['predicate_name'] == predicate_name]
+
+  def testSharedConditionsArePushed(self):
+    rules = self.Parse(PROGRAM + 'S(z:) :- Q(z:), R(z:);')
+    filter_pushdown.PushDownFilters(rules, ['S'])
+    self.assertEqual([len(c) for c in self.Conjuncts(rules, 'P')], [5, 4])
+
+  def testConditionsOfSomeCallsAreNotPushed(self):
+    rules = self.Parse(PROGRAM + 'S(z:) :- Q(z:), P(z:);')
+    filter_pushdown.PushDownFilters(rules, ['S'])
+    self.assertEqual([len(c) for c in self.Conjuncts(rules, 'P')], [3, 2])
+
+  def testMainPredicatesAreNotFiltered(self):
+    rules = self.Parse(PROGRAM + 'S(z:) :- Q(z:), R(z:);')
+    filter_pushdown.PushDownFilters(rules, ['P', 'S'])
+    self.assertEqual([len(c) for c in self.Conjuncts(rules, 'P')], [3, 2])
+
+  def Run(self, rules, predicate, main_predicates):
+    program = universe.LogicaProgram(rules, main_predicates=main_predicates)
+    program.FormattedPredicateSql(predicate)
+    execution = program.execution
+    return sqlite3_logica.RunSqlScript(
+        [execution.preamble] + execution.defines_and_exports +
+        [execution.main_predicate_sql], 'csv')
+
+  def testFilteredProgramComputesTheSame(self):
+    rules = self.Parse(PROGRAM + """
+      @Ground(S);
+      S(z:, t? += x) distinct :- P(x:, z:);
+      T(z:, t:) :- S(z:, t:), z > 2;
+    """)
+    for predicate in ['Q', 'T']:
+      self.assertEqual(self.Run(rules, predicate, [predicate]),
+                       self.Run(rules, predicate, None))
+    program = universe.LogicaProgram(rules, main_predicates=['T'])
+    program.FormattedPredicateSql('T')
+    [create_s] = [s for s in program.execution.defines_and_exports
+                  if 'CREATE TABLE' in s]
+    self.assertIn('> 2', create_s)
+
+  def testConditionsCallingFunctionsArePushed(self):
+    rules = self.Parse(PROGRAM + """
+      Four() = 4;
+      S(z:) :- P(x:, z:), x == Four();
+    """)
+    self.assertEqual(self.Run(rules, 'S', ['S']),
+                     self.Run(rules, 'S', None))
+
+if __name__ == '__main__':
+  unittest.main()
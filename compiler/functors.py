@@ -35,10 +35,12 @@ import sys
 
 if '.' not in __package__:
   from common import color
+  from compiler import simplify
   from compiler.dialect_libraries import recursion_library
   from parser_py import parse
 else:
   from ..common import color
+  from ..compiler import simplify
   from ..compiler.dialect_libraries import recursion_library
   from ..parser_py import parse
 
@@ -416,7 +418,8 @@ class Functors(object):
         rules_to_update.append(r)
         predicates_to_annotate.add(rule_predicate_name)
       else:
-        # TODO: We should also remove predicates that become unused.
+        # Predicates that become unused are removed by dead_code, when
+        # the predicates to compile are known.
         if rule_predicate_name in args_map:
           continue
         call_key = self.CallKey(rule_predicate_name, args_map)
@@ -697,7 +700,26 @@ class Functors(object):
         assert False, 'Unknown recursion style:' + style
     return new_rules
 
+  def RemoveRulesProvenToBeEmpty(self, rules):
+    """Removes rules with conditions that are false for constants.
+
+    Predicates keep their rules if all of them are empty, as such rules
+    still define columns of the predicate.
+    """
+    constants = simplify.ConstantFunctions(rules)
+    for value, function in self.constant_literal_function.items():
+      constants[function] = simplify.Literal(
+          value if isinstance(value, str) else int(value))
+    empty = [simplify.IsProvenEmpty(rule, constants) for rule in rules]
+    nonempty_predicates = {rule['head']['predicate_name']
+                           for rule, is_empty in zip(rules, empty)
+                           if not is_empty}
+    rules[:] = [rule for rule, is_empty in zip(rules, empty)
+                if not is_empty or
+                rule['head']['predicate_name'] not in nonempty_predicates]
+
   def RemoveRulesProvenToBeNil(self, rules):
+    self.RemoveRulesProvenToBeEmpty(rules)
     proven_to_be_nothing = set({'nil'})
     def ReplacePredicate(original, new):
       def Replace(x):
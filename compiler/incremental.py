@@ -0,0 +1,281 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Incremental maintenance of grounded predicates over appended input.
+
+A grounded predicate annotated as
+  @Incremental(P, input: Events, delta: NewEvents);
+keeps the rows of its table from earlier runs, where NewEvents has the rows
+that were appended to Events since then. Each run computes rows of P from
+NewEvents only and merges them into the table.
+
+Rules of P_Delta are rules of P calling NewEvents instead of Events. Rows of
+a distinct P_Delta are merged with rows of the table with the same keys by
+rules of P_Update, which aggregate them with the aggregations of P. This is
+exact for aggregations that are semigroups, like +=, Max= and Min= and
+aggregations with @BareAggregation, as they aggregate partial aggregates to
+the aggregate of all the values. Rows of P_Update then replace rows of the
+table with their keys. Rows of P_Delta that is not distinct are appended.
+
+Keys are compared so that null keys are equal, and rows of the table are
+replaced in a transaction.
+"""
+
+import copy
+
+if '.' not in __package__:
+  from compiler import dead_code
+  from compiler import rule_translate
+  from parser_py import parse
+else:
+  from ..compiler import dead_code
+  from ..compiler import rule_translate
+  from ..parser_py import parse
+
+# Aggregations of values that also aggregate their partial aggregates.
+MERGEABLE_AGGREGATIONS = frozenset([
+    'Agg+', 'Sum', 'Max', 'Min', 'AnyValue', '1'])
+
+
+def DeltaName(predicate_name):
+  return predicate_name + '_Delta'
+
+
+def UpdateName(predicate_name):
+  return predicate_name + '_Update'
+
+
+def AnnotationArguments(rule):
+  """Map from fields of the annotation to predicates given as their values."""
+  result = {}
+  for field_value in rule['head']['record']['field_value']:
+    literal = field_value['value'].get('expression', {}).get('literal', {})
+    if 'the_predicate' in literal:
+      result[field_value['field']] = literal['the_predicate']['predicate_name']
+  return result
+
+
+def IncrementalPredicates(rules):
+  """Map from incremental predicates to their input and delta predicates."""
+  result = {}
+  for rule in rules:
+    if rule['head']['predicate_name'] != '@Incremental':
+      continue
+    arguments = AnnotationArguments(rule)
+    if not {0, 'input', 'delta'} <= set(arguments):
+      raise rule_translate.RuleCompileException(
+          '@Incremental needs a predicate, its input and the delta of the '
+          'input, e.g. @Incremental(P, input: Events, delta: NewEvents).',
+          rule['full_text'])
+    result[arguments[0]] = (arguments['input'], arguments['delta'])
+  return result
+
+
+def CalledPredicates(rule):
+  return set(dead_code.ReferencedPredicates(rule.get('body')))
+
+
+class DeltaBuilder(object):
+  """Builds rules of deltas of predicates that depend on an input."""
+
+  def __init__(self, rules_of, input_predicate, delta_predicate):
+    self.rules_of = rules_of
+    self.input_predicate = input_predicate
+    self.delta_predicate = delta_predicate
+    self.dependent = {input_predicate: True}
+    self.delta_rules = []
+    self.built = set()
+
+  def DependsOnInput(self, predicate_name):
+    if predicate_name not in self.dependent:
+      # Recursive predicates are caught by the check of linearity.
+      self.dependent[predicate_name] = False
+      self.dependent[predicate_name] = any(
+          self.DependsOnInput(p)
+          for rule in self.rules_of.get(predicate_name, [])
+          for p in CalledPredicates(rule))
+    return self.dependent[predicate_name]
+
+  def Delta(self, predicate_name, is_top=False):
+    """Name of the delta of the predicate, building its rules."""
+    if predicate_name == self.input_predicate:
+      return self.delta_predicate
+    if predicate_name in self.built:
+      return DeltaName(predicate_name)
+    self.built.add(predicate_name)
+    rules = self.rules_of.get(predicate_name, [])
+    if (not is_top and
+        any('distinct_denoted' in rule for rule in rules)):
+      raise rule_translate.RuleCompileException(
+          'Incremental predicate may only depend on its input via predicates '
+          'that are not distinct.', rules[0]['full_text'])
+    for rule in rules:
+      delta_rule = copy.deepcopy(rule)
+      delta_rule['head']['predicate_name'] = DeltaName(predicate_name)
+      dependent = [p for p in CalledPredicates(rule)
+                   if self.DependsOnInput(p)]
+      renames = 0
+      for p in dependent:
+        renames += parse.RenamePredicate(delta_rule.get('body'), p,
+                                         self.Delta(p))
+      if renames != 1:
+        raise rule_translate.RuleCompileException(
+            'Each rule of an incremental predicate must depend on its input '
+            'via exactly one call.', rule['full_text'])
+      self.delta_rules.append(delta_rule)
+    return DeltaName(predicate_name)
+
+
+def Variable(field, prefix='incremental'):
+  return {'variable': {'var_name': '%s_%s' % (prefix, field)}}
+
+
+def Operation(predicate_name, arguments):
+  return {'predicate_name': predicate_name, 'record': {'field_value': [
+      {'field': f, 'value': {'expression': e}}
+      for f, e in arguments.items()]}}
+
+
+def Call(predicate_name, fields, prefix='incremental'):
+  return {'predicate': Operation(predicate_name, {
+      f: Variable(f, prefix) for f in fields})}
+
+
+def NullSafeEquality(left, right):
+  """Proposition that values are equal or are both null."""
+  equal = {'call': Operation('==', {'left': left, 'right': right})}
+  both_null = {'call': Operation('&&', {
+      'left': {'call': Operation('IsNull', {0: left})},
+      'right': {'call': Operation('IsNull', {0: right})}})}
+  return {'predicate': Operation('||', {'left': equal, 'right': both_null})}
+
+
+def KeyFields(rule):
+  return [fv['field'] for fv in rule['head']['record']['field_value']
+          if 'aggregation' not in fv['value']]
+
+
+def UpdateRules(rule, bare_aggregations):
+  """Rules merging rows of the delta with stored rows of the same keys."""
+  predicate_name = rule['head']['predicate_name']
+  head = []
+  fields = []
+  for field_value in rule['head']['record']['field_value']:
+    field = field_value['field']
+    fields.append(field)
+    value = copy.deepcopy(field_value['value'])
+    if 'aggregation' in value:
+      call = value['aggregation'].get('expression', {}).get('call', {})
+      arguments = call.get('record', {}).get('field_value', [])
+      if (len(arguments) != 1 or
+          call['predicate_name'] not in (MERGEABLE_AGGREGATIONS |
+                                         bare_aggregations)):
+        raise rule_translate.RuleCompileException(
+            'Field %s of an incremental predicate is aggregated by an '
+            'aggregation that can not merge its partial aggregates.' % field,
+            rule['full_text'])
+      arguments[0]['value'] = {'expression': Variable(field)}
+    else:
+      value = {'expression': Variable(field)}
+    head.append({'field': field, 'value': value})
+  # Rows of both are aggregated together, like rows of rules of a predicate
+  # with several distinct rules.
+  merged = UpdateName(predicate_name) + parse.MultiBodyAggregation.SUFFIX
+  keys = KeyFields(rule)
+  # Stored rows with keys of the delta, null keys included.
+  stored_rows = [Call(predicate_name, fields),
+                 Call(DeltaName(predicate_name), keys, 'incremental_delta')]
+  stored_rows.extend(
+      NullSafeEquality(Variable(k), Variable(k, 'incremental_delta'))
+      for k in keys)
+  result = []
+  for body in [[Call(DeltaName(predicate_name), fields)], stored_rows]:
+    result.append({
+        'head': Call(merged, fields)['predicate'],
+        'body': {'conjunction': {'conjunct': body}},
+        'full_text': rule['full_text']})
+  result.append({
+      'head': {'predicate_name': UpdateName(predicate_name),
+               'record': {'field_value': head}},
+      'body': {'conjunction': {'conjunct': [Call(merged, fields)]}},
+      'distinct_denoted': True,
+      'full_text': rule['full_text']})
+  return result
+
+
+def AddIncrementalRules(rules):
+  """Returns rules with rules of deltas and updates of incremental predicates.
+
+  Args:
+    rules: Rules of the program.
+  """
+  incremental = IncrementalPredicates(rules)
+  if not incremental:
+    return rules
+  rules_of = parse.DefinedPredicatesRules(rules)
+  bare_aggregations = {AnnotationArguments(rule).get(0)
+                       for rule in rules_of.get('@BareAggregation', [])}
+  result = list(rules)
+  for predicate_name, (input_predicate, delta_predicate) in sorted(
+      incremental.items()):
+    if predicate_name not in rules_of:
+      continue
+    builder = DeltaBuilder(rules_of, input_predicate, delta_predicate)
+    builder.Delta(predicate_name, is_top=True)
+    result.extend(builder.delta_rules)
+    [rule, *_] = rules_of[predicate_name]
+    if 'distinct_denoted' in rule:
+      result.extend(UpdateRules(rule, bare_aggregations))
+  return result
+
+
+def IncrementalExportSql(table_name, delta_sql, update_sql, keys,
+                         null_safe_equality):
+  """SQL merging rows computed from the delta into the table.
+
+  Args:
+    table_name: Table of the predicate.
+    delta_sql: Query of rows of the predicate computed from the delta.
+    update_sql: Query of merged rows, or None if rows are appended.
+    keys: Columns that identify rows to replace with merged rows.
+    null_safe_equality: Phrase of the dialect comparing two values, so that
+      nulls are equal.
+  """
+  delta_table = table_name + '_delta'
+  statements = [
+      'DROP TABLE IF EXISTS %s' % delta_table,
+      'CREATE TABLE %s AS %s' % (delta_table, delta_sql),
+      'CREATE TABLE IF NOT EXISTS %s AS SELECT * FROM %s LIMIT 0' % (
+          table_name, delta_table)]
+  if update_sql is None:
+    statements.append('INSERT INTO %s SELECT * FROM %s' % (table_name,
+                                                           delta_table))
+  else:
+    update_table = table_name + '_update'
+    statements.extend([
+        'DROP TABLE IF EXISTS %s' % update_table,
+        'CREATE TABLE %s AS %s' % (update_table, update_sql),
+        'BEGIN TRANSACTION',
+        'DELETE FROM %s WHERE EXISTS (SELECT 1 FROM %s WHERE %s)' % (
+            table_name, update_table,
+            ' AND '.join([null_safe_equality % ('%s.%s' % (update_table, k),
+                                                '%s.%s' % (table_name, k))
+                          for k in keys] or ['1 = 1'])),
+        'INSERT INTO %s SELECT * FROM %s' % (table_name, update_table),
+        'COMMIT',
+        'DROP TABLE %s' % update_table])
+  statements.append('DROP TABLE %s' % delta_table)
+  return ';\n'.join(statements) + ';'
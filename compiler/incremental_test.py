@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from common import sqlite3_logica
+from compiler import incremental
+from compiler import rule_translate
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+@Ground(Totals);
+@Incremental(Totals, input: Events, delta: NewEvents);
+NewEvents(user:, amount:, batch:) :-
+  Events(user:, amount:, batch:), batch == %d;
+Totals(user:, total? += amount, largest? Max= amount) distinct :-
+  Events(user:, amount:);
+Totals(user:, total? += 1, largest? Max= 0) distinct :-
+  Events(user:, batch: 0);
+Report(user:, total:, largest:) :- Totals(user:, total:, largest:);
+"""
+
+EVENTS = [('a', 1, 1), ('a', 5, 1), ('b', 2, 1), ('b', 0, 0),
+          ('a', 7, 2), ('c', 3, 2)]
+
+
+class IncrementalTest(unittest.TestCase):
+  def Parse(self, program):
+    return parse.ParseFile(program)['rule']
+
+  def testDeltaAndUpdateRulesAreAdded(self):
+    rules = incremental.AddIncrementalRules(self.Parse(PROGRAM % 1))
+    names = [r['head']['predicate_name'] for r in rules]
+    self.assertEqual(names.count('Totals_MultBodyAggAux_Delta'), 2)
+    self.assertEqual(names.count('Totals_Update'), 1)
+
+  def Run(self, connection, program, predicate):
+    program = universe.LogicaProgram(self.Parse(program))
+    program.FormattedPredicateSql(predicate)
+    execution = program.execution
+    for statement in execution.defines_and_exports:
+      connection.executescript(statement)
+    return sorted(connection.execute(execution.main_predicate_sql), key=repr)
+
+  def RunBatches(self, events):
+    """Returns results of incremental runs over batches and of a full run."""
+    connection = sqlite3_logica.SqliteConnect()
+    connection.execute("ATTACH DATABASE ':memory:' AS logica_test")
+    connection.execute('CREATE TABLE Events(user, amount, batch)')
+    for batch in [0, 1, 2]:
+      connection.executemany('INSERT INTO Events VALUES (?, ?, ?)',
+                             [e for e in events if e[2] == batch])
+      incremental_result = self.Run(connection, PROGRAM % batch, 'Report')
+    full_result = self.Run(connection, PROGRAM % 0, 'Totals')
+    return incremental_result, full_result
+
+  def testUpdatesComputeTheSameAsFullRun(self):
+    incremental_result, full_result = self.RunBatches(EVENTS)
+    self.assertEqual(incremental_result, full_result)
+    self.assertEqual(full_result,
+                     [('a', 13, 7), ('b', 3, 2), ('c', 3, 3)])
+
+  def testNullKeysAreMerged(self):
+    incremental_result, full_result = self.RunBatches(
+        EVENTS + [(None, 2, 1), (None, 4, 2)])
+    self.assertEqual(incremental_result, full_result)
+    self.assertIn((None, 6, 4), full_result)
+
+  def testAggregationsThatDoNotMergeAreRejected(self):
+    with self.assertRaises(rule_translate.RuleCompileException):
+      incremental.AddIncrementalRules(self.Parse(
+          PROGRAM.replace('Max=', 'List=') % 1))
+
+  def testInputIsCalledOnce(self):
+    with self.assertRaises(rule_translate.RuleCompileException):
+      incremental.AddIncrementalRules(self.Parse("""
+        @Incremental(P, input: E, delta: D);
+        P(x) :- E(x), E(x + 1);
+      """))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Ordering of tables of a rule by their statistics.
+
+Tables of a rule are listed in FROM in the order of the body and engines
+are left to find a good order of joins. Some of them, like SQLite, do not
+know sizes of tables that Logica grounds, and may start a star-shaped join
+with a huge table.
+
+Statistics are row counts of grounded tables and counts of distinct values
+of their columns, which are collected after running each grounding query
+and are kept in a file, by predicate. Tables are then ordered greedily,
+each time taking the table that makes the smallest estimated join with
+the tables taken before, using the usual estimate of size of the join
+|R| * |S| / max(distinct(R.a), distinct(S.a)).
+"""
+
+import json
+import os
+import tempfile
+
+# Estimated row count of a table without statistics.
+DEFAULT_ROW_COUNT = 1000
+# Estimated selectivity of a condition that is not an equality.
+DEFAULT_SELECTIVITY = 1 / 3
+
+
+class TableStatistics(object):
+  """Row counts of tables of predicates and distinct counts of columns."""
+
+  def __init__(self, statistics=None):
+    # Predicate name -> {'rows': int, 'distinct': {column: int}}.
+    self.statistics = statistics or {}
+
+  @classmethod
+  def Load(cls, file_name):
+    """Reads statistics from the file, missing file means no statistics."""
+    try:
+      with open(file_name) as f:
+        statistics = json.load(f)
+    except (OSError, ValueError):
+      return cls()
+    if not isinstance(statistics, dict):
+      return cls()
+    return cls(statistics)
+
+  def Save(self, file_name):
+    """Writes statistics atomically, failing to write is not an error."""
+    directory = os.path.dirname(os.path.abspath(file_name))
+    try:
+      fd, temporary_file_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError:
+      return
+    try:
+      with os.fdopen(fd, 'w') as f:
+        json.dump(self.statistics, f, indent=1, sort_keys=True)
+      os.replace(temporary_file_name, file_name)
+    except OSError:
+      if os.path.exists(temporary_file_name):
+        os.remove(temporary_file_name)
+
+  def Update(self, predicate_name, row_count, distinct_counts):
+    self.statistics[predicate_name] = {'rows': row_count,
+                                       'distinct': distinct_counts}
+
+  def RowCount(self, predicate_name):
+    return self.statistics.get(predicate_name, {}).get('rows')
+
+  def DistinctCount(self, predicate_name, column):
+    return self.statistics.get(predicate_name, {}).get(
+        'distinct', {}).get(column)
+
+  def __bool__(self):
+    return bool(self.statistics)
+
+
+def CollectStatistics(connection, table_name):
+  """Returns row count and distinct counts of columns of the table.
+
+  Args:
+    connection: DB-API connection of the engine.
+    table_name: Table to count.
+  """
+  cursor = connection.cursor()
+  cursor.execute('SELECT * FROM %s LIMIT 0' % table_name)
+  columns = [d[0] for d in cursor.description]
+  cursor.fetchall()
+  counts = ['COUNT(*)'] + ['COUNT(DISTINCT %s)' % c for c in columns]
+  cursor.execute('SELECT %s FROM %s' % (', '.join(counts), table_name))
+  [row] = cursor.fetchall()
+  return row[0], dict(zip(columns, row[1:]))
+
+
+class JoinPlanner(object):
+  """Orders tables of a rule by estimated sizes of joins."""
+
+  def __init__(self, statistics, predicate_of):
+    """Initializes the planner.
+
+    Args:
+      statistics: TableStatistics.
+      predicate_of: Map from table alias to its predicate, in body order.
+    """
+    self.statistics = statistics
+    self.predicate_of = predicate_of
+    # Pairs of (alias, column) that are equal.
+    self.equalities = []
+    self.selectivity = {alias: 1.0 for alias in predicate_of}
+
+  def HasStatistics(self):
+    return any(self.statistics.RowCount(p) is not None
+               for p in self.predicate_of.values())
+
+  def RowCount(self, alias):
+    row_count = self.statistics.RowCount(self.predicate_of[alias])
+    return DEFAULT_ROW_COUNT if row_count is None else row_count
+
+  def DistinctCount(self, alias, column):
+    distinct_count = self.statistics.DistinctCount(self.predicate_of[alias],
+                                                   column)
+    if distinct_count is None:
+      return self.RowCount(alias)
+    return distinct_count
+
+  def AddEquality(self, left, right):
+    """Adds equality of (alias, column) pairs or of a column and a value."""
+    if left is not None and right is not None:
+      if left[0] != right[0]:
+        self.equalities.append((left, right))
+    elif left or right:
+      alias, column = left or right
+      self.selectivity[alias] /= max(1, self.DistinctCount(alias, column))
+
+  def AddCondition(self, alias):
+    self.selectivity[alias] *= DEFAULT_SELECTIVITY
+
+  def JoinSize(self, size, taken, alias):
+    size *= self.RowCount(alias) * self.selectivity[alias]
+    for left, right in self.equalities:
+      for (a, column), (b, other_column) in [(left, right), (right, left)]:
+        if a == alias and b in taken:
+          size /= max(1, self.DistinctCount(a, column),
+                      self.DistinctCount(b, other_column))
+    return size
+
+  def Order(self):
+    """Returns aliases of tables, starting with the smallest join."""
+    remaining = list(self.predicate_of)
+    taken = set()
+    result = []
+    size = 1.0
+    while remaining:
+      # Ties keep the order of the body.
+      alias = min(remaining, key=lambda a: self.JoinSize(size, taken, a))
+      size = self.JoinSize(size, taken, alias)
+      remaining.remove(alias)
+      taken.add(alias)
+      result.append(alias)
+    return result
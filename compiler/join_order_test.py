@@ -0,0 +1,91 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from compiler import join_order
+from compiler import universe
+from parser_py import parse
+
+STATISTICS = {
+    'Big': {'rows': 30000, 'distinct': {'col0': 300, 'col1': 100}},
+    'Mid': {'rows': 2000, 'distinct': {'col0': 100, 'col1': 20}},
+    'Small': {'rows': 1, 'distinct': {'col0': 1}},
+}
+
+PROGRAM = """
+@Engine("sqlite", table_statistics: "%s");
+@Ground(Big); @Ground(Mid); @Ground(Small);
+Big(x, y) :- x in Range(300), y in Range(100);
+Mid(y, z) :- y in Range(100), z in Range(20);
+Small(z) :- z in [3];
+Q(x) distinct :- Big(x, y), Mid(y, z), Small(z);
+"""
+
+
+class JoinOrderTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.statistics_file = os.path.join(self.directory.name, 'stats.json')
+
+  def Planner(self, predicate_of):
+    return join_order.JoinPlanner(join_order.TableStatistics(STATISTICS),
+                                  predicate_of)
+
+  def testJoinStartsWithSmallTables(self):
+    planner = self.Planner({'b': 'Big', 'm': 'Mid', 's': 'Small'})
+    planner.AddEquality(('b', 'col1'), ('m', 'col0'))
+    planner.AddEquality(('m', 'col1'), ('s', 'col0'))
+    self.assertEqual(planner.Order(), ['s', 'm', 'b'])
+
+  def testConditionsMakeTablesSmaller(self):
+    planner = self.Planner({'m': 'Mid', 'b': 'Big'})
+    planner.AddEquality(('b', 'col0'), None)
+    planner.AddCondition('b')
+    self.assertEqual(planner.Order(), ['b', 'm'])
+
+  def testStatisticsAreSavedAndLoaded(self):
+    join_order.TableStatistics(STATISTICS).Save(self.statistics_file)
+    statistics = join_order.TableStatistics.Load(self.statistics_file)
+    self.assertEqual(statistics.RowCount('Mid'), 2000)
+    self.assertEqual(statistics.DistinctCount('Big', 'col1'), 100)
+    self.assertFalse(join_order.TableStatistics.Load(
+        os.path.join(self.directory.name, 'missing.json')))
+
+  def testStatisticsAreCollected(self):
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE T AS SELECT 1 AS a, 2 AS b '
+                       'UNION ALL SELECT 1, 3')
+    self.assertEqual(join_order.CollectStatistics(connection, 'T'),
+                     (2, {'a': 1, 'b': 2}))
+
+  def testTablesAreOrderedByStatistics(self):
+    rules = parse.ParseFile(PROGRAM % self.statistics_file)['rule']
+    sql = universe.LogicaProgram(rules).FormattedPredicateSql('Q')
+    self.assertIn('logica_test.Big AS Big, logica_test.Mid AS Mid', sql)
+    join_order.TableStatistics(STATISTICS).Save(self.statistics_file)
+    sql = universe.LogicaProgram(rules).FormattedPredicateSql('Q')
+    self.assertIn('logica_test.Small AS Small CROSS JOIN '
+                  'logica_test.Mid AS Mid CROSS JOIN logica_test.Big AS Big',
+                  sql)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,452 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Demand-driven rewriting of calls with constant arguments (magic sets).
+
+A call like Reachable("a", y) of a recursive predicate makes the query
+compute all of Reachable and then filter it. Such a call is replaced with
+a call of a copy of the predicate, Reachable_Bound_0, whose rules only
+produce rows with the first argument in Reachable_Demand_0, which starts
+with the constants of the calls.
+
+Conjuncts of bodies of the copied rules bind variables, starting from the
+demanded ones, so calls with bound arguments in them call copies too and
+extend demands of those. Rules of demands only copy conjuncts that call original
+predicates, so demands never depend on copies and recursion of copies
+unfolds to the same depth as recursion of the originals.
+"""
+
+import copy
+
+if '.' not in __package__:
+  from compiler import functors
+  from compiler import rule_translate
+  from parser_py import parse
+else:
+  from ..compiler import functors
+  from ..compiler import rule_translate
+  from ..parser_py import parse
+
+# Arguments of @Recursive that copies of a predicate can share.
+COPYABLE_RECURSION_ARGUMENTS = frozenset([0, 1, 'mode', 'iterative',
+                                          'ignition'])
+
+
+def Variables(expression):
+  def Act(x):
+    if isinstance(x, dict) and 'var_name' in x:
+      return [x['var_name']]
+    return []
+  return functors.Walk(expression, Act)
+
+
+def HasCombine(expression):
+  return bool(functors.Walk(
+      expression, lambda x: ['combine'] if isinstance(x, dict) and
+      'combine' in x else []))
+
+
+def PlainVariable(expression):
+  """Name of the variable, if the expression is a variable, else None.
+
+  Names of variables are fields for positional fields of some rules that
+  the parser generates, so 0 is a name.
+  """
+  if 'variable' in expression and expression['variable']['var_name'] != '_':
+    return expression['variable']['var_name']
+  return None
+
+
+def IsBound(expression, bound):
+  return not HasCombine(expression) and Variables(expression) <= bound
+
+
+def Conjunctions(x):
+  """Lists of conjuncts of all conjunctions in the tree."""
+  result = []
+  if isinstance(x, dict):
+    if 'conjunct' in x.get('conjunction', {}):
+      result.append(x['conjunction']['conjunct'])
+    for v in x.values():
+      result.extend(Conjunctions(v))
+  elif isinstance(x, list):
+    for v in x:
+      result.extend(Conjunctions(v))
+  return result
+
+
+def AnnotationSubject(rule):
+  for field_value in rule['head']['record']['field_value']:
+    if field_value['field'] == 0:
+      literal = field_value['value'].get('expression', {}).get('literal', {})
+      if 'the_predicate' in literal:
+        return literal['the_predicate']['predicate_name']
+  return None
+
+
+def Call(predicate_name, expressions):
+  return {'predicate': {
+      'predicate_name': predicate_name,
+      'record': {'field_value': [
+          {'field': i, 'value': {'expression': copy.deepcopy(e)}}
+          for i, e in enumerate(expressions)]}}}
+
+
+class DemandRewriter(object):
+  """Rewriter of calls with constants into calls of demanded copies."""
+
+  def __init__(self, rules):
+    self.rules = rules
+    self.rules_of = parse.DefinedPredicatesRules(rules)
+    # Annotations @Recursive to copy to copies of predicates.
+    self.recursion_annotations = {}
+    # Predicates that annotations refer to, which are not rewritten.
+    self.annotated = set()
+    self.CollectAnnotations()
+    # Recursive components of predicates.
+    self.component = {}
+    self.worth = self.WorthRewriting()
+    # Copy of predicate and its demand, by predicate and bound fields.
+    self.copies = {}
+    self.copies_to_build = []
+    self.demand_rules = []
+    # Predicates and bound fields that are not worth copying.
+    self.useless = set()
+
+  def CollectAnnotations(self):
+    def PredicateLiterals(x):
+      if isinstance(x, dict) and 'the_predicate' in x:
+        return [x['the_predicate']['predicate_name']]
+      return []
+    for annotation, rules in self.rules_of.items():
+      if not annotation.startswith('@'):
+        continue
+      for rule in rules:
+        mentioned = functors.Walk(rule, PredicateLiterals)
+        subject = AnnotationSubject(rule)
+        if annotation == '@Recursive' and self.IsCopyableRecursion(rule):
+          self.recursion_annotations.setdefault(subject, []).append(rule)
+          mentioned.discard(subject)
+        self.annotated |= mentioned
+
+  def IsCopyableRecursion(self, rule):
+    for field_value in rule['head']['record']['field_value']:
+      if field_value['field'] not in COPYABLE_RECURSION_ARGUMENTS:
+        return False
+      literal = field_value['value'].get('expression', {}).get('literal', {})
+      if (field_value['field'] == 1 and
+          literal.get('the_number', {}).get('number') == '0'):
+        # Recursion that is not unfolded, e.g. for Clingo.
+        return False
+    return True
+
+  def IsEligible(self, predicate_name):
+    if (predicate_name.startswith('@') or
+        predicate_name in self.annotated or
+        predicate_name not in self.rules_of):
+      return False
+    for rule in self.rules_of[predicate_name]:
+      for field_value in rule['head']['record']['field_value']:
+        if field_value['field'] == '*' or 'expression' not in field_value['value']:
+          return False
+      if 'body' in rule and 'conjunction' not in rule['body']:
+        return False
+    return True
+
+  def CalledPredicates(self, rule):
+    def Act(x):
+      if isinstance(x, dict) and 'predicate_name' in x:
+        return [x['predicate_name']]
+      return []
+    result = functors.Walk(rule.get('body'), Act)
+    result |= functors.Walk(rule['head']['record'], Act)
+    return result & set(self.rules_of)
+
+  def WorthRewriting(self):
+    """Eligible predicates that are recursive, or call such predicates."""
+    calls = {}
+    for p, rules in self.rules_of.items():
+      if not p.startswith('@'):
+        calls[p] = set().union(*map(self.CalledPredicates, rules))
+    worth = {}
+    for i, component in enumerate(StronglyConnectedComponents(calls)):
+      recursive = len(component) > 1 or component[0] in calls[component[0]]
+      for p in component:
+        if recursive:
+          self.component[p] = i
+        worth[p] = self.IsEligible(p) and (
+            recursive or any(worth.get(q) for q in calls[p]))
+    return worth
+
+  def Copy(self, predicate_name, fields):
+    """Returns names of copy of the predicate and of its demand, or None."""
+    fields = tuple(sorted(fields, key=str))
+    key = (predicate_name, fields)
+    if key in self.copies:
+      return self.copies[key]
+    if key in self.useless:
+      return None
+    for rule in self.rules_of[predicate_name]:
+      head_fields = {fv['field'] for fv in rule['head']['record']['field_value']}
+      if not set(fields) <= head_fields:
+        return None
+    suffix = '_'.join(map(str, fields))
+    self.copies[key] = (self.NewName(predicate_name + '_Bound_' + suffix),
+                        self.NewName(predicate_name + '_Demand_' + suffix))
+    self.copies_to_build.append(key)
+    return self.copies[key]
+
+  def NewName(self, name):
+    taken = set(self.rules_of) | {n for c in self.copies.values() for n in c}
+    while name in taken:
+      name += '_'
+    return name
+
+  def AddDemandRule(self, demand, expressions, conjuncts, rule):
+    demand_rule = {
+        'head': {'predicate_name': demand,
+                 'record': Call(demand, expressions)['predicate']['record']},
+        'distinct_denoted': True,
+        'full_text': rule['full_text']}
+    if conjuncts:
+      demand_rule['body'] = {
+          'conjunction': {'conjunct': copy.deepcopy(conjuncts)}}
+    self.demand_rules.append(demand_rule)
+
+  def Seeds(self, conjuncts):
+    """Calls of predicates with constant arguments in the conjunction."""
+    constants = {}
+    for c in conjuncts:
+      if 'unification' in c:
+        sides = [c['unification']['left_hand_side'],
+                 c['unification']['right_hand_side']]
+        for variable_side, value_side in [sides, sides[::-1]]:
+          variable = PlainVariable(variable_side)
+          if variable is not None and IsBound(value_side, set()):
+            constants[variable] = value_side
+    result = []
+    for i, c in enumerate(conjuncts):
+      if 'predicate' not in c or not self.worth.get(
+          c['predicate']['predicate_name']):
+        continue
+      values = {}
+      for field_value in c['predicate']['record']['field_value']:
+        expression = field_value['value'].get('expression')
+        if field_value['field'] == '*' or expression is None:
+          continue
+        if IsBound(expression, set()):
+          values[field_value['field']] = expression
+        elif PlainVariable(expression) in constants:
+          values[field_value['field']] = constants[PlainVariable(expression)]
+      if values:
+        result.append((i, values))
+    return result
+
+  def RewriteSeeds(self, rule):
+    if not any(self.Seeds(c) for c in Conjunctions(rule)):
+      return rule
+    rule = copy.deepcopy(rule)
+    for conjuncts in Conjunctions(rule):
+      for i, values in self.Seeds(conjuncts):
+        call = conjuncts[i]['predicate']
+        names = self.Copy(call['predicate_name'], values)
+        if not names:
+          continue
+        copy_name, demand = names
+        call['predicate_name'] = copy_name
+        self.AddDemandRule(
+            demand, [values[f] for f in sorted(values, key=str)], [], rule)
+    return rule
+
+  def CopyRule(self, rule, fields, copy_name, demand):
+    """Returns copy of the rule, adding rules of demands that it makes.
+
+    Calls of predicates of the recursive component of the rule are rewritten
+    only with the bound fields of the copy, so copies form a component like
+    the original one and recursion unfolds to the same depth.
+    """
+    predicate_name = rule['head']['predicate_name']
+    rule = copy.deepcopy(rule)
+    rule['head']['predicate_name'] = copy_name
+    head_values = {fv['field']: fv['value']['expression']
+                   for fv in rule['head']['record']['field_value']}
+    guard_expressions = [head_values[f] for f in fields]
+    guard = Call(demand, guard_expressions)
+    conjuncts = rule.get('body', {}).get('conjunction', {}).get('conjunct', [])
+    # Conjuncts that rules of demands can use are all conjuncts, except calls
+    # of the predicates that are rewritten, in any order.
+    known = [guard]
+    bound = {PlainVariable(e) for e in guard_expressions} - {None}
+    unknown = [c for c in conjuncts if not self.IsRewritableCall(c)]
+    while True:
+      newly_known = [c for c in unknown if self.CanBind(c, bound) is not None]
+      if not newly_known:
+        break
+      for c in newly_known:
+        known.append(c)
+        unknown.remove(c)
+        bound |= self.CanBind(c, bound)
+    for c in conjuncts:
+      if not self.IsRewritableCall(c):
+        continue
+      call = c['predicate']
+      values = {fv['field']: fv['value']['expression']
+                for fv in call['record']['field_value']
+                if fv['field'] != '*' and 'expression' in fv['value'] and
+                IsBound(fv['value']['expression'], bound)}
+      if self.InComponent(call['predicate_name'], predicate_name):
+        if not set(fields) <= set(values):
+          continue
+        values = {f: values[f] for f in fields}
+      names = values and self.Copy(call['predicate_name'], values)
+      if not names:
+        continue
+      call['predicate_name'], call_demand = names
+      expressions = [values[f] for f in sorted(values, key=str)]
+      # Demanding what was demanded adds nothing.
+      is_trivial = (
+          call_demand == demand and
+          [PlainVariable(e) for e in expressions] ==
+          [PlainVariable(e) for e in guard_expressions])
+      if not is_trivial:
+        self.AddDemandRule(call_demand, expressions, known, rule)
+    if 'body' not in rule:
+      rule['body'] = {'conjunction': {'conjunct': []}}
+    rule['body']['conjunction']['conjunct'] = [guard] + conjuncts
+    return rule
+
+  def IsRewritableCall(self, conjunct):
+    return ('predicate' in conjunct and
+            self.worth.get(conjunct['predicate']['predicate_name']))
+
+  def CanBind(self, conjunct, bound):
+    """Variables that the conjunct binds, or None if it needs unbound ones."""
+    if 'predicate' in conjunct:
+      call = conjunct['predicate']
+      if call['predicate_name'] in rule_translate.CONSTRAINT_PREDICATES:
+        return set() if IsBound(call['record'], bound) else None
+      arguments = {PlainVariable(fv['value']['expression'])
+                   for fv in call['record']['field_value']
+                   if 'expression' in fv['value']} - {None}
+      if IsBound(call['record'], bound | arguments | {'_'}):
+        return arguments
+    elif 'unification' in conjunct:
+      sides = [conjunct['unification']['left_hand_side'],
+               conjunct['unification']['right_hand_side']]
+      for variable_side, value_side in [sides, sides[::-1]]:
+        variable = PlainVariable(variable_side)
+        if IsBound(value_side, bound) and (
+            variable is not None or IsBound(variable_side, bound)):
+          return {variable} - {None}
+    return None
+
+  def InComponent(self, predicate_name, other_predicate_name):
+    """Whether the predicates are in the same recursive component."""
+    return (predicate_name in self.component and
+            self.component.get(other_predicate_name) ==
+            self.component[predicate_name])
+
+  def CallsOwnComponent(self, rule, predicate_name):
+    """Whether the copied rule calls originals of its recursive component."""
+    return any(self.InComponent(p, predicate_name)
+               for p in self.CalledPredicates(rule))
+
+  def CopyAnnotation(self, annotation, predicate_name):
+    annotation = copy.deepcopy(annotation)
+    for field_value in annotation['head']['record']['field_value']:
+      if field_value['field'] == 0:
+        field_value['value']['expression']['literal']['the_predicate'][
+            'predicate_name'] = predicate_name
+    return annotation
+
+  def Rewrite(self):
+    # Copies that would call the whole recursion they are part of, e.g. in
+    # non-linear recursion, only add work. Rewriting starts over without them.
+    while True:
+      self.copies = {}
+      self.copies_to_build = []
+      self.demand_rules = []
+      result = [r if r['head']['predicate_name'].startswith('@')
+                else self.RewriteSeeds(r) for r in self.rules]
+      if not self.copies:
+        return self.rules
+      useless = set()
+      while self.copies_to_build:
+        key = self.copies_to_build.pop(0)
+        predicate_name, fields = key
+        copy_name, demand = self.copies[key]
+        for rule in self.rules_of[predicate_name]:
+          copied_rule = self.CopyRule(rule, fields, copy_name, demand)
+          if self.CallsOwnComponent(copied_rule, predicate_name):
+            useless.add(key)
+          result.append(copied_rule)
+        for annotation in self.recursion_annotations.get(predicate_name, []):
+          result.append(self.CopyAnnotation(annotation, copy_name))
+          result.append(self.CopyAnnotation(annotation, demand))
+      if not useless:
+        break
+      self.useless |= useless
+    # Demands with several rules are distinct, which needs an auxiliary
+    # predicate, as the parser does for predicates of the program.
+    return result + parse.MultiBodyAggregation.Rewrite(self.demand_rules)
+
+
+def StronglyConnectedComponents(graph):
+  """Components of the graph, each after components it points to."""
+  index = {}
+  low = {}
+  stack = []
+  on_stack = set()
+  result = []
+  for root in graph:
+    if root in index:
+      continue
+    work = [(root, iter(graph[root]))]
+    index[root] = low[root] = len(index)
+    stack.append(root)
+    on_stack.add(root)
+    while work:
+      node, children = work[-1]
+      child = next(children, None)
+      if child is not None:
+        if child not in graph:
+          continue
+        if child not in index:
+          index[child] = low[child] = len(index)
+          stack.append(child)
+          on_stack.add(child)
+          work.append((child, iter(graph[child])))
+        elif child in on_stack:
+          low[node] = min(low[node], index[child])
+        continue
+      work.pop()
+      if work:
+        low[work[-1][0]] = min(low[work[-1][0]], low[node])
+      if low[node] == index[node]:
+        component = []
+        while True:
+          member = stack.pop()
+          on_stack.discard(member)
+          component.append(member)
+          if member == node:
+            break
+        result.append(component)
+  return result
+
+
+def RewriteDemandedCalls(rules):
+  """Returns rules with calls with constants rewritten to demanded copies."""
+  return DemandRewriter(rules).Rewrite()
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import unittest
+from unittest import mock
+
+from compiler import magic_sets
+from compiler import universe
+from parser_py import parse
+
+EDGES = """
+@Engine("sqlite");
+Edge(a, b) :- a in Range(30), b == a + 1;
+"""
+
+RIGHT_RECURSION = EDGES + """
+R(x, y) distinct :- Edge(x, y);
+R(x, z) distinct :- Edge(x, y), R(y, z);
+Q(y) :- R(25, y);
+"""
+
+
+class MagicSetsTest(unittest.TestCase):
+  def Parse(self, program):
+    return parse.ParseFile(program)['rule']
+
+  def PredicateNames(self, rules):
+    return {r['head']['predicate_name'] for r in rules}
+
+  def Run(self, program, predicate, rewrite=True):
+    rules = self.Parse(program)
+    if rewrite:
+      sql = universe.LogicaProgram(rules).FormattedPredicateSql(predicate)
+    else:
+      with mock.patch.object(magic_sets, 'RewriteDemandedCalls',
+                             lambda rules: rules):
+        sql = universe.LogicaProgram(rules).FormattedPredicateSql(predicate)
+    return sorted(sqlite3.connect(':memory:').execute(sql).fetchall())
+
+  def testCallWithConstantCallsCopy(self):
+    rules = magic_sets.RewriteDemandedCalls(self.Parse(RIGHT_RECURSION))
+    self.assertLessEqual({'R_Bound_0', 'R_Demand_0'},
+                         self.PredicateNames(rules))
+    q = [r for r in rules if r['head']['predicate_name'] == 'Q']
+    self.assertEqual(
+        q[0]['body']['conjunction']['conjunct'][0]['predicate'][
+            'predicate_name'], 'R_Bound_0')
+
+  def testRewrittenProgramComputesTheSame(self):
+    self.assertEqual(self.Run(RIGHT_RECURSION, 'Q'),
+                     [(26,), (27,), (28,), (29,), (30,)])
+    left_recursion = EDGES + """
+    @Recursive(R, 10);
+    R(x, y) distinct :- Edge(x, y);
+    R(x, z) distinct :- R(x, y), Edge(y, z);
+    Q(x) :- R(x, 20);
+    """
+    self.assertEqual(self.Run(left_recursion, 'Q'),
+                     self.Run(left_recursion, 'Q', rewrite=False))
+
+  def testNonlinearRecursionIsNotRewritten(self):
+    rules = self.Parse(EDGES + """
+    R(x, y) distinct :- Edge(x, y);
+    R(x, z) distinct :- R(x, y), R(y, z);
+    Q(y) :- R(25, y);
+    """)
+    self.assertIs(magic_sets.RewriteDemandedCalls(rules), rules)
+
+  def testAnnotatedPredicatesAreNotRewritten(self):
+    rules = self.Parse(RIGHT_RECURSION + '@Ground(R);')
+    self.assertIs(magic_sets.RewriteDemandedCalls(rules), rules)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -23,10 +23,14 @@ import sys
 
 if '.' not in __package__:
   from common import color
+  from compiler import cyclic_joins
   from compiler import expr_translate
+  from compiler import join_order
 else:
   from ..common import color
+  from ..compiler import cyclic_joins
   from ..compiler import expr_translate
+  from ..compiler import join_order
 
 xrange = range
 
@@ -127,6 +131,88 @@ def ReplaceVariable(old_var, new_expr, s):
         ReplaceVariable(old_var, new_expr, k)
 
 
+class VariableSubstitution(object):
+  """Substitution of variables with expressions, applied lazily.
+
+  Expressions that variables are bound to may mention variables bound later,
+  so value of an expression is what it becomes after all the substitutions.
+  Variables mentioned by sides of unifications are kept up to date via index
+  of their occurrences, so that binding a variable touches only the sides
+  mentioning it. Apply() rewrites expressions once all is bound.
+  """
+
+  def __init__(self, unifications):
+    self.bound = {}
+    # Side of a unification -> [variables, variables including combines].
+    self.side_variables = {}
+    # Variable -> sides of unifications that mention it.
+    self.occurrences = collections.defaultdict(set)
+    for u in unifications:
+      for k in ['left', 'right']:
+        side = (id(u), k)
+        self.side_variables[side] = [
+            AllMentionedVariables(u[k]),
+            AllMentionedVariables(u[k], dive_in_combines=True)]
+        for v in self.side_variables[side][1]:
+          self.occurrences[v].add(side)
+
+  def Current(self, e):
+    """Returns the expression, substituting it if it's a bound variable."""
+    while (isinstance(e, dict) and 'variable' in e and
+           e['variable']['var_name'] in self.bound):
+      e = self.bound[e['variable']['var_name']]
+    return e
+
+  def Equal(self, a, b):
+    a = self.Current(a)
+    b = self.Current(b)
+    if a is b:
+      return True
+    if isinstance(a, dict) and isinstance(b, dict):
+      return (a.keys() == b.keys() and
+              all(self.Equal(a[k], b[k]) for k in a))
+    if isinstance(a, list) and isinstance(b, list):
+      return (len(a) == len(b) and
+              all(self.Equal(x, y) for x, y in zip(a, b)))
+    return a == b
+
+  def Variables(self, u, k, dive_in_combines=False):
+    """Variables that side k of unification u mentions."""
+    return self.side_variables[(id(u), k)][1 if dive_in_combines else 0]
+
+  def Bind(self, variable, expression, variables):
+    """Binds variable to expression, which mentions given variables.
+
+    Args:
+      variable: Name of the variable.
+      expression: Expression to substitute the variable with.
+      variables: Pair of variables mentioned by the expression, excluding
+        and including combines.
+    """
+    self.bound[variable] = expression
+    for side in self.occurrences.pop(variable, ()):
+      side_variables, side_variables_incl_combines = self.side_variables[side]
+      if variable in side_variables:
+        side_variables.discard(variable)
+        side_variables |= variables[0]
+      side_variables_incl_combines.discard(variable)
+      side_variables_incl_combines |= variables[1]
+      for v in variables[1]:
+        self.occurrences[v].add(side)
+
+  def Apply(self, s, visited=None):
+    """Substitutes bound variables in expression s, in place."""
+    visited = set() if visited is None else visited
+    if id(s) in visited:
+      return
+    visited.add(id(s))
+    member_index = s.keys() if isinstance(s, dict) else range(len(s))
+    for k in member_index:
+      s[k] = self.Current(s[k])
+      if isinstance(s[k], (dict, list)):
+        self.Apply(s[k], visited)
+
+
 class NamesAllocator(object):
   """Allocator of unique names for tables and variables.
 
@@ -289,7 +375,7 @@ class RuleStructure(object):
             self.full_rule_text)
     self.unnestings = ordered_unnestings
 
-  def ReplaceVariableEverywhere(self, u_left, u_right):
+  def LogSynonym(self, u_left, u_right):
     if 'variable' in u_right:
       l = self.synonym_log.get(u_right['variable']['var_name'], [])
       l.append(LogicalVariable(variable_name=u_left,
@@ -300,51 +386,60 @@ class RuleStructure(object):
                                                  not u_left.startswith('x_'))))
       l.extend(self.synonym_log.get(u_left, []))
       self.synonym_log[u_right['variable']['var_name']] = l
-    ReplaceVariable(u_left, u_right, self.unnestings)
-    ReplaceVariable(u_left, u_right, self.select)
-    ReplaceVariable(u_left, u_right, self.vars_unification)
-    ReplaceVariable(u_left, u_right, self.constraints)
-    
+
   # TODO: Parameter unfold_recods just patches some bug. Careful review is needed.
   def ElliminateInternalVariables(self, assert_full_ellimination=False, unfold_records=True):
-    """Elliminates internal variables via substitution."""
+    """Elliminates internal variables via substitution.
+
+    Variables are bound in a substitution, which is applied to the rule
+    once nothing more can be bound.
+    """
     variables = self.InternalVariables()
+    extracted_variables = self.ExtractedVariables()
+    substitution = VariableSubstitution(self.vars_unification)
+    current = substitution.Current
     while True:
       done = True
       self.vars_unification = [
-          u for u in self.vars_unification if u['left'] != u['right']]
+          u for u in self.vars_unification
+          if not substitution.Equal(u['left'], u['right'])]
       for u in self.vars_unification:
         # Direct variable assignments.
         for k, r in [['left', 'right'], ['right', 'left']]:
-          if u[k] == u[r]:
+          if substitution.Equal(u[k], u[r]):
             continue
-          ur_variables = AllMentionedVariables(u[r])
-          ur_variables_incl_combines = AllMentionedVariables(
-              u[r], dive_in_combines=True)
-          if (isinstance(u[k], dict) and
-              'variable' in u[k] and
-              u[k]['variable']['var_name'] in variables and
-              u[k]['variable']['var_name'] not in ur_variables_incl_combines and
+          ur_variables = substitution.Variables(u, r)
+          ur_variables_incl_combines = substitution.Variables(
+              u, r, dive_in_combines=True)
+          u_k = current(u[k])
+          if (isinstance(u_k, dict) and
+              'variable' in u_k and
+              u_k['variable']['var_name'] in variables and
+              u_k['variable']['var_name'] not in ur_variables_incl_combines and
               (
-                  ur_variables <= self.ExtractedVariables() or
-                  not str(u[k]['variable']['var_name']).startswith('x_'))):
-            u_left = u[k]['variable']['var_name']
-            u_right = u[r]
-            self.ReplaceVariableEverywhere(u_left, u_right)
+                  ur_variables <= extracted_variables or
+                  not str(u_k['variable']['var_name']).startswith('x_'))):
+            u_left = u_k['variable']['var_name']
+            u_right = current(u[r])
+            self.LogSynonym(u_left, u_right)
+            substitution.Bind(u_left, u_right,
+                              (ur_variables, ur_variables_incl_combines))
             done = False
         # Assignments to variables in record fields.
         if unfold_records:  # Confirm that unwraping works and make this unconditional.
           # Unwrapping goes wild sometimes. Letting it go right to left only.
           # for k, r in [['left', 'right']]:
           for k, r in [['left', 'right'], ['right', 'left']]:
-            if u[k] == u[r]:
+            if substitution.Equal(u[k], u[r]):
               continue
-            ur_variables = AllMentionedVariables(u[r])
-            ur_variables_incl_combines = AllMentionedVariables(
-                u[r], dive_in_combines=True)
-            if (isinstance(u[k], dict) and
-                'record' in u[k] and
-                ur_variables <= self.ExtractedVariables()):
+            ur_variables = substitution.Variables(u, r)
+            ur_variables_incl_combines = set(substitution.Variables(
+                u, r, dive_in_combines=True))
+            if (isinstance(current(u[k]), dict) and
+                'record' in current(u[k]) and
+                ur_variables <= extracted_variables):
+              source_variables = (set(ur_variables),
+                                  ur_variables_incl_combines)
               def AssignToRecord(target, source):
                 global done
                 for fv in target['record']['field_value']:
@@ -355,23 +450,29 @@ class RuleStructure(object):
                         'subscript': {'literal': {'the_symbol': {'symbol': fv['field']}}}
                       }
                     }
-                  if ('variable' in fv['value']['expression'] and
-                      fv['value']['expression']['variable']['var_name']
-                        in variables and
-                      fv['value']['expression']['variable']['var_name']
+                  expression = current(fv['value']['expression'])
+                  if ('variable' in expression and
+                      expression['variable']['var_name'] in variables and
+                      expression['variable']['var_name']
                         not in ur_variables_incl_combines):
-                    u_left = fv['value']['expression']['variable']['var_name']
+                    u_left = expression['variable']['var_name']
                     u_right = MakeNewSource()
-                    self.ReplaceVariableEverywhere(u_left, u_right)
+                    self.LogSynonym(u_left, u_right)
+                    substitution.Bind(u_left, u_right, source_variables)
                     done = False
-                  if 'record' in fv['value']['expression']:
-                    new_target = fv['value']['expression']
+                  expression = current(fv['value']['expression'])
+                  if 'record' in expression:
+                    new_target = expression
                     new_source = MakeNewSource()
                     AssignToRecord(new_target, new_source)
 
-              AssignToRecord(u[k], u[r])
+              AssignToRecord(current(u[k]), current(u[r]))
       
       if done:
+        applied = set()
+        for structure in [self.unnestings, self.select,
+                          self.vars_unification, self.constraints]:
+          substitution.Apply(structure, applied)
         variables = self.InternalVariables()
         if assert_full_ellimination:
           if True:
@@ -482,10 +583,105 @@ class RuleStructure(object):
           }
       })
 
+  def TableColumn(self, expression):
+    """Returns (table, column) of a variable of a table, or None."""
+    if 'variable' not in expression:
+      return None
+    table, field = self.inv_vars_map.get(
+        expression['variable']['var_name'], (None, None))
+    if table not in self.tables or field == '*':
+      return None
+    return table, LogicaFieldToSqlField(field)
+
+  def TableOrder(self, execution):
+    """Order of tables by their statistics, or None to keep body order."""
+    if not execution.table_statistics or len(self.tables) < 2:
+      return None
+    planner = join_order.JoinPlanner(execution.table_statistics, self.tables)
+    if not planner.HasStatistics():
+      return None
+    for c in self.constraints:
+      call = c['call']
+      arguments = {fv['field']: fv['value']['expression']
+                   for fv in call['record']['field_value']}
+      if call['predicate_name'] == '==':
+        left, right = arguments['left'], arguments['right']
+        left_column, right_column = (self.TableColumn(left),
+                                     self.TableColumn(right))
+        if ((left_column or not AllMentionedVariables(left)) and
+            (right_column or not AllMentionedVariables(right))):
+          planner.AddEquality(left_column, right_column)
+          continue
+      tables = {self.inv_vars_map[v][0]
+                for v in AllMentionedVariables(call)
+                if v in self.inv_vars_map} & set(self.tables)
+      if len(tables) == 1:
+        planner.AddCondition(tables.pop())
+    order = planner.Order()
+    if execution.dialect.LargestTableFirst():
+      order = order[::-1]
+    if order == list(self.tables):
+      return None
+    return order
+
+  def ColumnEqualities(self):
+    """Pairs of (table, column) that constraints of the rule equate."""
+    result = []
+    for c in self.constraints:
+      if c['call']['predicate_name'] != '==':
+        continue
+      left, right = self.EqualityColumns(c['call'])
+      if left and right and left[0] != right[0]:
+        result.append((left, right))
+    return result
+
+  def EqualityColumns(self, call):
+    """(table, column) pairs of sides of an equality, or None for each."""
+    arguments = {fv['field']: fv['value']['expression']
+                 for fv in call['record']['field_value']}
+    return (self.TableColumn(arguments['left']),
+            self.TableColumn(arguments['right']))
+
+  def JoinTriangle(self, execution):
+    """Triangle of tables to join by degrees of values, or None."""
+    if not execution.dialect.PartitionsTriangles() or len(self.tables) < 3:
+      return None
+    triangle = cyclic_joins.FindTriangle(list(self.tables),
+                                         self.ColumnEqualities())
+    if not triangle:
+      return None
+    for table, field in self.inv_vars_map.values():
+      if (table in triangle.Aliases() and
+          (field == '*' or ExceptExpression.Recognize(str(field)))):
+        return None
+    return triangle
+
+  def TriangleColumns(self, triangle):
+    """Columns of tables of the triangle that the rule uses."""
+    result = []
+    for table, field in self.inv_vars_map.values():
+      if table in triangle.Aliases():
+        result.append((table, LogicaFieldToSqlField(field)))
+    for (table, variable), column in sorted(triangle.columns.items()):
+      result.append((table, column))
+    return list(collections.OrderedDict.fromkeys(result))
+
   def AsSql(self, subquery_encoder=None, flag_values=None):
     """Outputing SQL representing this structure."""
+    vocabulary = self.VarsVocabulary()
+    triangle = self.JoinTriangle(subquery_encoder.execution)
+    if triangle:
+      # Tables of the triangle are joined in a subquery, which selects
+      # their columns.
+      triangle_table = self.allocator.AllocateTable()
+      for k, (table, field) in self.inv_vars_map.items():
+        if (table in triangle.Aliases() and
+            k not in (self.external_vocabulary or {})):
+          vocabulary[k] = '%s.%s' % (
+              triangle_table,
+              cyclic_joins.OutputColumn(table, LogicaFieldToSqlField(field)))
     # pylint: disable=g-long-lambda
-    ql = expr_translate.QL(self.VarsVocabulary(), subquery_encoder,
+    ql = expr_translate.QL(vocabulary, subquery_encoder,
                            lambda message:
                            RuleCompileException(message, self.full_rule_text),
                            flag_values,
@@ -518,7 +714,11 @@ class RuleStructure(object):
         self.constraints or self.distinct_denoted):
       r += '\nFROM\n'
       tables = []
-      for k, v in self.tables.items():
+      table_order = (None if triangle else
+                     self.TableOrder(subquery_encoder.execution))
+      triangle_sql = {}
+      for k in table_order or self.tables:
+        v = self.tables[k]
         if subquery_encoder:
           # Note that we are passing external_vocabulary, not VarsVocabulary
           # here. I.e. if this is a sub-query then variables of outer tables
@@ -532,10 +732,24 @@ class RuleStructure(object):
                     '{warning}\'testrun\'{end} mode. This error may come '
                     'from injected sub-rules.',
                     dict(table=v)), self.full_rule_text)
-        if sql != k:
+        if triangle and k in triangle.Aliases():
+          triangle_sql[k] = sql
+          if len(triangle_sql) < 3:
+            continue
+          tables.append('%s AS %s' % (
+              triangle.Sql(
+                  triangle_sql, self.TriangleColumns(triangle),
+                  subquery_encoder.execution.dialect.OrderedJoinSeparator(),
+                  self.allocator.AllocateTable),
+              triangle_table))
+        elif sql != k:
           tables.append(sql + ' AS ' + k)
         else:
           tables.append(sql)
+      if table_order:
+        # Dialects may need a hint to keep the order.
+        tables = [subquery_encoder.execution.dialect.OrderedJoinSeparator()
+                  .join(tables)]
       self.SortUnnestings()
       for element, the_list in self.unnestings:
         if 'variable' in element:
@@ -554,8 +768,12 @@ class RuleStructure(object):
         constraints = []
         # Predicates used for type inference.
         ephemeral_predicates = ['~']
+        # Joins of the triangle are in its subquery.
+        joined = (triangle.Joins if triangle else lambda left, right: False)
         for c in self.constraints:
-          if c['call']['predicate_name'] not in ephemeral_predicates:
+          if (c['call']['predicate_name'] not in ephemeral_predicates and
+              not (c['call']['predicate_name'] == '==' and
+                   joined(*self.EqualityColumns(c['call'])))):
             constraints.append(ql.ConvertToSql(c))
         if constraints:
           r += '\nWHERE\n'
@@ -583,13 +801,17 @@ class RuleStructure(object):
     return r
 
 
+# Predicates that are conditions on their arguments, rather than tables.
+CONSTRAINT_PREDICATES = frozenset([
+    '<=', '<', '>', '>=', '!=', '&&', '||', '!', 'IsNull', 'Like',
+    'Constraint', 'is', 'is not', '~'])
+
+
 def ExtractPredicateStructure(c, s):
   """Updating RuleStructure s with a predicate call."""
   predicate = c['predicate_name']
 
-  if predicate in (
-      '<=', '<', '>', '>=', '!=', '&&', '||', '!', 'IsNull', 'Like',
-      'Constraint', 'is', 'is not', '~'):
+  if predicate in CONSTRAINT_PREDICATES:
     s.constraints.append({'call': c})
     return
 
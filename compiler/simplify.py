@@ -0,0 +1,377 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Folding of constant expressions of rules before they are rendered.
+
+Functor arguments, flags and injected predicates leave rules with
+conditions like 1 == 1, arithmetic of constants and if-then-else chains
+with constant conditions, which engines then evaluate for every row.
+Expressions are folded where their value does not depend on the engine:
+arithmetic of integers, comparisons of numbers, equality of strings and
+logic of booleans, with null propagating as in SQL. Conditions that fold
+to true are removed, and a condition that folds to false or null proves
+that the rule has no rows.
+"""
+
+import copy
+import re
+
+# Value of an expression that is not a constant.
+NOT_CONSTANT = object()
+
+# Bounds of integers that all engines represent exactly.
+MIN_INT64 = -2 ** 63
+MAX_INT64 = 2 ** 63 - 1
+
+COMPARISONS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+# Calls in bodies of rules that are conditions that Fold may decide.
+CONDITIONS = frozenset(['<=', '<', '>', '>=', '!=', '&&', '||', '!',
+                        'IsNull', 'Constraint'])
+
+ARITHMETICS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+}
+
+
+def IsInteger(value):
+  return isinstance(value, int) and not isinstance(value, bool)
+
+
+def IsNumber(value):
+  return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def LiteralValue(expression):
+  """Python value of a literal number, string, boolean or null."""
+  literal = expression.get('literal') if isinstance(expression, dict) else None
+  if not literal:
+    return NOT_CONSTANT
+  if 'the_number' in literal:
+    number = str(literal['the_number']['number'])
+    if re.fullmatch(r'-?[0-9]+', number):
+      return int(number)
+    try:
+      return float(number)
+    except ValueError:
+      return NOT_CONSTANT
+  if 'the_string' in literal:
+    return str(literal['the_string']['the_string'])
+  if 'the_bool' in literal:
+    return literal['the_bool']['the_bool'] == 'true'
+  if 'the_null' in literal:
+    return None
+  return NOT_CONSTANT
+
+
+def Literal(value):
+  """Literal expression of the value."""
+  if value is None:
+    return {'literal': {'the_null': {'the_null': 'null'}}}
+  if isinstance(value, bool):
+    return {'literal': {'the_bool': {'the_bool': 'true' if value else 'false'}}}
+  if isinstance(value, int):
+    return {'literal': {'the_number': {'number': str(value)}}}
+  assert isinstance(value, str), value
+  return {'literal': {'the_string': {'the_string': value}}}
+
+
+def Arguments(call):
+  return {fv['field']: fv['value']['expression']
+          for fv in call['record']['field_value']
+          if 'expression' in fv['value']}
+
+
+def IsSameVariable(left, right):
+  return ('variable' in left and 'variable' in right and
+          left['variable']['var_name'] == right['variable']['var_name'])
+
+
+def Negation(expression):
+  return {'call': {'predicate_name': '!', 'record': {'field_value': [
+      {'field': 0, 'value': {'expression': expression}}]}}}
+
+
+def IsNullCall(expression):
+  return {'call': {'predicate_name': 'IsNull', 'record': {'field_value': [
+      {'field': 0, 'value': {'expression': expression}}]}}}
+
+
+def FoldCall(name, arguments):
+  """Value of a call of a built-in on the arguments, or NOT_CONSTANT.
+
+  Args:
+    name: Name of the called function or operator.
+    arguments: Map from fields to folded expressions of arguments.
+
+  Returns:
+    A Python value of the call, an expression that the call simplifies to,
+    wrapped in a tuple, or NOT_CONSTANT.
+  """
+  values = {k: LiteralValue(v) for k, v in arguments.items()}
+  left, right = values.get('left', NOT_CONSTANT), values.get(
+      'right', NOT_CONSTANT)
+  if name in ('&&', '||') and set(values) == {'left', 'right'}:
+    dominant = (name == '||')
+    for side, other in [('left', 'right'), ('right', 'left')]:
+      if values[side] is dominant:
+        return dominant
+      if values[side] is (not dominant):
+        return (arguments[other],)
+    return NOT_CONSTANT
+  if name == '!' and set(values) == {0}:
+    if values[0] is None or isinstance(values[0], bool):
+      return None if values[0] is None else not values[0]
+    return NOT_CONSTANT
+  if name == 'IsNull' and set(values) == {0}:
+    if values[0] is NOT_CONSTANT:
+      return NOT_CONSTANT
+    return values[0] is None
+  if name == 'Constraint' and set(values) == {0}:
+    return (arguments[0],)
+  # Value of an unnested variable is a column of the unnested table. The
+  # literal is kept as written, as floats have no Literal.
+  if (name == 'ValueOfUnnested' and set(values) == {0} and
+      values[0] is not NOT_CONSTANT):
+    return (arguments[0],)
+  if name == '-' and set(values) == {0}:
+    if IsInteger(values[0]) and MIN_INT64 < values[0] <= MAX_INT64:
+      return -values[0]
+    return NOT_CONSTANT
+  if set(values) != {'left', 'right'}:
+    return NOT_CONSTANT
+  if name == 'in':
+    the_list = arguments['right'].get('literal', {}).get('the_list')
+    if the_list is not None and len(the_list.get('element', [])) == 1:
+      [element] = the_list['element']
+      return FoldCall('==', {'left': arguments['left'], 'right': element})
+    return NOT_CONSTANT
+  if left is NOT_CONSTANT or right is NOT_CONSTANT:
+    return NOT_CONSTANT
+  if name in COMPARISONS or name in ARITHMETICS or name == '++':
+    if left is None or right is None:
+      return None
+  if name in COMPARISONS:
+    if IsNumber(left) and IsNumber(right):
+      return COMPARISONS[name](left, right)
+    # Order of strings depends on collation of the engine.
+    if name in ('==', '!=') and any(
+        isinstance(left, t) and isinstance(right, t) for t in (str, bool)):
+      return COMPARISONS[name](left, right)
+    return NOT_CONSTANT
+  if name in ARITHMETICS:
+    # Division and floats are not folded, as engines differ on them.
+    if IsInteger(left) and IsInteger(right):
+      result = ARITHMETICS[name](left, right)
+      if MIN_INT64 <= result <= MAX_INT64:
+        return result
+    return NOT_CONSTANT
+  if name == '++' and isinstance(left, str) and isinstance(right, str):
+    return left + right
+  return NOT_CONSTANT
+
+
+def Fold(expression, constants=None):
+  """Returns the expression with constant subexpressions folded.
+
+  The expression is not modified, folded parts are new.
+
+  Args:
+    expression: Expression syntax tree.
+    constants: Map from names of functions without arguments to literals
+      that they are equal to.
+  """
+  constants = constants or {}
+  if not isinstance(expression, dict):
+    return expression
+  if 'call' in expression:
+    call = expression['call']
+    if call['predicate_name'] in constants and not call['record'][
+        'field_value']:
+      return copy.deepcopy(constants[call['predicate_name']])
+    field_values = []
+    for field_value in call['record']['field_value']:
+      value = field_value['value']
+      if 'expression' in value:
+        value = dict(value, expression=Fold(value['expression'], constants))
+      field_values.append(dict(field_value, value=value))
+    folded = dict(expression, call=dict(
+        call, record=dict(call['record'], field_value=field_values)))
+    result = FoldCall(call['predicate_name'], Arguments(folded['call']))
+    if result is NOT_CONSTANT:
+      return folded
+    if isinstance(result, tuple):
+      [result] = result
+      return result
+    return WithType(Literal(result), expression)
+  if 'implication' in expression:
+    implication = expression['implication']
+    if_then = []
+    for clause in implication['if_then']:
+      condition = Fold(clause['condition'], constants)
+      value = LiteralValue(condition)
+      # Conditions that are false or null are never taken.
+      if value is False or value is None:
+        continue
+      consequence = Fold(clause['consequence'], constants)
+      if value is True:
+        if not if_then:
+          return consequence
+        otherwise = consequence
+        break
+      if_then.append({'condition': condition, 'consequence': consequence})
+    else:
+      otherwise = Fold(implication['otherwise'], constants)
+    if not if_then:
+      return otherwise
+    return dict(expression, implication={'if_then': if_then,
+                                         'otherwise': otherwise})
+  return expression
+
+
+def WithType(literal, expression):
+  if 'type' in expression:
+    literal['type'] = expression['type']
+  return literal
+
+
+def IsFalse(expression):
+  """Whether a condition is false or null, i.e. filters all rows."""
+  value = LiteralValue(expression)
+  return value is False or value is None
+
+
+def IsTrue(expression):
+  return LiteralValue(expression) is True
+
+
+def FalseConstraint():
+  return {'call': {'predicate_name': 'Constraint', 'record': {'field_value': [
+      {'field': 0, 'value': {'expression': Literal(False)}}]}}}
+
+
+def Substitute(x, var_name, expression):
+  """Returns copy of x with the variable replaced by the expression."""
+  if isinstance(x, list):
+    return [Substitute(v, var_name, expression) for v in x]
+  if isinstance(x, dict):
+    if 'variable' in x and x['variable']['var_name'] == var_name:
+      return copy.deepcopy(expression)
+    return {k: Substitute(v, var_name, expression) for k, v in x.items()}
+  return x
+
+
+def ReplaceSingletonUnnestings(s):
+  """Replaces elements of literal lists of one scalar with the scalar."""
+  for element, the_list in list(s.unnestings):
+    elements = the_list.get('literal', {}).get('the_list', {}).get('element')
+    if ('variable' not in element or not elements or len(elements) != 1 or
+        LiteralValue(elements[0]) in (NOT_CONSTANT, None)):
+      continue
+    var_name = element['variable']['var_name']
+    s.unnestings = [u for u in s.unnestings if u[0] is not element]
+    s.unnestings = Substitute(s.unnestings, var_name, elements[0])
+    s.constraints = Substitute(s.constraints, var_name, elements[0])
+    for k, v in list(s.select.items()):
+      s.select[k] = Substitute(v, var_name, elements[0])
+
+
+def SimplifyStructure(s, keep_unnestings=False):
+  """Folds constants of a RuleStructure, returns whether it has no rows.
+
+  Args:
+    s: RuleStructure with variables eliminated and unifications turned
+      into constraints, which is modified.
+    keep_unnestings: Whether to keep unnestings of lists of one element,
+      which combines use to keep their aggregation in their own scope, see
+      dialects.DecorateCombineRule.
+  """
+  if not keep_unnestings:
+    ReplaceSingletonUnnestings(s)
+  for k, v in list(s.select.items()):
+    s.select[k] = Fold(v)
+  constraints = []
+  for c in s.constraints:
+    folded = Fold(c)
+    if IsTrue(folded):
+      continue
+    if IsFalse(folded):
+      s.constraints = [FalseConstraint()]
+      return True
+    if 'call' not in folded:
+      folded = {'call': {'predicate_name': 'Constraint', 'record': {
+          'field_value': [{'field': 0, 'value': {'expression': folded}}]}}}
+    arguments = Arguments(folded['call'])
+    if (folded['call']['predicate_name'] == '==' and
+        set(arguments) == {'left', 'right'} and
+        IsSameVariable(arguments['left'], arguments['right'])):
+      # A value equals itself unless it is null, which fails the condition.
+      folded = Negation(IsNullCall(arguments['left']))
+    constraints.append(folded)
+  s.constraints = constraints
+  return False
+
+
+def ConstantFunctions(rules):
+  """Map from functions defined as a literal to the literal."""
+  rules_of = {}
+  for rule in rules:
+    rules_of.setdefault(rule['head']['predicate_name'], []).append(rule)
+  result = {}
+  for predicate_name, predicate_rules in rules_of.items():
+    if len(predicate_rules) != 1:
+      continue
+    [rule] = predicate_rules
+    field_values = rule['head']['record']['field_value']
+    if ('body' in rule or 'distinct_denoted' in rule or
+        len(field_values) != 1 or field_values[0]['field'] != 'logica_value'):
+      continue
+    expression = field_values[0]['value'].get('expression', {})
+    if LiteralValue(expression) is not NOT_CONSTANT:
+      result[predicate_name] = expression
+  return result
+
+
+def IsProvenEmpty(rule, constants=None):
+  """Whether a condition of the body of the rule folds to false or null."""
+  for conjunct in rule.get('body', {}).get('conjunction', {}).get(
+      'conjunct', []):
+    if 'unification' in conjunct:
+      condition = {'call': {'predicate_name': '==', 'record': {
+          'field_value': [
+              {'field': 'left', 'value': {
+                  'expression': conjunct['unification']['left_hand_side']}},
+              {'field': 'right', 'value': {
+                  'expression': conjunct['unification']['right_hand_side']}}]
+      }}}
+    elif 'predicate' in conjunct and conjunct['predicate'][
+        'predicate_name'] in CONDITIONS:
+      condition = {'call': conjunct['predicate']}
+    else:
+      continue
+    if IsFalse(Fold(condition, constants)):
+      return True
+  return False
+
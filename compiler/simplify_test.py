@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from common import sqlite3_logica
+from compiler import functors
+from compiler import simplify
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+T(1); T(2); T(3);
+P(x, y:) :- T(x), 1 == 1, 2 + 3 > 4, y == (if 1 == 2 then x else 2 * 3);
+P(x, y:) :- T(x), y == 0, "a" == "b";
+Q(x, y:) :- T(x), x == 1 + 1 || 2 < 1, y in [7];
+"""
+
+
+class SimplifyTest(unittest.TestCase):
+  def Parse(self, program):
+    return parse.ParseFile(program)['rule']
+
+  def Value(self, text):
+    [rule] = self.Parse('F(value: %s);' % text)
+    expression = rule['head']['record']['field_value'][0]['value'][
+        'expression']
+    return simplify.LiteralValue(simplify.Fold(expression))
+
+  def testConstantsAreFolded(self):
+    self.assertEqual(self.Value('2 * 3 - (-1)'), 7)
+    self.assertEqual(self.Value('1 < 2 && "a" != "b"'), True)
+    self.assertEqual(self.Value('if 1 > 2 then 0 else if 3 > 2 then 5 '
+                                'else 6'), 5)
+    self.assertIsNone(self.Value('(null == 1)'))
+    self.assertIs(self.Value('7 / 2'), simplify.NOT_CONSTANT)
+    self.assertIs(self.Value('"a" < "b"'), simplify.NOT_CONSTANT)
+
+  def Sql(self, program, predicate):
+    program = universe.LogicaProgram(self.Parse(program))
+    program.FormattedPredicateSql(predicate)
+    execution = program.execution
+    result = sqlite3_logica.RunSqlScript(
+        [execution.preamble] + execution.defines_and_exports +
+        [execution.main_predicate_sql], 'csv')
+    return execution.main_predicate_sql, result.splitlines()
+
+  def testRulesAreSimplified(self):
+    sql, result = self.Sql(PROGRAM, 'P')
+    # Only rules of T are concatenated.
+    self.assertEqual(sql.count('UNION ALL'), 2)
+    self.assertNotIn('WHERE', sql)
+    self.assertEqual(result, ['col0,y', '1,6', '2,6', '3,6'])
+    sql, result = self.Sql(PROGRAM, 'Q')
+    self.assertNotIn('json_each', sql)
+    self.assertEqual(result, ['col0,y', '2,7'])
+
+  def testFloatsOfListsOfOneElementAreKept(self):
+    _, result = self.Sql(PROGRAM + 'F(x) :- x in [1.5];', 'F')
+    self.assertEqual(result, ['col0', '1.5'])
+    _, result = self.Sql(PROGRAM + 'G(y) :- x in [1.5], y == x + 1;', 'G')
+    self.assertEqual(result, ['col0', '2.5'])
+
+  def testPredicateWithoutRowsKeepsItsColumns(self):
+    _, result = self.Sql(PROGRAM + 'R(x) :- T(x), 1 > 2;', 'R')
+    self.assertEqual(result, ['col0'])
+
+  def testRulesEmptyForFunctorArgumentsAreRemoved(self):
+    rules = self.Parse(PROGRAM + """
+      Mode() = "none";
+      S(x) :- Mode() == "t", T(x);
+      S(x) :- Mode() == "p", P(x);
+      @Make(ST, S, {Mode: "t"});
+    """)
+    f = functors.Functors(rules)
+    f.MakeAll([('ST', {'1': {'predicate_name': 'S'},
+                       '2': {'Mode': 't'}})])
+    heads = [r['head']['predicate_name'] for r in f.extended_rules]
+    self.assertEqual(heads.count('ST'), 1)
+    self.assertEqual(heads.count('S'), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -19,6 +19,7 @@
 
 import collections
 import copy
+import os
 import re
 import sys
 import traceback
@@ -29,31 +30,53 @@ import json
 
 if '.' not in __package__:
   from common import color
+  from compiler import common_subqueries
+  from compiler import dead_code
   from compiler import dialects
   from compiler import expr_translate
+  from compiler import filter_pushdown
   from compiler import functors
+  from compiler import incremental
+  from compiler import join_order
+  from compiler import magic_sets
   from compiler import rule_translate
+  from compiler import simplify
+  from parser_py import compact_ast
   from parser_py import parse
   from type_inference.research import infer
+  from type_inference.research import signature_cache
 else:
   from ..common import color
+  from ..compiler import common_subqueries
+  from ..compiler import dead_code
   from ..compiler import dialects
   from ..compiler import expr_translate
+  from ..compiler import filter_pushdown
   from ..compiler import functors
+  from ..compiler import incremental
+  from ..compiler import join_order
+  from ..compiler import magic_sets
   from ..compiler import rule_translate
+  from ..compiler import simplify
+  from ..parser_py import compact_ast
   from ..parser_py import parse
   from ..type_inference.research import infer
+  from ..type_inference.research import signature_cache
 
 PredicateInfo = collections.namedtuple('PredicateInfo',
                                        ['embeddable'])
 Ground = collections.namedtuple('Ground',
                                 ['table_name', 'overwrite',
-                                 'copy_to_file'])
+                                 'copy_to_file', 'format', 'path',
+                                 'partition_by'])
 
 xrange = range
 
 def FormatSql(s): return s + ';'
 
+# Parameter ${name} of SQL, which is substituted with value of a flag.
+FLAG_PARAMETER = re.compile(r'\$\{([^{}]*)\}')
+
 
 class Logica(object):
   """Predicate execution accumulated data.
@@ -94,6 +117,8 @@ class Logica(object):
     self.used_predicates = []
     self.dependencies_of = None
     self.iterations = None
+    # Statistics of grounded tables, to order joins by, if any.
+    self.table_statistics = None
 
   def AddDefine(self, define):
     self.defines.append(define)
@@ -131,6 +156,23 @@ class Logica(object):
   def FullPreamble(self):
     return '\n'.join([self.flags_comment] + [self.preamble] + self.defines)
 
+  def RecordTableStatistics(self, predicate_name, connection):
+    """Saves statistics of the grounded table of the predicate, if asked."""
+    statistics_file = self.annotations.TableStatisticsFile()
+    ground = self.annotations.Ground(predicate_name)
+    if (not statistics_file or not ground or
+        not hasattr(connection, 'cursor')):
+      return
+    try:
+      row_count, distinct_counts = join_order.CollectStatistics(
+          connection, ground.table_name)
+    except Exception:  # pylint: disable=broad-except
+      # Statistics only guide compilation, the run goes on without them.
+      return
+    statistics = join_order.TableStatistics.Load(statistics_file)
+    statistics.Update(predicate_name, row_count, distinct_counts)
+    statistics.Save(statistics_file)
+
   def With(self, predicate_name):
     if self.compiling_udf:
       return False
@@ -153,7 +195,7 @@ class Annotations(object):
       '@NoInject', '@Make', '@CompileAsTvf', '@With', '@NoWith',
       '@CompileAsUdf', '@ResetFlagValue', '@Dataset', '@AttachDatabase',
       '@Engine', '@Recursive', '@Iteration', '@BareAggregation',
-      '@DifferentiallyPrivate'
+      '@DifferentiallyPrivate', '@NoHoist', '@Incremental'
   ]
 
   def __init__(self, rules, user_flags):
@@ -356,6 +398,29 @@ class Annotations(object):
       return typechecks_by_default
     return engine_annotation['type_checking']
 
+  def TypeCheckingProcesses(self):
+    """Number of processes to infer types of independent predicates in."""
+    if not self.annotations.get('@Engine'):
+      return 1
+    engine_annotation = list(self.annotations['@Engine'].values())[0]
+    return engine_annotation.get('type_checking_processes', 1)
+
+  def TypeCacheDirectory(self):
+    """Directory to keep inferred types in, if any."""
+    engine_annotation = {}
+    if self.annotations.get('@Engine'):
+      engine_annotation = list(self.annotations['@Engine'].values())[0]
+    return (engine_annotation.get('type_cache_directory') or
+            os.environ.get('LOGICA_TYPE_CACHE_DIRECTORY'))
+
+  def TableStatisticsFile(self):
+    """File to keep statistics of grounded tables in, if any."""
+    engine_annotation = {}
+    if self.annotations.get('@Engine'):
+      engine_annotation = list(self.annotations['@Engine'].values())[0]
+    return (engine_annotation.get('table_statistics') or
+            os.environ.get('LOGICA_TABLE_STATISTICS_FILE'))
+
   def ExtractSingleton(self, annotation_name, default_value):
     if not self.annotations[annotation_name]:
       return default_value
@@ -387,8 +452,33 @@ class Annotations(object):
       raise rule_translate.RuleCompileException(
         'Copying to file is only supported on DuckDB engine.',
         self.annotations['@Ground'][predicate_name]['__rule_text'])
+    storage_format = annotation.get('format', None)
+    path = annotation.get('path', None)
+    partition_by = annotation.get('partition_by', None)
+    if storage_format is not None:
+      if storage_format != 'parquet':
+        raise rule_translate.RuleCompileException(
+          'Unsupported storage format %s, only "parquet" is supported.' %
+          color.Warn(storage_format),
+          self.annotations['@Ground'][predicate_name]['__rule_text'])
+      if self.Engine() != 'duckdb':
+        raise rule_translate.RuleCompileException(
+          'Parquet storage is only supported on DuckDB engine.',
+          self.annotations['@Ground'][predicate_name]['__rule_text'])
+      if not path:
+        raise rule_translate.RuleCompileException(
+          'Path must be given for Parquet storage.',
+          self.annotations['@Ground'][predicate_name]['__rule_text'])
+    if partition_by is not None:
+      if storage_format != 'parquet':
+        raise rule_translate.RuleCompileException(
+          'Partitioning is only supported for Parquet storage.',
+          self.annotations['@Ground'][predicate_name]['__rule_text'])
+      if isinstance(partition_by, str):
+        partition_by = [partition_by]
     return Ground(table_name=table_name, overwrite=overwrite,
-                  copy_to_file=copy_to_file)
+                  copy_to_file=copy_to_file, format=storage_format,
+                  path=path, partition_by=partition_by)
 
   def ForceWith(self, predicate_name):
     """Return true if the predicate has been explicitly marked @With."""
@@ -416,6 +506,45 @@ class Annotations(object):
     # TODO: return false for predicates that will be injected.
     return True
 
+  def Incremental(self, predicate_name):
+    """Whether the grounded table of the predicate is updated by deltas."""
+    if predicate_name not in self.annotations['@Incremental']:
+      return False
+    rule_text = self.annotations['@Incremental'][predicate_name]['__rule_text']
+    ground = self.Ground(predicate_name)
+    if not ground or ground.format:
+      raise rule_translate.RuleCompileException(
+          'Incremental predicate must be grounded to a table.', rule_text)
+    if self.Engine() not in ('sqlite', 'duckdb', 'psql'):
+      raise rule_translate.RuleCompileException(
+          'Incremental predicates are only supported on SQLite, DuckDB and '
+          'PostgreSQL engines.', rule_text)
+    return True
+
+  def EngineSetting(self, name, default):
+    """Value of the setting of @Engine annotation, or the default."""
+    engine_annotation = {}
+    if self.annotations.get('@Engine'):
+      engine_annotation = list(self.annotations['@Engine'].values())[0]
+    return engine_annotation.get(name, default)
+
+  def HoistSubqueries(self, predicate_name):
+    """Whether repeated subqueries of the predicate go to WITH tables.
+
+    Dialect decides by default, and @Engine setting hoist_subqueries
+    overrides it for the program.
+    """
+    if predicate_name in self.annotations['@NoHoist']:
+      return False
+    return self.EngineSetting(
+        'hoist_subqueries',
+        dialects.Get(self.Engine()).HoistsCommonSubqueries())
+
+  def HoistMinLength(self):
+    """Length of the shortest subquery to hoist to a WITH table."""
+    return self.EngineSetting('hoist_min_length',
+                              common_subqueries.DEFAULT_MIN_LENGTH)
+
   def LimitClause(self, predicate_name):
     limit = self.LimitOf(predicate_name)
     if limit:
@@ -445,7 +574,7 @@ class Annotations(object):
     for annotation_name in self.annotations:
       if annotation_name in {'@Limit', '@OrderBy',
                              '@NoInject', '@CompileAsTvf', '@With', '@NoWith',
-                             '@CompileAsUdf'}:
+                             '@CompileAsUdf', '@NoHoist', '@Incremental'}:
         for annotated_predicate in self.annotations[annotation_name]:
           if annotated_predicate not in all_predicates:
             rule_text = self.annotations[annotation_name][annotated_predicate][
@@ -568,16 +697,25 @@ class LogicaProgram(object):
   Can produce SQL for predicates.
   """
 
-  def __init__(self, rules, table_aliases=None, user_flags=None):
+  def __init__(self, rules, table_aliases=None, user_flags=None,
+               main_predicates=None):
     """Initializes the program.
 
     Args:
-      rules: A list of dictionary representations of parsed Logica rules.
+      rules: A list of dictionary representations of parsed Logica rules,
+        or their compact form, see compact_ast.
       table_aliases: A map from an undefined Logica predicate name to a
         BigQuery table name. This table will be used in place of predicate.
       user_flags: Dictionary of user specified flags.
+      main_predicates: Predicates that are going to be compiled, if known.
+        Then rules that they do not use are dropped, conditions of calls
+        are pushed into called predicates and only these predicates can be
+        compiled.
     """
+    if compact_ast.IsCompact(rules):
+      rules = compact_ast.Expand(rules)
     self.raw_rules = rules  # For Clingo.
+    rules = magic_sets.RewriteDemandedCalls(rules)
     rules = self.UnfoldRecursion(rules)
 
     # TODO: Should allocator be a member of Logica?
@@ -590,6 +728,8 @@ class LogicaProgram(object):
     self.user_flags = user_flags or {}
     self.annotations = Annotations(rules, self.user_flags)
     self.flag_values = self.annotations.flag_values
+    # Values of flags with flags that they mention substituted.
+    self.resolved_flag_values = None
     # Dictionary custom_udfs maps function name to a format string to use
     # in queries.
     self.custom_udfs = collections.OrderedDict()
@@ -612,6 +752,12 @@ class LogicaProgram(object):
     library_rules = parse.ParseFile(
         dialects.Get(self.annotations.Engine()).LibraryProgram())['rule']
     extended_rules.extend(library_rules)
+    if main_predicates is not None:
+      extended_rules = dead_code.EliminateDeadCode(extended_rules,
+                                                   main_predicates)
+      extended_rules = filter_pushdown.PushDownFilters(extended_rules,
+                                                       main_predicates)
+    extended_rules = incremental.AddIncrementalRules(extended_rules)
 
     for rule in extended_rules:
       predicate_name = rule['head']['predicate_name']
@@ -621,6 +767,11 @@ class LogicaProgram(object):
     # We need to recompute annotations, because 'Make' created more rules and
     # annotations.
     self.annotations = Annotations(extended_rules, self.user_flags)
+    for predicate_name in self.annotations.annotations['@Incremental']:
+      if self.annotations.Incremental(predicate_name):
+        # Rules of the update read the delta from the table of the export.
+        self.table_aliases[incremental.DeltaName(predicate_name)] = (
+            self.annotations.Ground(predicate_name).table_name + '_delta')
 
     # Infering types if requested.
     self.typing_preamble = ''
@@ -630,6 +781,10 @@ class LogicaProgram(object):
     if self.annotations.ShouldTypecheck():
       self.typing_preamble = self.RunTypechecker()
 
+    self.table_statistics = None
+    if statistics_file := self.annotations.TableStatisticsFile():
+      self.table_statistics = join_order.TableStatistics.Load(statistics_file)
+
     # Build udfs, populating custom_udfs and custom_udf_definitions.
     self.BuildUdfs()
     # Function compilation may have added irrelevant defines:
@@ -749,8 +904,13 @@ class LogicaProgram(object):
       TypeInferenceError if there are any type errors.
     """
     rules = [r for _, r in self.rules]
+    cache = None
+    if cache_directory := self.annotations.TypeCacheDirectory():
+      cache = signature_cache.SignatureCache(cache_directory)
     typing_engine = infer.TypesInferenceEngine(
-        rules, dialect=self.annotations.Engine())
+        rules, dialect=self.annotations.Engine(),
+        processes=self.annotations.TypeCheckingProcesses(),
+        cache=cache)
     typing_engine.InferTypes()
     self.typing_engine = typing_engine
     type_error_checker = infer.TypeErrorChecker(rules)
@@ -840,6 +1000,7 @@ class LogicaProgram(object):
       return result
     elif len(rules) > 1:
       rules_sql = []
+      empty_rules_sql = []
       for rule in rules:
         if 'distinct_denoted' in rule:
           raise rule_translate.RuleCompileException(
@@ -850,9 +1011,14 @@ class LogicaProgram(object):
                   'you intended.'), rule['full_text'])
         single_rule_sql = self.SingleRuleSql(
             rule, allocator, external_vocabulary)
-        if not single_rule_sql.startswith('/* nil */'):
+        if single_rule_sql.startswith('/* empty */'):
+          empty_rules_sql.append('\n%s\n' % Indent2(
+              single_rule_sql[len('/* empty */'):]))
+        elif not single_rule_sql.startswith('/* nil */'):
           rules_sql.append('\n%s\n' %
                           Indent2(single_rule_sql))
+      # Rules with no rows are only kept for columns of the predicate.
+      rules_sql = rules_sql or empty_rules_sql[:1]
       if not rules_sql:
         raise rule_translate.RuleCompileException(
           'All disjuncts are nil for predicate %s.' % color.Warn(name),
@@ -1020,8 +1186,14 @@ class LogicaProgram(object):
     self.execution.dependencies_of = self.functors.args_of
     self.execution.dialect = dialects.Get(self.annotations.Engine())
     self.execution.iterations = self.annotations.Iterations()
+    self.execution.table_statistics = self.table_statistics
   
   def UpdateExecutionWithTyping(self):
+    if self.annotations.ShouldTypecheck():
+      # Compiled rules could require more types than the program has, so
+      # preamble is built when compilation is done.
+      self.typing_preamble = infer.BuildPreamble(
+          self.required_type_definitions, dialect=self.annotations.Engine())
     if self.execution.dialect.IsPostgreSQLish():
       self.execution.preamble += '\n' + self.typing_preamble
 
@@ -1067,12 +1239,17 @@ class LogicaProgram(object):
         self.execution.workflow_predicates_stack)
 
     # Wrap query in with
-    with_signature = self.GenerateWithClauses(name)
-    if with_signature:
-      sql = '{}\n{}'.format(with_signature, sql)
+    sql = self.WrapInWithClauses(name, sql)
+    # Flags are substituted in each statement once, when it is complete.
+    sql = self.UseFlagsAsParameters(sql)
     self.execution.table_to_export_map[name] = sql
+    self.execution.preamble = self.UseFlagsAsParameters(
+        self.execution.preamble)
+    self.execution.flags_comment = self.UseFlagsAsParameters(
+        self.execution.flags_comment)
     defines_and_exports = self.execution.preamble
-    udf_definitions = self.execution.NeededUdfDefinitions()
+    udf_definitions = list(map(self.UseFlagsAsParameters,
+                               self.execution.NeededUdfDefinitions()))
     if udf_definitions:
       defines_and_exports += '\n\n'.join(udf_definitions)
       defines_and_exports += '\n\n'
@@ -1081,51 +1258,51 @@ class LogicaProgram(object):
       defines_and_exports += '\n\n'.join(self.execution.defines_and_exports)
       defines_and_exports += '\n\n'
 
-    sql = self.UseFlagsAsParameters(sql)  # To avoid formatting errors.
-
     # Append TVF signature.
     tvf_signature = self.annotations.TvfSignature(name)
     if tvf_signature:
-      sql = tvf_signature + '\n' + sql
+      sql = self.UseFlagsAsParameters(tvf_signature) + '\n' + sql
 
     self.execution.main_predicate_sql = sql
     formatted_sql = (
         self.execution.flags_comment +
         defines_and_exports +
         FormatSql(sql))
-    if True:
-      self.execution.preamble = self.UseFlagsAsParameters(
-          self.execution.preamble)
-      for k, v in self.execution.table_to_export_map.items():
-        self.execution.table_to_export_map[k] = self.UseFlagsAsParameters(v)
-      for i, d in enumerate(self.execution.defines):
-        self.execution.defines[i] = self.UseFlagsAsParameters(d)
-      self.execution.flags_comment = self.UseFlagsAsParameters(
-          self.execution.flags_comment)
-      self.execution.main_predicate_sql = self.UseFlagsAsParameters(
-        self.execution.main_predicate_sql)
-      return self.UseFlagsAsParameters(formatted_sql)
-    else:
-      return formatted_sql
+    return formatted_sql
+
+  def ResolveFlagValues(self):
+    """Substitutes flags that values of flags refer to, in their order."""
+    resolved = {}
+    def Resolve(flag, path):
+      if flag not in resolved:
+        value = self.flag_values[flag]
+        if flag in path:
+          raise rule_translate.RuleCompileException(
+              'You seem to have recursive flags. It is disallowed.',
+              'Flags:\n' +
+              '\n'.join('--{0}={1}'.format(*i)
+                        for i in self.flag_values.items()))
+        # Flags without a value stay parameters.
+        if value != '${%s}' % flag:
+          value = FLAG_PARAMETER.sub(
+              lambda m: (Resolve(m.group(1), path + [flag])
+                         if m.group(1) in self.flag_values
+                         else m.group(0)),
+              value)
+        resolved[flag] = value
+      return resolved[flag]
+    for flag in self.flag_values:
+      Resolve(flag, [])
+    return resolved
 
   def UseFlagsAsParameters(self, sql):
-    """Running flag substitution in a loop to the fixed point."""
-    # We do it in a loop to deal with flags that refer to other flags.
-    prev_sql = ''
-    num_subs = 0
-    while sql != prev_sql:
-      num_subs += 1
-      prev_sql = sql
-      if num_subs > 100:
-        raise rule_translate.RuleCompileException(
-            'You seem to have recursive flags. It is disallowed.',
-            'Flags:\n' +
-            '\n'.join('--{0}={1}'.format(*i)
-                      for i in self.flag_values.items()))
-      # Do the substitution!
-      for flag, value in self.flag_values.items():
-        sql = sql.replace('${%s}' % flag, value)
-    return sql
+    """Substitutes values of flags for their parameters in one pass."""
+    if self.resolved_flag_values is None:
+      self.resolved_flag_values = self.ResolveFlagValues()
+    if not self.resolved_flag_values or '${' not in sql:
+      return sql
+    return FLAG_PARAMETER.sub(
+        lambda m: self.resolved_flag_values.get(m.group(1), m.group(0)), sql)
 
   def RunInjections(self, s, allocator):
     iterations = 0
@@ -1226,13 +1403,13 @@ class LogicaProgram(object):
       type_inference = infer.TypeInferenceForStructure(
           s, self.predicate_signatures, dialect=self.annotations.Engine())
       type_inference.PerformInference()
-      error_checker = infer.TypeErrorChecker([type_inference.quazy_rule])
-      error_checker.CheckForError('raise')
-      # New types may arrive here when we have an injetible predicate with variables
-      # which specific record type depends on the inputs. 
-      self.required_type_definitions.update(type_inference.collector.definitions)
-      self.typing_preamble = infer.BuildPreamble(self.required_type_definitions,
-                                                 dialect=self.annotations.Engine())
+      if type_inference.inferred:
+        error_checker = infer.TypeErrorChecker([type_inference.quazy_rule])
+        error_checker.CheckForError('raise')
+        # New types may arrive here when we have an injetible predicate with variables
+        # which specific record type depends on the inputs. 
+        self.required_type_definitions.update(
+            type_inference.collector.definitions)
 
     if 'nil' in s.tables.values():
       if must_not_be_nil:
@@ -1246,6 +1423,7 @@ class LogicaProgram(object):
         # Return a rule marked for deletion.
         return '/* nil */ SELECT NULL FROM (SELECT 42 AS MONAD) AS NIRVANA WHERE MONAD = 0'
 
+    proven_empty = simplify.SimplifyStructure(s, keep_unnestings=is_combine)
     try:
       sql = s.AsSql(self.MakeSubqueryTranslator(allocator), self.flag_values)
     except RuntimeError as runtime_error:
@@ -1256,25 +1434,42 @@ class LogicaProgram(object):
       else:
         raise runtime_error
     # TODO: Should this be removed?
+    if proven_empty and not must_not_be_nil and not is_combine:
+      # Mark rule as having no rows, see PredicateSql.
+      sql = '/* empty */' + sql
     if 'nil' in s.tables.values():
       # Mark rule for deletion.
       sql = '/* nil */' + sql
     return sql
 
-  def GenerateWithClauses(self, predicate_name):
-    """Generate the WITH ... prefix for queries that use it."""
+  def WithTables(self, predicate_name):
+    """Returns names and SQL of WITH tables of the predicate query."""
     dependencies = self.execution.table_to_with_dependencies[predicate_name]
-
-    if not dependencies:
-      return None
-
-    with_bodies = []
+    with_tables = []
     for dependency in dependencies:
       table_name = self.execution.table_to_defined_table_map[dependency]
       sql = self.execution.table_to_with_sql_map[table_name]
-      with_bodies.append('{} AS ({})'.format(table_name, sql))
+      with_tables.append((table_name, sql))
+    return with_tables
 
-    return 'WITH {}'.format(',\n'.join(with_bodies))
+  def WrapInWithClauses(self, predicate_name, sql):
+    """Prefixes the query with WITH tables that it uses.
+
+    Subqueries that are repeated in the query are moved to WITH tables,
+    if the engine hoists them and the predicate is not annotated with
+    @NoHoist.
+    """
+    with_tables = self.WithTables(predicate_name)
+    if (not self.execution.compiling_udf and
+        self.annotations.HoistSubqueries(predicate_name)):
+      with_tables, sql = common_subqueries.HoistCommonSubqueries(
+          with_tables, sql, self.annotations.HoistMinLength(),
+          self.execution.dialect.BackslashEscapesInStrings())
+    if not with_tables:
+      return sql
+    with_bodies = ['{} AS ({})'.format(table_name, table_sql)
+                   for table_name, table_sql in with_tables]
+    return 'WITH {}\n{}'.format(',\n'.join(with_bodies), sql)
 
   def MakeSubqueryTranslator(self, allocator):
     return SubqueryTranslator(self, allocator, self.execution)
@@ -1310,7 +1505,8 @@ class SubqueryTranslator(object):
   def TranslateTableAttachedToFile(self, table, ground, external_vocabulary,
                                    edge_needed=True):
     """Translates file-attached table. Appends exports and defines."""
-    if edge_needed:
+    # Updates of incremental predicates read their own tables.
+    if edge_needed and table != self.execution.workflow_predicates_stack[-1]:
       self.execution.dependency_edges.append((
           table,
           self.execution.workflow_predicates_stack[-1]))
@@ -1318,21 +1514,26 @@ class SubqueryTranslator(object):
       return self.execution.table_to_defined_table_map[table]
     table_name = ground.table_name
         #self.allocator.AllocateTable(hint_for_user=table)
+    if (ground.format == 'parquet' and
+        table not in self.program.defined_predicates):
+      # Reading files written earlier, possibly by another program.
+      table_name = ParquetSourceSql(ground)
     self.execution.table_to_defined_table_map[table] = table_name
-    define_statement = '-- Interacting with table %s' % table_name
+    define_statement = self.program.UseFlagsAsParameters(
+        '-- Interacting with table %s' % table_name)
     self.execution.AddDefine(define_statement)
     export_statement = None
     if table in self.program.defined_predicates:
       self.execution.workflow_predicates_stack.append(table)
-      dependency_sql = self.program.PredicateSql(
-          table, self.allocator, external_vocabulary)
-
-      # Wrap query in with
-      with_signature = self.program.GenerateWithClauses(table)
-      if with_signature:
-        dependency_sql = '{}\n{}'.format(with_signature, dependency_sql)
+      if self.program.annotations.Incremental(table):
+        dependency_sql = self.IncrementalExportSql(table, ground,
+                                                   external_vocabulary)
+      else:
+        dependency_sql = self.program.PredicateSql(
+            table, self.allocator, external_vocabulary)
 
-      dependency_sql = self.program.UseFlagsAsParameters(dependency_sql)
+        # Wrap query in with
+        dependency_sql = self.program.WrapInWithClauses(table, dependency_sql)
       self.execution.workflow_predicates_stack.pop()
       # This is buggy, but we never use overwrite.
       maybe_drop_table = (
@@ -1352,11 +1553,18 @@ class SubqueryTranslator(object):
       maybe_copy = ''
       if ground.copy_to_file:
         maybe_copy = f'COPY {ground.table_name} TO \'{ground.copy_to_file}\';\n'
-      create_statement = (
-          '{create_keyword} {name} AS {dependency_sql}'.format(
-              create_keyword=create_keyword,
-              name=ground.table_name,
-              dependency_sql=FormatSql(dependency_sql)))
+      if self.program.annotations.Incremental(table):
+        # Rows of earlier runs stay in the table.
+        create_statement = dependency_sql
+        maybe_drop_table = ''
+      elif ground.format == 'parquet':
+        create_statement = ParquetExportSql(ground, dependency_sql)
+      else:
+        create_statement = (
+            '{create_keyword} {name} AS {dependency_sql}'.format(
+                create_keyword=create_keyword,
+                name=ground.table_name,
+                dependency_sql=FormatSql(dependency_sql)))
 
       if self.program.annotations.Engine() == 'clickhouse':
         if ground.overwrite:
@@ -1375,6 +1583,24 @@ class SubqueryTranslator(object):
     self.execution.defines_and_exports.append(define_statement)
     return table_name
 
+  def IncrementalExportSql(self, table, ground, external_vocabulary):
+    """SQL merging rows of the delta of the predicate into its table."""
+    def PredicateSql(predicate_name):
+      sql = self.program.PredicateSql(predicate_name, self.allocator,
+                                      external_vocabulary)
+      return self.program.WrapInWithClauses(table, sql)
+    delta_sql = PredicateSql(incremental.DeltaName(table))
+    update_sql = None
+    keys = []
+    [rule, *_] = self.program.GetPredicateRules(table)
+    if 'distinct_denoted' in rule:
+      update_sql = PredicateSql(incremental.UpdateName(table))
+      keys = [rule_translate.LogicaFieldToSqlField(f)
+              for f in incremental.KeyFields(rule)]
+    return incremental.IncrementalExportSql(
+        ground.table_name, delta_sql, update_sql, keys,
+        self.execution.dialect.NullSafeEqualityPhrase())
+
   def TranslateWithedTable(self, table):
     """Translates table that should be defined in a WITH clause."""
     parent_table = self.execution.workflow_predicates_stack[-1]
@@ -1446,6 +1672,40 @@ def InjectStructure(target, source):
   target.synonym_log.update(source.synonym_log)
 
 
+def ParquetPathSql(path):
+  """SQL string literal of a path of Parquet storage."""
+  return "'%s'" % str(path).replace("'", "''")
+
+
+def ParquetSourceSql(ground):
+  """SQL reading the Parquet storage of a grounded predicate."""
+  if ground.partition_by:
+    return 'read_parquet(%s, hive_partitioning = true)' % ParquetPathSql(
+        ground.path + '/**/*.parquet')
+  return 'read_parquet(%s)' % ParquetPathSql(ground.path)
+
+
+def ParquetExportSql(ground, dependency_sql):
+  """SQL writing predicate to Parquet and exposing it as a view.
+
+  The view reads the files, so DuckDB prunes partitions when consumers filter
+  on partitioning columns.
+  """
+  options = ['FORMAT PARQUET']
+  if ground.partition_by:
+    options.append('PARTITION_BY (%s)' % ', '.join(ground.partition_by))
+    options.append('OVERWRITE true' if ground.overwrite else 'APPEND true')
+  copy_statement = 'COPY ({dependency_sql}) TO {path} ({options})'.format(
+      dependency_sql=dependency_sql,
+      path=ParquetPathSql(ground.path),
+      options=', '.join(options))
+  view_statement = (
+      'CREATE OR REPLACE VIEW {name} AS SELECT * FROM {source}'.format(
+          name=ground.table_name,
+          source=ParquetSourceSql(ground)))
+  return FormatSql(copy_statement) + '\n' + FormatSql(view_statement)
+
+
 def RecursionError():
   return color.Format(
       'Recursion in this rule is {warning}too deep{end}. It is running '
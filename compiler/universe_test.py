@@ -0,0 +1,79 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from compiler import rule_translate
+from compiler import universe
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+@DefineFlag("greeting", "${word}, ${name}");
+@DefineFlag("word", "Hello");
+@DefineFlag("name");
+@Ground(G, "greetings_${word}");
+G(text: "${greeting}", day: "${YYYY}");
+Q(text:, day:) :- G(text:, day:);
+"""
+
+
+class FlagsTest(unittest.TestCase):
+  def Program(self, program, user_flags=None):
+    rules = parse.ParseFile(program)['rule']
+    return universe.LogicaProgram(rules, user_flags=user_flags)
+
+  def testFlagsReferringToFlagsAreSubstituted(self):
+    program = self.Program(PROGRAM, user_flags={'word': 'Hi'})
+    sql = program.FormattedPredicateSql('Q')
+    self.assertIn("'Hi, ${name}' AS text", sql)
+    self.assertIn("'${YYYY}' AS day", sql)
+    self.assertIn('FROM\n  greetings_Hi AS G', sql)
+    self.assertNotIn('${word}', sql)
+    self.assertIn('greetings_Hi',
+                  program.execution.table_to_export_map['G'])
+
+  def testRecursiveFlagsAreRejected(self):
+    program = self.Program(PROGRAM.replace('"Hello"', '"${greeting}"'))
+    with self.assertRaises(rule_translate.RuleCompileException):
+      program.FormattedPredicateSql('Q')
+
+
+class ParquetTest(unittest.TestCase):
+  def testPathsAreQuoted(self):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "it's.parquet")
+    rules = parse.ParseFile("""
+      @Engine("duckdb");
+      @Ground(T, format: "parquet", path: "%s");
+      T(x) :- x in [1, 2];
+      Q(x) :- T(x);
+    """ % path)['rule']
+    program = universe.LogicaProgram(rules)
+    sql = program.FormattedPredicateSql('Q')
+    self.assertIn("'%s'" % path.replace("'", "''"), sql)
+    import duckdb
+    connection = duckdb.connect()
+    connection.execute(sql)
+    self.assertEqual(connection.execute(
+        'SELECT * FROM read_parquet(?) ORDER BY 1', [path]).fetchall(),
+                     [(1,), (2,)])
+
+
+if __name__ == '__main__':
+  unittest.main()
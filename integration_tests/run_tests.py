@@ -89,6 +89,7 @@ def RunAll(test_presto=False, test_trino=False, test_clingo=True, test_clickhous
 
   RunTest("duckdb_negation_test")
   RunTest("duckdb_is_default")
+  RunTest("duckdb_engine_settings_test")
 
   RunTest("bq_plusplus_test")
   RunTest("sqlite_functors_test")
@@ -132,6 +133,8 @@ def RunAll(test_presto=False, test_trino=False, test_clingo=True, test_clickhous
   RunTest("sqlite_pagerank")
   RunTest("sqlite_composite_test")
   RunTest("sqlite_reachability")
+  RunTest("sqlite_demand_test")
+  RunTest("sqlite_triangle_test")
   RunTest("sqlite_element_test")
   RunTest("sqlite_functor_over_constant_test")
 
@@ -147,6 +150,7 @@ def RunAll(test_presto=False, test_trino=False, test_clingo=True, test_clickhous
   RunTest("duckdb_stop_test",
           src="duckdb_stop_test.l",
           use_concertina=True)
+  RunTest("duckdb_parquet_ground_test", use_concertina=True)
   RunTest("duckdb_purchase_test",
           src="psql_purchase_test.l",
           duckify_psql=True, use_concertina=True)
@@ -258,7 +258,7 @@ def main(argv):
   for predicate in predicates_list:
     try:
       logic_program = universe.LogicaProgram(
-          parsed_rules, user_flags=user_flags)
+          parsed_rules, user_flags=user_flags, main_predicates=[predicate])
       formatted_sql = logic_program.FormattedPredicateSql(predicate)
       preamble = logic_program.execution.preamble
       defines_and_exports = logic_program.execution.defines_and_exports
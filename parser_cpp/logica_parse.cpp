@@ -63,6 +63,10 @@ using JsonArray = std::vector<Json>;
 struct Json {
   using Storage = std::variant<std::nullptr_t, bool, int64_t, std::string, JsonArray, JsonObject>;
   Storage v;
+  // Span of a string taken from program text, see SpanTextJson.
+  std::shared_ptr<std::string> span_heritage;
+  size_t span_start = 0;
+  size_t span_stop = 0;
 
   Json() : v(nullptr) {}
   Json(std::nullptr_t) : v(nullptr) {}
@@ -265,6 +269,16 @@ struct SpanString {
   }
 };
 
+// String of program text that keeps its span, so that the Python bridge
+// hands it out as a heritage-aware string, as the Python parser does.
+static Json SpanTextJson(const SpanString& s) {
+  Json j(s.str());
+  j.span_heritage = s.heritage;
+  j.span_start = s.start;
+  j.span_stop = s.stop;
+  return j;
+}
+
 // ------------------------------
 // Pooled heritage emission (for Python bridge).
 // ------------------------------
@@ -819,7 +833,7 @@ static std::optional<Json> ParseVariable(const SpanString& s) {
   if (s.starts_with("x_")) {
     throw ParsingException("Variables starting with x_ are reserved to be Logica compiler internal. Please use a different name.", s);
   }
-  return Json(JsonObject{{"var_name", Json(s.str())}});
+  return Json(JsonObject{{"var_name", SpanTextJson(s)}});
 }
 
 static std::optional<Json> ParseNumber(SpanString s) {
@@ -836,7 +850,7 @@ static std::optional<Json> ParseNumber(SpanString s) {
   if (errno != 0 || end == text.c_str() || *end != '\0') {
     return std::nullopt;
   }
-  return Json(JsonObject{{"number", Json(text)}});
+  return Json(JsonObject{{"number", SpanTextJson(s)}});
 }
 
 static std::string ParsePythonStyleStringLiteral(const SpanString& s) {
@@ -966,7 +980,7 @@ static std::optional<Json> ParseString(const SpanString& s) {
   if (v.size() >= 2 && v.front() == '"' && v.back() == '"') {
     // Only accept if there are no quotes inside (python logic).
     if (v.substr(1, v.size() - 2).find('"') == std::string_view::npos) {
-      return Json(JsonObject{{"the_string", Json(std::string(v.substr(1, v.size() - 2)))}});
+      return Json(JsonObject{{"the_string", SpanTextJson(s.slice(1, s.size() - 1))}});
     }
   }
   if (v.size() >= 2 && v.front() == '\'' && v.back() == '\'') {
@@ -996,7 +1010,7 @@ static std::optional<Json> ParseString(const SpanString& s) {
   if (v.size() >= 6 && v.substr(0, 3) == "\"\"\"" && v.substr(v.size() - 3) == "\"\"\"") {
     auto inner = v.substr(3, v.size() - 6);
     if (inner.find("\"\"\"") == std::string_view::npos) {
-      return Json(JsonObject{{"the_string", Json(std::string(inner))}});
+      return Json(JsonObject{{"the_string", SpanTextJson(s.slice(3, s.size() - 3))}});
     }
   }
   return std::nullopt;
@@ -1005,14 +1019,14 @@ static std::optional<Json> ParseString(const SpanString& s) {
 static std::optional<Json> ParseBoolean(const SpanString& s) {
   auto text = s.str();
   if (text == "true" || text == "false") {
-    return Json(JsonObject{{"the_bool", Json(text)}});
+    return Json(JsonObject{{"the_bool", SpanTextJson(s)}});
   }
   return std::nullopt;
 }
 
 static std::optional<Json> ParseNull(const SpanString& s) {
   if (s.str() == "null") {
-    return Json(JsonObject{{"the_null", Json("null")}});
+    return Json(JsonObject{{"the_null", SpanTextJson(s)}});
   }
   return std::nullopt;
 }
@@ -1035,7 +1049,7 @@ static std::optional<Json> ParseList(const SpanString& s) {
 static std::optional<Json> ParsePredicateLiteral(const SpanString& s) {
   const std::string text = s.str();
   if (text == "++?" || text == "nil") {
-    return Json(JsonObject{{"predicate_name", Json(text)}});
+    return Json(JsonObject{{"predicate_name", SpanTextJson(s)}});
   }
   if (text.empty()) return std::nullopt;
   if (!std::isupper(static_cast<unsigned char>(text[0]))) return std::nullopt;
@@ -1044,7 +1058,7 @@ static std::optional<Json> ParsePredicateLiteral(const SpanString& s) {
       return std::nullopt;
     }
   }
-  return Json(JsonObject{{"predicate_name", Json(text)}});
+  return Json(JsonObject{{"predicate_name", SpanTextJson(s)}});
 }
 
 static std::optional<Json> ParseLiteral(const SpanString& s) {
@@ -1082,7 +1096,7 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
     auto field_values = Split(s, ",");
     bool had_restof = false;
     bool positional_ok = true;
-    std::vector<std::string> observed_fields;
+    JsonArray observed_fields;
 
     for (size_t idx = 0; idx < field_values.size(); ++idx) {
       SpanString field_value = field_values[idx];
@@ -1097,9 +1111,7 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
         item["field"] = Json("*");
         item["value"] = Json(JsonObject{{"expression", ParseExpression(field_value.slice_from(2))}});
         if (!observed_fields.empty()) {
-          JsonArray exc;
-          for (const auto& f : observed_fields) exc.push_back(Json(f));
-          item["except"] = Json(exc);
+          item["except"] = Json(observed_fields);
         }
         result.push_back(Json(item));
         had_restof = true;
@@ -1107,13 +1119,13 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
         continue;
       }
 
-      std::string observed_field;
+      Json observed_field;
       auto [one, colon_split] = SplitInOneOrTwo(field_value, ":");
       if (colon_split) {
         positional_ok = false;
         SpanString field = colon_split->first;
         SpanString value = colon_split->second;
-        observed_field = field.str();
+        observed_field = SpanTextJson(field);
         if (value.empty()) {
           value = field;
           if (!field.empty() && std::isupper(static_cast<unsigned char>(field.at(0)))) {
@@ -1124,7 +1136,7 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
           }
         }
         JsonObject fv;
-        fv["field"] = Json(field.str());
+        fv["field"] = SpanTextJson(field);
         fv["value"] = Json(JsonObject{{"expression", ParseExpression(value)}});
         result.push_back(Json(fv));
       } else {
@@ -1136,19 +1148,19 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
           positional_ok = false;
           SpanString field = qsplit->first;
           SpanString value = qsplit->second;
-          observed_field = field.str();
+          observed_field = SpanTextJson(field);
           if (field.empty()) {
             throw ParsingException("Aggregated fields have to be named.", field_value);
           }
           auto [op, expr] = SplitInTwo(value, "=");
           op = Strip(op);
           JsonObject agg;
-          agg["operator"] = Json(op.str());
+          agg["operator"] = SpanTextJson(op);
           agg["argument"] = ParseExpression(expr);
           agg["expression_heritage"] = SpanRefJson(value);
 
           JsonObject fv;
-          fv["field"] = Json(field.str());
+          fv["field"] = SpanTextJson(field);
           fv["value"] = Json(JsonObject{{"aggregation", Json(agg)}});
           result.push_back(Json(fv));
         } else {
@@ -1157,7 +1169,7 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
             fv["field"] = Json(static_cast<int64_t>(idx));
             fv["value"] = Json(JsonObject{{"expression", ParseExpression(field_value)}});
             result.push_back(Json(fv));
-            observed_field = "col" + std::to_string(idx);
+            observed_field = Json("col" + std::to_string(idx));
           } else {
             throw ParsingException("Positional argument can not go after non-positional arguments.", field_value);
           }
@@ -1173,15 +1185,16 @@ static Json ParseRecordInternals(const SpanString& in, bool is_record_literal, b
 // Expression parsing helpers.
 // ------------------------------
 
-static std::optional<std::pair<std::string, SpanString>> ParseGenericCall(const SpanString& in, char opening, char closing) {
+static std::optional<std::pair<SpanString, SpanString>> ParseGenericCall(const SpanString& in, char opening, char closing) {
   SpanString s = Strip(in);
   if (s.empty()) return std::nullopt;
 
-  std::string predicate;
+  // Predicate is a span of the program text, unless it is rewritten.
+  SpanString predicate;
   size_t idx = 0;
   if (s.starts_with("->")) {
     idx = 2;
-    predicate = "->";
+    predicate = SpanString(std::string("->"));
   } else {
     Traverser t(s);
     TraverseStep step;
@@ -1211,7 +1224,7 @@ static std::optional<std::pair<std::string, SpanString>> ParseGenericCall(const
           return true;
         };
         if ((idx > 0 && all_good()) || pred == "!" || pred == "++?" || (idx >= 2 && s.at(0) == '`' && s.at(idx - 1) == '`')) {
-          predicate = pred;
+          predicate = pred_span;
           break;
         }
         return std::nullopt;
@@ -1223,8 +1236,8 @@ static std::optional<std::pair<std::string, SpanString>> ParseGenericCall(const
   }
 
   if (s.at(idx) == opening && s.at(s.size() - 1) == closing && IsWhole(s.slice(idx + 1, s.size() - 1))) {
-    if (predicate == "`=`") predicate = "=";
-    if (predicate == "`~`") predicate = "~";
+    if (predicate.view() == "`=`") predicate = SpanString(std::string("="));
+    if (predicate.view() == "`~`") predicate = SpanString(std::string("~"));
     return std::make_optional(std::make_pair(predicate, s.slice(idx + 1, s.size() - 1)));
   }
   return std::nullopt;
@@ -1297,7 +1310,7 @@ static std::optional<Json> ParseInfix(const SpanString& s, std::optional<std::ve
 
 static Json BuildTreeForCombine(const Json& parsed_expression, const SpanString& op, const Json* parsed_body, const SpanString& full_text) {
   JsonObject agg;
-  agg["operator"] = Json(op.str());
+  agg["operator"] = SpanTextJson(op);
   agg["argument"] = parsed_expression;
   agg["expression_heritage"] = SpanRefJson(full_text);
 
@@ -1408,7 +1421,7 @@ static std::optional<Json> ParseUltraConciseCombine(const SpanString& s) {
   auto gc = ParseGenericCall(s, '{', '}');
   if (!gc) return std::nullopt;
   SpanString multiset = gc->second;
-  SpanString op(gc->first);
+  SpanString op = gc->first;
   auto [one, vb] = SplitInOneOrTwo(multiset, ":-");
   SpanString value = multiset;
   std::optional<SpanString> body;
@@ -1441,7 +1454,8 @@ static std::optional<Json> ParseCall(const SpanString& s, bool is_aggregation_al
   if (!generic) return std::nullopt;
   Json args = ParseRecordInternals(generic->second, false, is_aggregation_allowed);
   JsonObject call;
-  call["predicate_name"] = Json(generic->first);
+  const SpanString& predicate = generic->first;
+  call["predicate_name"] = predicate.heritage == s.heritage ? SpanTextJson(predicate) : Json(predicate.str());
   call["record"] = args;
   return Json(call);
 }
@@ -1453,7 +1467,7 @@ static std::optional<Json> ParseArraySub(const SpanString& s) {
   auto generic = ParseGenericCall(s, '[', ']');
   if (!generic) return std::nullopt;
   Json args = ParseRecordInternals(generic->second, false, false);
-  Json array = ParseExpression(SpanString(generic->first));
+  Json array = ParseExpression(generic->first);
   return NestedElement(s, array, args);
 }
 
@@ -1556,7 +1570,7 @@ static std::optional<Json> ParseSubscript(const SpanString& s) {
       throw ParsingException("Subscript must be lowercase.", s);
     }
   }
-  Json sub = Json(JsonObject{{"literal", Json(JsonObject{{"the_symbol", Json(JsonObject{{"symbol", Json(last.str())}})}})}});
+  Json sub = Json(JsonObject{{"literal", Json(JsonObject{{"the_symbol", Json(JsonObject{{"symbol", SpanTextJson(last)}})}})}});
   return Json(JsonObject{{"record", record}, {"subscript", sub}});
 }
 
@@ -1767,7 +1781,7 @@ static std::pair<Json, bool> ParseHeadCall(const SpanString& s, bool distinct_fr
   }
 
   JsonObject agg;
-  agg["operator"] = Json(op_str.str());
+  agg["operator"] = SpanTextJson(op_str);
   agg["argument"] = ParseExpression(expr_str);
   agg["expression_heritage"] = SpanRefJson(post_call_str);
   JsonObject fv;
@@ -2158,16 +2172,16 @@ static Json DnfRewrite(const Json& rules_json) {
   return Json(out);
 }
 
-static std::string AggregationOperator(const std::string& raw) {
-  if (raw == "+") return "Agg+";
-  if (raw == "++") return "Agg++";
-  if (raw == "*") return "`*`";
+static Json AggregationOperator(const Json& raw) {
+  if (raw.as_string() == "+") return Json("Agg+");
+  if (raw.as_string() == "++") return Json("Agg++");
+  if (raw.as_string() == "*") return Json("`*`");
   return raw;
 }
 
 static Json AggregationConvert(const Json& a) {
   JsonObject call;
-  call["predicate_name"] = Json(AggregationOperator(a.as_object().at("operator").as_string()));
+  call["predicate_name"] = AggregationOperator(a.as_object().at("operator"));
   JsonArray fvs;
   fvs.push_back(Json(JsonObject{{"field", Json(0)}, {"value", Json(JsonObject{{"expression", a.as_object().at("argument")}})}}));
   call["record"] = Json(JsonObject{{"field_value", Json(fvs)}});
@@ -2497,6 +2511,58 @@ static std::vector<std::string> SplitLogicapath(const char* lp) {
   return roots;
 }
 
+// Keys of strings of program text that Python gets as heritage-aware
+// strings. Strings under other keys do not carry their spans.
+static bool IsSpanTextKey(const std::string& key) {
+  return (key == "var_name" || key == "predicate_name" || key == "field" ||
+          key == "number" || key == "the_string" || key == "the_bool" ||
+          key == "the_null" || key == "symbol" || key == "except");
+}
+
+// Span of a string of program text as [idx, start_char, stop_char].
+static logica::parser::Json SpanTextToCharOffsets(const logica::parser::Json& j, logica::parser::HeritagePool& pool) {
+  const int64_t idx = pool.Intern(j.span_heritage);
+  return logica::parser::Json(logica::parser::JsonArray{
+      logica::parser::Json(idx),
+      logica::parser::Json(pool.ByteOffsetToCharOffset(idx, static_cast<int64_t>(j.span_start))),
+      logica::parser::Json(pool.ByteOffsetToCharOffset(idx, static_cast<int64_t>(j.span_stop)))});
+}
+
+// Spans are byte offsets while parsing, Python slices heritage by
+// characters, so spans of the output are converted to character offsets.
+// Strings of program text under span text keys are emitted as spans too.
+static void SpansToCharOffsets(logica::parser::Json& j, logica::parser::HeritagePool& pool) {
+  if (j.is_array()) {
+    for (logica::parser::Json& e : j.as_array()) SpansToCharOffsets(e, pool);
+    return;
+  }
+  if (!j.is_object()) return;
+  for (auto& [key, value] : j.as_object()) {
+    if ((key == "full_text" || key == "expression_heritage") && value.is_array()) {
+      logica::parser::JsonArray& a = value.as_array();
+      if (a.size() == 3 && a[0].is_int() && a[1].is_int() && a[2].is_int()) {
+        const int64_t idx = a[0].as_int();
+        a[1] = logica::parser::Json(pool.ByteOffsetToCharOffset(idx, a[1].as_int()));
+        a[2] = logica::parser::Json(pool.ByteOffsetToCharOffset(idx, a[2].as_int()));
+        continue;
+      }
+    }
+    if (IsSpanTextKey(key)) {
+      if (value.is_string() && value.span_heritage) {
+        value = SpanTextToCharOffsets(value, pool);
+        continue;
+      }
+      if (key == "except" && value.is_array()) {
+        for (logica::parser::Json& e : value.as_array()) {
+          if (e.is_string() && e.span_heritage) e = SpanTextToCharOffsets(e, pool);
+        }
+        continue;
+      }
+    }
+    SpansToCharOffsets(value, pool);
+  }
+}
+
 static char* DupToMalloc(std::string_view s) {
   char* p = static_cast<char*>(std::malloc(s.size() + 1));
   if (!p) return nullptr;
@@ -2559,8 +2625,11 @@ int logica_cpp_parse_rules_json(const char* program_text,
 // Output JSON shape:
 //   {"__string_table": [<heritage strings>], "tree": <ast or rules array>}
 //
-// In the returned tree, `full_text` and `expression_heritage` are encoded as:
-//   ["__hs", <table_index>, <start_byte>, <stop_byte>]
+// In the returned tree, `full_text` and `expression_heritage`, as well as
+// strings of program text such as names of variables, predicates and fields
+// and values of literals, are encoded as:
+//   [<table_index>, <start_char>, <stop_char>]
+// with offsets counted in characters of the heritage string.
 int logica_cpp_parse_rules_json_pooled(const char* program_text,
                                        const char* file_name,
                                        const char* logicapath,
@@ -2587,13 +2656,6 @@ int logica_cpp_parse_rules_json_pooled(const char* program_text,
 
     logica::parser::Json parsed = logica::parser::ParseFile(content, fname, import_root);
 
-    // Prepare string table.
-    logica::parser::JsonArray table;
-    table.reserve(pool.heritage.size());
-    for (const auto& e : pool.heritage) {
-      table.push_back(logica::parser::Json(e.bytes ? *(e.bytes) : std::string()));
-    }
-
     logica::parser::Json tree;
     if (full) {
       tree = parsed;
@@ -2603,6 +2665,15 @@ int logica_cpp_parse_rules_json_pooled(const char* program_text,
       tree = (it == obj.end()) ? logica::parser::Json(logica::parser::JsonArray{}) : it->second;
     }
 
+    SpansToCharOffsets(tree, pool);
+
+    // Prepare string table, spans of strings are interned just above.
+    logica::parser::JsonArray table;
+    table.reserve(pool.heritage.size());
+    for (const auto& e : pool.heritage) {
+      table.push_back(logica::parser::Json(e.bytes ? *(e.bytes) : std::string()));
+    }
+
     logica::parser::JsonObject wrapped;
     wrapped["__string_table"] = logica::parser::Json(table);
     wrapped["tree"] = tree;
@@ -2630,6 +2701,15 @@ int logica_cpp_parse_rules_json_pooled(const char* program_text,
   }
 }
 
+// Digest of the source the library was built from, empty if unknown.
+const char* logica_cpp_source_digest() {
+#ifdef LOGICA_PARSE_SOURCE_DIGEST
+  return LOGICA_PARSE_SOURCE_DIGEST;
+#else
+  return "";
+#endif
+}
+
 void logica_cpp_free(void* p) {
   std::free(p);
 }
@@ -16,10 +16,15 @@
 
 """Native (in-process) bridge to the C++ Logica parser.
 
-This module loads/builds `liblogica_parse_cpp.so` and calls the exported C ABI
-functions from `parser_cpp/logica_parse.cpp` via ctypes.
-
-When `LOGICA_PARSER=CPP`, `parser_py.parse.ParseFile` will delegate here.
+This module loads `liblogica_parse_cpp` and calls the exported C ABI
+functions from `parser_cpp/logica_parse.cpp` via ctypes. The library built
+at install time is used when it is of the shipped source, otherwise the
+library is built into the user's cache on first use.
+
+Unless `LOGICA_PARSER=PY`, `parser_py.parse.ParseFile` delegates here. With
+the default `LOGICA_PARSER=AUTO` only the library built at install time is
+used, and without it the Python parser is. With `LOGICA_PARSER=CPP` the
+library is built into the user's cache if needed.
 """
 
 from __future__ import absolute_import
@@ -31,6 +36,7 @@ import hashlib
 import json
 import os
 import subprocess
+import sysconfig
 import tempfile
 from typing import Optional, Tuple
 
@@ -40,233 +46,60 @@ _PARSE_MOD = None
 
 _LIB: Optional[ctypes.CDLL] = None
 
-# NOTE: This bridge always prefers the pooled-heritage C++ ABI when present.
-# The previous env toggles were removed to prevent accidental benchmarking or
-# correctness testing of the wrong mode.
-
-
-def _WrapHeritageAwareStrings(node, heritage_root=None, _match_state=None):
-  """Rehydrates heritage-aware strings for parity with the Python parser.
-
-  The Python parser uses `parser_py.parse.HeritageAwareString` for fields like
-  `expression_heritage` (and `full_text`) so error reporting/type inference can
-  call `.Display()` and highlight the relevant span within the *full* statement.
-
-  The C++ parser serializes these fields as plain JSON strings. We can't always
-  reconstruct exact spans (ambiguity, whitespace normalization, repeated
-  substrings), but we can do a best-effort rehydration:
+# Whether the installed C++ parser could be loaded, when LOGICA_PARSER is
+# AUTO.
+_CPP_PARSER_AVAILABLE: Optional[bool] = None
 
-  - Always wrap `full_text` into `HeritageAwareString`.
-  - Wrap `expression_heritage` into `HeritageAwareString`.
-  - If a surrounding `full_text` exists, try to locate `expression_heritage`
-    within it and set `.start/.stop/.heritage` accordingly.
+LIBRARY_NAME = 'liblogica_parse_cpp'
 
-  This keeps downstream code working and typically restores meaningful context
-  in `.Display()`.
-  """
-  if _match_state is None:
-    # Tracks matching progress for repeated substrings within the same
-    # `full_text` heritage. Keyed by (root_id, substring).
-    _match_state = {}
-
-  if isinstance(node, list):
-    return [_WrapHeritageAwareStrings(x, heritage_root, _match_state) for x in node]
-
-  if isinstance(node, dict):
-    parse_mod = _GetParseModule()
-    HeritageAwareString = getattr(parse_mod, 'HeritageAwareString', str)
-
-    def _needs_alignment(x) -> bool:
-      if not isinstance(x, HeritageAwareString):
-        return True
-      try:
-        text = str(x)
-        return (
-            getattr(x, 'heritage', text) == text and
-            getattr(x, 'start', 0) == 0 and
-            getattr(x, 'stop', len(text)) == len(text)
-        )
-      except Exception:  # pylint: disable=broad-exception-caught
-        return True
-
-    local_root = heritage_root
-    if 'full_text' in node and isinstance(node.get('full_text'), str):
-      full_text_value = node.get('full_text')
-      if not isinstance(full_text_value, HeritageAwareString):
-        full_text_value = HeritageAwareString(full_text_value)
-      local_root = full_text_value
-
-    result = {}
-    for key, value in node.items():
-      if key == 'full_text' and local_root is not None:
-        result[key] = local_root
-        continue
-
-      if key == 'expression_heritage' and isinstance(value, str):
-        # If expression_heritage is exactly the same text as the surrounding
-        # full_text, reuse the same HeritageAwareString instance. This avoids
-        # retaining multiple copies of large rule texts that JSON decoding would
-        # otherwise duplicate.
-        if local_root is not None and str(value) == str(local_root):
-          result[key] = local_root
-          continue
-
-        expr_value = value
-        if not isinstance(expr_value, HeritageAwareString):
-          expr_value = HeritageAwareString(expr_value)
-
-        if local_root is not None and _needs_alignment(expr_value):
-          heritage_text = getattr(local_root, 'heritage', str(local_root))
-          substring = str(expr_value)
-          root_id = id(local_root)
-          start_from = _match_state.get((root_id, substring), 0)
-          idx = str(heritage_text).find(substring, start_from)
-          if idx == -1 and start_from:
-            # Fallback if traversal order doesn't align with textual order.
-            idx = str(heritage_text).find(substring)
-          if idx != -1:
-            expr_value.heritage = heritage_text
-            expr_value.start = idx
-            expr_value.stop = idx + len(substring)
-            _match_state[(root_id, substring)] = idx + len(substring)
-
-        result[key] = expr_value
-        continue
-
-      result[key] = _WrapHeritageAwareStrings(value, local_root, _match_state)
-    return result
-
-  return node
+# Keys of strings of program text, emitted as spans by the C++ parser.
+SPAN_TEXT_KEYS = frozenset(['var_name', 'predicate_name', 'field', 'number',
+                            'the_string', 'the_bool', 'the_null', 'symbol'])
 
 
 def _DecodePooledHeritageOutput(node):
   """Decodes pooled-heritage JSON output from the C++ parser.
 
-  When available, the C++ shared library can emit a wrapper JSON object:
+  The C++ shared library emits a wrapper JSON object:
     {"__string_table": [...], "tree": ...}
 
   In the tree, spans are represented as:
-    ["__hs", <idx>, <start_byte>, <stop_byte>]
-
-  (Legacy format is also accepted for forward/backward compatibility:
-    {"__hs": <idx>, "start": <start_byte>, "stop": <stop_byte>})
+    [<idx>, <start_char>, <stop_char>]
 
-  This function reconstructs `parser_py.parse.HeritageAwareString` objects so
-  downstream code sees the same types as the Python parser.
+  Offsets are in characters of the heritage string, so spans are sliced
+  directly. This function reconstructs `parser_py.parse.HeritageAwareString`
+  objects so downstream code sees the same types as the Python parser. Next
+  to heritage of rules and expressions, strings of program text under
+  SPAN_TEXT_KEYS are spans, so their positions are known as well.
   """
   if not (isinstance(node, dict) and '__string_table' in node and 'tree' in node):
     return node
 
   string_table = node.get('__string_table')
   tree = node.get('tree')
-  if not isinstance(string_table, list):
-    return tree
 
   parse_mod = _GetParseModule()
   HeritageAwareString = getattr(parse_mod, 'HeritageAwareString', str)
 
-  table_len = len(string_table)
-
-  # Cache: idx -> bool (isascii). Built lazily.
-  ascii_flags = [None] * table_len
-
-  # Cache: idx -> (utf8_byte_len, byte_offset->char_offset mapping)
-  # Built lazily only for non-ascii strings.
-  byte_to_char_map = [None] * table_len
-
-  # Cache: (idx, start_off, stop_off) -> HeritageAwareString
+  # Cache: (idx, start, stop) -> HeritageAwareString
   span_cache = {}
 
-  def is_ascii(idx: int, heritage: str) -> bool:
-    v = ascii_flags[idx]
-    if v is None:
-      v = heritage.isascii()
-      ascii_flags[idx] = v
-    return bool(v)
-
-  def get_map(idx: int, heritage: str):
-    cached = byte_to_char_map[idx]
+  def decode_span(value):
+    if not (isinstance(value, list) and len(value) == 3):
+      return value
+    key = tuple(value)
+    cached = span_cache.get(key)
     if cached is not None:
       return cached
-    b = heritage.encode('utf-8')
-    mapping = [0] * (len(b) + 1)
-    chars = 0
-    for i, byt in enumerate(b):
-      # UTF-8 continuation bytes are 10xxxxxx.
-      if (byt & 0xC0) != 0x80:
-        chars += 1
-      mapping[i + 1] = chars
-    cached = (len(b), mapping)
-    byte_to_char_map[idx] = cached
-    return cached
-
-  def decode_span(idx: int, start_b: int, stop_b: int):
-    if idx < 0 or idx >= table_len:
-      return None
+    idx, start, stop = value
     heritage = string_table[idx]
-    if not isinstance(heritage, str):
-      return None
-    if start_b < 0:
-      start_b = 0
-    if stop_b < start_b:
-      stop_b = start_b
-
-    cache_key = (idx, start_b, stop_b)
-    cached = span_cache.get(cache_key)
-    if cached is not None:
-      return cached
-
-    if is_ascii(idx, heritage):
-      start_c = min(start_b, len(heritage))
-      stop_c = min(stop_b, len(heritage))
-    else:
-      blen, mapping = get_map(idx, heritage)
-      if start_b > blen:
-        start_b = blen
-      if stop_b > blen:
-        stop_b = blen
-      start_c = mapping[start_b]
-      stop_c = mapping[stop_b]
-
-    text = heritage[start_c:stop_c]
-    hs = HeritageAwareString(text)
-    try:
-      hs.heritage = heritage
-      hs.start = start_c
-      hs.stop = stop_c
-    except Exception:  # pylint: disable=broad-exception-caught
-      pass
-    span_cache[cache_key] = hs
+    hs = HeritageAwareString(heritage[start:stop])
+    hs.heritage = heritage
+    hs.start = start
+    hs.stop = stop
+    span_cache[key] = hs
     return hs
 
-  def decode_known_key_span(value):
-    # New compact encoding: [idx, start_b, stop_b].
-    if isinstance(value, list) and len(value) == 3:
-      idx, start_b, stop_b = value
-      if isinstance(idx, int) and isinstance(start_b, int) and isinstance(stop_b, int):
-        hs = decode_span(idx, start_b, stop_b)
-        if hs is not None:
-          return hs
-    # Legacy v1 encoding: ["__hs", idx, start_b, stop_b].
-    if isinstance(value, list) and len(value) == 4 and value and value[0] == '__hs':
-      idx = value[1]
-      start_b = value[2]
-      stop_b = value[3]
-      if isinstance(idx, int) and isinstance(start_b, int) and isinstance(stop_b, int):
-        hs = decode_span(idx, start_b, stop_b)
-        if hs is not None:
-          return hs
-    # Legacy dict encoding: {"__hs": idx, "start": b, "stop": b}
-    if isinstance(value, dict) and len(value) == 3 and '__hs' in value and 'start' in value and 'stop' in value:
-      idx = value.get('__hs')
-      start_b = value.get('start')
-      stop_b = value.get('stop')
-      if isinstance(idx, int) and isinstance(start_b, int) and isinstance(stop_b, int):
-        hs = decode_span(idx, start_b, stop_b)
-        if hs is not None:
-          return hs
-    return value
-
   def decode(x):
     # Mutate containers in-place to avoid allocating a fresh list/dict for every
     # node; the JSON tree returned by json.loads is not shared.
@@ -279,15 +112,14 @@ def _DecodePooledHeritageOutput(node):
     if isinstance(x, dict):
       # Decode spans only under known keys to avoid misinterpreting ordinary
       # numeric lists elsewhere in the AST.
-      if 'full_text' in x:
-        x['full_text'] = decode_known_key_span(x.get('full_text'))
-      if 'expression_heritage' in x:
-        x['expression_heritage'] = decode_known_key_span(x.get('expression_heritage'))
-
       for k, v in x.items():
         if k in ('full_text', 'expression_heritage'):
-          continue
-        if isinstance(v, (list, dict)):
+          x[k] = decode_span(v)
+        elif k == 'except' and isinstance(v, list):
+          x[k] = [decode_span(e) for e in v]
+        elif k in SPAN_TEXT_KEYS and isinstance(v, list):
+          x[k] = decode_span(v)
+        elif isinstance(v, (list, dict)):
           x[k] = decode(v)
       return x
 
@@ -321,7 +153,8 @@ def _CppParsingExceptionClass(exception_thrower=None):
     except Exception:  # pylint: disable=broad-exception-caught
       exception_thrower = Exception
 
-  class _CppParsingException(exception_thrower):
+  # Named as the exception of the Python parser, which is what users see.
+  class ParsingException(exception_thrower):
     def __init__(self, formatted_error_text: str):
       Exception.__init__(self, 'C++ parser error.')
       self._formatted_error_text = formatted_error_text or ''
@@ -332,7 +165,7 @@ def _CppParsingExceptionClass(exception_thrower=None):
       if text and not text.endswith('\n'):
         stream.write('\n')
 
-  return _CppParsingException
+  return ParsingException
 
 
 def GetParserMode() -> str:
@@ -340,23 +173,45 @@ def GetParserMode() -> str:
 
   Controlled by the `LOGICA_PARSER` environment variable.
 
-  - Unset/empty => 'PY'
-  - 'PY' or 'CPP' (case-insensitive) are accepted.
+  - Unset/empty => 'AUTO', the C++ parser if the library built at install
+    time can be loaded, otherwise the Python parser.
+  - 'AUTO', 'PY' or 'CPP' (case-insensitive) are accepted.
   - Any other value raises ValueError.
   """
   raw = os.environ.get('LOGICA_PARSER', '')
   mode = (raw or '').strip().upper()
   if not mode:
-    return 'PY'
-  if mode in ('PY', 'CPP'):
+    return 'AUTO'
+  if mode in ('AUTO', 'PY', 'CPP'):
     return mode
   raise ValueError(
-      'Unsupported LOGICA_PARSER=%r. Expected PY or CPP.' % raw
+      'Unsupported LOGICA_PARSER=%r. Expected AUTO, PY or CPP.' % raw
   )
 
 
 def UseCppParser() -> bool:
-  return GetParserMode() == 'CPP'
+  mode = GetParserMode()
+  if mode == 'AUTO':
+    return CppParserAvailable()
+  return mode == 'CPP'
+
+
+def CppParserAvailable() -> bool:
+  """Returns whether the installed C++ parser is loaded, loading it once.
+
+  The library is not built here, so that parsing never waits for the
+  compiler unless LOGICA_PARSER=CPP asks for it. Failure to load the library
+  is remembered for the process, so the Python parser is used without
+  retrying.
+  """
+  global _CPP_PARSER_AVAILABLE
+  if _CPP_PARSER_AVAILABLE is None:
+    try:
+      LoadCppParserLib(build=False)
+      _CPP_PARSER_AVAILABLE = True
+    except (RuntimeError, OSError, AttributeError):
+      _CPP_PARSER_AVAILABLE = False
+  return _CPP_PARSER_AVAILABLE
 
 
 def _RepoRoot() -> str:
@@ -386,11 +241,57 @@ def _CppParserCacheDir(repo_root: Optional[str] = None) -> str:
 def CppParserPaths(repo_root: Optional[str] = None) -> Tuple[str, str]:
   root = repo_root or _RepoRoot()
   cache_dir = _CppParserCacheDir(root)
-  so_path = os.path.join(cache_dir, 'liblogica_parse_cpp.so')
+  so_path = os.path.join(cache_dir, LIBRARY_NAME + '.so')
   src_path = os.path.join(root, 'parser_cpp', 'logica_parse.cpp')
   return so_path, src_path
 
 
+def PrebuiltLibraryPath(directory: Optional[str] = None) -> str:
+  """Returns path of the library built at install time.
+
+  The name carries the platform suffix of extension modules, so a library
+  built for another platform or interpreter is not picked up.
+  """
+  suffix = sysconfig.get_config_var('EXT_SUFFIX') or '.so'
+  return os.path.join(directory or os.path.dirname(os.path.abspath(__file__)),
+                      LIBRARY_NAME + suffix)
+
+
+def SourceDigest(src_path: str) -> str:
+  with open(src_path, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+def BuildCppParserSharedObject(src_path: str, so_path: str):
+  """Compiles the library, replacing so_path atomically."""
+  tmp_fd, tmp_so_path = tempfile.mkstemp(
+      dir=os.path.dirname(so_path),
+      prefix=os.path.basename(so_path) + '.tmp.',
+  )
+  os.close(tmp_fd)
+  try:
+    cmd = [
+        'g++',
+        '-std=c++20',
+        '-O2',
+        '-fPIC',
+        '-shared',
+        '-Wall',
+        '-Wextra',
+        '-pedantic',
+        '-DLOGICA_PARSE_LIBRARY',
+        '-DLOGICA_PARSE_SOURCE_DIGEST="%s"' % SourceDigest(src_path),
+        '-o',
+        tmp_so_path,
+        src_path,
+    ]
+    subprocess.check_call(cmd)
+    os.replace(tmp_so_path, so_path)
+  finally:
+    if os.path.exists(tmp_so_path):
+      os.remove(tmp_so_path)
+
+
 def EnsureCppParserSharedObject(repo_root: Optional[str] = None) -> str:
   so_path, src_path = CppParserPaths(repo_root)
   if not os.path.isfile(src_path):
@@ -415,33 +316,8 @@ def EnsureCppParserSharedObject(repo_root: Optional[str] = None) -> str:
     return so_path
 
   try:
-    tmp_fd, tmp_so_path = tempfile.mkstemp(
-        dir=os.path.dirname(so_path),
-        prefix=os.path.basename(so_path) + '.tmp.',
-    )
-    os.close(tmp_fd)
-    cmd = [
-        'g++',
-        '-std=c++20',
-        '-O2',
-        '-fPIC',
-        '-shared',
-        '-Wall',
-        '-Wextra',
-        '-pedantic',
-        '-DLOGICA_PARSE_LIBRARY',
-        '-o',
-        tmp_so_path,
-        src_path,
-    ]
-    subprocess.check_call(cmd)
-    os.replace(tmp_so_path, so_path)
+    BuildCppParserSharedObject(src_path, so_path)
   except Exception as e:
-    try:
-      if 'tmp_so_path' in locals() and os.path.exists(tmp_so_path):
-        os.remove(tmp_so_path)
-    except OSError:
-      pass
     raise RuntimeError(
         'Failed to build C++ parser shared library. '
         'Install g++ with C++20 support or build liblogica_parse_cpp.so manually.'
@@ -450,15 +326,42 @@ def EnsureCppParserSharedObject(repo_root: Optional[str] = None) -> str:
   return so_path
 
 
-def LoadCppParserLib(repo_root: Optional[str] = None) -> ctypes.CDLL:
+def _LoadPrebuiltLib(src_path: str) -> Optional[ctypes.CDLL]:
+  """Returns the library built at install time, if it is of this source."""
+  so_path = PrebuiltLibraryPath()
+  if not os.path.isfile(so_path):
+    return None
+  try:
+    lib = ctypes.CDLL(so_path)
+    digest_fn = lib.logica_cpp_source_digest
+  except (OSError, AttributeError):
+    return None
+  digest_fn.argtypes = []
+  digest_fn.restype = ctypes.c_char_p
+  if (os.path.isfile(src_path) and
+      digest_fn().decode('utf-8') != SourceDigest(src_path)):
+    return None
+  return lib
+
+
+def LoadCppParserLib(repo_root: Optional[str] = None,
+                     build: bool = True) -> ctypes.CDLL:
+  """Loads the library built at install time, or builds it in the cache.
+
+  With build=False only the library built at install time is loaded.
+  """
   global _LIB
   if _LIB is not None:
     return _LIB
 
-  so_path = EnsureCppParserSharedObject(repo_root)
-  lib = ctypes.CDLL(so_path)
+  _, src_path = CppParserPaths(repo_root)
+  lib = _LoadPrebuiltLib(src_path)
+  if lib is None:
+    if not build:
+      raise RuntimeError('C++ parser library was not built at install time.')
+    lib = ctypes.CDLL(EnsureCppParserSharedObject(repo_root))
 
-  lib.logica_cpp_parse_rules_json.argtypes = [
+  lib.logica_cpp_parse_rules_json_pooled.argtypes = [
       ctypes.c_char_p,  # program_text
       ctypes.c_char_p,  # file_name
       ctypes.c_char_p,  # logicapath (colon-separated)
@@ -466,19 +369,7 @@ def LoadCppParserLib(repo_root: Optional[str] = None) -> ctypes.CDLL:
       ctypes.POINTER(ctypes.c_void_p),
       ctypes.POINTER(ctypes.c_void_p),
   ]
-  lib.logica_cpp_parse_rules_json.restype = ctypes.c_int
-
-  pooled = getattr(lib, 'logica_cpp_parse_rules_json_pooled', None)
-  if pooled is not None:
-    pooled.argtypes = [
-        ctypes.c_char_p,  # program_text
-        ctypes.c_char_p,  # file_name
-        ctypes.c_char_p,  # logicapath (colon-separated)
-        ctypes.c_int,     # full
-        ctypes.POINTER(ctypes.c_void_p),
-        ctypes.POINTER(ctypes.c_void_p),
-    ]
-    pooled.restype = ctypes.c_int
+  lib.logica_cpp_parse_rules_json_pooled.restype = ctypes.c_int
 
   lib.logica_cpp_free.argtypes = [ctypes.c_void_p]
   lib.logica_cpp_free.restype = None
@@ -496,15 +387,7 @@ def ParseRulesJsonNative(program_text: str,
   out_ptr = ctypes.c_void_p()
   err_ptr = ctypes.c_void_p()
 
-  # Pooled heritage ABI is the only supported mode for the C++ parser bridge.
-  # If the symbol is missing, we likely loaded a stale/older shared library.
-  fn = getattr(lib, 'logica_cpp_parse_rules_json_pooled', None)
-  if fn is None:
-    raise RuntimeError(
-        'C++ parser shared library does not export logica_cpp_parse_rules_json_pooled. '
-        'This likely means a stale/older liblogica_parse_cpp.so is being used. '
-        'Try deleting the cache dir and re-running to rebuild.'
-    )
+  fn = lib.logica_cpp_parse_rules_json_pooled
   rc = fn(
       program_text.encode('utf-8'),
       file_name.encode('utf-8'),
@@ -543,12 +426,7 @@ def ParseRules(program_text: str,
   if rc != 0:
     raise _CppParsingExceptionClass(exception_thrower)(err)
   try:
-    loaded = json.loads(out)
-    pooled = isinstance(loaded, dict) and '__string_table' in loaded and 'tree' in loaded
-    loaded = _DecodePooledHeritageOutput(loaded)
-    if pooled:
-      return loaded
-    return _WrapHeritageAwareStrings(loaded)
+    return _DecodePooledHeritageOutput(json.loads(out))
   except Exception as e:
     raise RuntimeError('Failed to json-parse C++ parser output: %s' % e) from e
 
@@ -583,11 +461,6 @@ def ParseFile(program_text: str,
   if rc != 0:
     raise _CppParsingExceptionClass(exception_thrower)(err)
   try:
-    loaded = json.loads(out)
-    pooled = isinstance(loaded, dict) and '__string_table' in loaded and 'tree' in loaded
-    loaded = _DecodePooledHeritageOutput(loaded)
-    if pooled:
-      return loaded
-    return _WrapHeritageAwareStrings(loaded)
+    return _DecodePooledHeritageOutput(json.loads(out))
   except Exception as e:
     raise RuntimeError('Failed to json-parse C++ parser output: %s' % e) from e
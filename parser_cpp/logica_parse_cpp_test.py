@@ -0,0 +1,82 @@
+#!/usr/bin/python
+#
+# Copyright 2026 The Logica Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import unittest
+from unittest import mock
+
+from parser_cpp import logica_parse_cpp
+from parser_py import parse
+
+PROGRAM = """
+# Комментарий.
+Greeting(name: "Алиса", text: "Привет, " ++ name) :- Person(name:);
+Count(city:) += 1 :- Person(city:, name: "日本");
+Youngest(city:) Min= p.age :- Person(city:, person: p), p.name != null;
+"""
+
+
+def Spans(tree, spans, key=None):
+  if isinstance(tree, dict):
+    for k, v in tree.items():
+      Spans(v, spans, k)
+  elif isinstance(tree, list):
+    for v in tree:
+      Spans(v, spans, key)
+  elif isinstance(tree, parse.HeritageAwareString):
+    spans.append((key, str(tree), tree.start, tree.stop, tree.heritage))
+  elif isinstance(tree, str):
+    spans.append((key, tree))
+  return spans
+
+
+class LogicaParseCppTest(unittest.TestCase):
+  def testParserModeIsAutoByDefault(self):
+    with mock.patch.dict(os.environ, {'LOGICA_PARSER': ''}):
+      self.assertEqual(logica_parse_cpp.GetParserMode(), 'AUTO')
+
+  def testAutoModeDoesNotBuildTheLibrary(self):
+    def Build(*args):
+      raise AssertionError('Library must not be built.')
+    with mock.patch.dict(os.environ, {'LOGICA_PARSER': 'AUTO'}), \
+         mock.patch.object(logica_parse_cpp, '_LIB', None), \
+         mock.patch.object(logica_parse_cpp, '_CPP_PARSER_AVAILABLE', None), \
+         mock.patch.object(logica_parse_cpp, '_LoadPrebuiltLib',
+                           lambda src_path: None), \
+         mock.patch.object(logica_parse_cpp, 'EnsureCppParserSharedObject',
+                           Build):
+      self.assertFalse(logica_parse_cpp.UseCppParser())
+      self.assertEqual(parse.ParseFile('Q(1);')['rule'][0]['head'][
+          'predicate_name'], 'Q')
+
+  def testSpansOfNonAsciiProgram(self):
+    try:
+      logica_parse_cpp.LoadCppParserLib()
+    except (RuntimeError, OSError):
+      self.skipTest('C++ parser is not available.')
+    spans = {}
+    for mode in ['PY', 'CPP']:
+      with mock.patch.dict(os.environ, {'LOGICA_PARSER': mode}):
+        spans[mode] = sorted(Spans(parse.ParseFile(PROGRAM)['rule'], []))
+    self.assertEqual(spans['CPP'], spans['PY'])
+    for _, text, *span in spans['CPP']:
+      if span:
+        start, stop, heritage = span
+        self.assertEqual(heritage[start:stop], text)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compact representation of parsed Logica programs.
+
+Parser produces rules as trees of dictionaries and lists, which is what
+the compiler works on. A dictionary costs a few hundred bytes, so keeping
+parsed programs around is expensive. Compact(tree) turns each dictionary
+into an object of a class with __slots__ for its keys, lists into tuples
+and names of predicates, fields and variables into interned strings.
+Nodes have dictionary accessors, so code that only reads the tree works on
+either representation. Expand(tree) returns a fresh tree of dictionaries
+and lists for the code that mutates it.
+
+Heritage-aware strings, like full_text of rules and names that the parser
+took from the program text, are kept as they are, so that positions in the
+program remain available. Only plain strings are interned.
+
+Parser returns the compact form with parse.ParseFile(..., compact=True),
+and LogicaProgram expands it before compiling.
+"""
+
+import keyword
+import sys
+from typing import Dict, Tuple
+
+# Values of these keys are names, which repeat a lot.
+NAME_KEYS = frozenset(['predicate_name', 'field', 'var_name'])
+
+
+class Node(object):
+  """Base of compact nodes, behaving as a read-mostly dictionary.
+
+  Subclasses have a slot per key, in the order of keys of the original
+  dictionary. Keys that are not slots live in the _extra dictionary, which
+  is only allocated when such a key is assigned.
+  """
+  __slots__ = ('_extra',)
+  keys_order: Tuple[str, ...] = ()
+
+  def __getitem__(self, key):
+    if key in self.keys_order:
+      try:
+        return getattr(self, key)
+      except AttributeError:
+        raise KeyError(key)
+    extra = self._Extra()
+    if extra is not None and key in extra:
+      return extra[key]
+    raise KeyError(key)
+
+  def __setitem__(self, key, value):
+    if key in self.keys_order:
+      setattr(self, key, value)
+      return
+    if self._Extra() is None:
+      self._extra = {}
+    self._extra[key] = value
+
+  def __delitem__(self, key):
+    if key in self.keys_order and hasattr(self, key):
+      delattr(self, key)
+      return
+    extra = self._Extra()
+    if extra is None or key not in extra:
+      raise KeyError(key)
+    del extra[key]
+
+  def _Extra(self):
+    return getattr(self, '_extra', None)
+
+  def __contains__(self, key):
+    if key in self.keys_order:
+      return hasattr(self, key)
+    extra = self._Extra()
+    return extra is not None and key in extra
+
+  def __iter__(self):
+    for key in self.keys_order:
+      if hasattr(self, key):
+        yield key
+    yield from self._Extra() or ()
+
+  def __len__(self):
+    return sum(1 for _ in self)
+
+  def keys(self):
+    return list(self)
+
+  def values(self):
+    return [self[k] for k in self]
+
+  def items(self):
+    return [(k, self[k]) for k in self]
+
+  def get(self, key, default=None):
+    if key in self:
+      return self[key]
+    return default
+
+  def __eq__(self, other):
+    if isinstance(other, (Node, dict)):
+      return dict(self.items()) == dict(other.items())
+    return NotImplemented
+
+  def __repr__(self):
+    return repr(dict(self.items()))
+
+  def __reduce__(self):
+    return (MakeNode, (self.keys_order, tuple(self.items())))
+
+
+NODE_CLASSES: Dict[Tuple[str, ...], type] = {}
+
+
+def NodeClass(keys):
+  """Returns class of nodes with the given keys, creating it once."""
+  keys = tuple(keys)
+  if keys not in NODE_CLASSES:
+    NODE_CLASSES[keys] = type(
+      'Node_' + '_'.join(keys), (Node,),
+      {'__slots__': keys, 'keys_order': keys})
+  return NODE_CLASSES[keys]
+
+
+def IsSlotName(key):
+  return (isinstance(key, str) and key.isidentifier() and
+          not keyword.iskeyword(key) and not key.startswith('_') and
+          not hasattr(Node, key))
+
+
+def MakeNode(keys, items):
+  node = NodeClass(keys).__new__(NodeClass(keys))
+  for k, v in items:
+    node[k] = v
+  return node
+
+
+def Compact(tree):
+  """Returns compact version of the tree of dictionaries and lists."""
+  if isinstance(tree, dict):
+    items = [(k, CompactValue(k, v)) for k, v in tree.items()]
+    if not all(IsSlotName(k) for k, _ in items):
+      return dict(items)
+    return MakeNode(tuple(k for k, _ in items), items)
+  if isinstance(tree, list):
+    return tuple(Compact(e) for e in tree)
+  return tree
+
+
+def CompactValue(key, value):
+  # Interning a heritage-aware string would lose its position.
+  if key in NAME_KEYS and type(value) is str:
+    return sys.intern(value)
+  return Compact(value)
+
+
+def IsCompact(tree):
+  return isinstance(tree, (Node, tuple))
+
+
+def Expand(tree):
+  """Returns a new tree of dictionaries and lists, safe to mutate."""
+  if isinstance(tree, (Node, dict)):
+    return {k: Expand(v) for k, v in tree.items()}
+  if isinstance(tree, (tuple, list)):
+    return [Expand(e) for e in tree]
+  return tree
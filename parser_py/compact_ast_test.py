@@ -0,0 +1,83 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import pickle
+import unittest
+
+from compiler import universe
+from parser_py import compact_ast
+from parser_py import parse
+
+PROGRAM = """
+@Engine("sqlite");
+Parent(parent: "Alice", child: "Bob");
+Ancestor(x, y) distinct :- Parent(parent: x, child: y);
+Ancestor(x, z) distinct :- Ancestor(x, y), Ancestor(y, z);
+Count() += 1 :- Ancestor();
+"""
+
+
+class CompactAstTest(unittest.TestCase):
+  def testExpandRestoresTree(self):
+    rules = parse.ParseFile(PROGRAM)['rule']
+    compact_rules = compact_ast.Compact(copy.deepcopy(rules))
+    self.assertEqual(compact_ast.Expand(compact_rules), rules)
+    self.assertEqual(parse.DefinedPredicates(compact_rules),
+                     parse.DefinedPredicates(rules))
+    self.assertEqual(
+      pickle.loads(pickle.dumps(compact_rules)), compact_rules)
+
+  def testHeritageIsKeptAndPlainNamesAreInterned(self):
+    [rule] = parse.ParseFile(
+        'Grandparent(x, z) :- Parent(x, y), Parent(y, z);',
+        compact=True)['rule']
+    self.assertIsInstance(rule, compact_ast.Node)
+    self.assertIsInstance(rule['full_text'], parse.HeritageAwareString)
+    names = [c['predicate']['predicate_name']
+             for c in rule['body']['conjunction']['conjunct']]
+    self.assertEqual(names, ['Parent', 'Parent'])
+    self.assertIsInstance(names[1], parse.HeritageAwareString)
+    self.assertEqual(names[1].heritage[names[1].start:names[1].stop],
+                     'Parent')
+    calls = compact_ast.Compact([{'predicate_name': ''.join(['P', 'arent'])}
+                                 for _ in range(2)])
+    self.assertIs(calls[0]['predicate_name'], calls[1]['predicate_name'])
+
+  def testCompactRulesAreCompiled(self):
+    sql = universe.LogicaProgram(
+        parse.ParseFile(PROGRAM)['rule']).FormattedPredicateSql('Count')
+    compact_rules = parse.ParseFile(PROGRAM, compact=True)['rule']
+    self.assertEqual(
+        universe.LogicaProgram(compact_rules).FormattedPredicateSql('Count'),
+        sql)
+
+  def testDictionaryAccessors(self):
+    node = compact_ast.Compact({'variable': {'var_name': 'x'}})
+    self.assertIsInstance(node, compact_ast.Node)
+    self.assertEqual(node['variable']['var_name'], 'x')
+    self.assertNotIn('type', node)
+    node['type'] = {'the_type': 'Num'}
+    self.assertEqual(list(node.keys()), ['variable', 'type'])
+    self.assertEqual(node.get('type'), {'the_type': 'Num'})
+    del node['variable']
+    self.assertEqual(compact_ast.Expand(node), {'type': {'the_type': 'Num'}})
+    with self.assertRaises(KeyError):
+      node['variable']
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache of parsed imports, shared by compilations of the process.
+
+Parsing an import parses the imported file and the files it imports, which
+are all added to the parsed imports of the compilation. Which predicate
+prefixes they get depends on the imports parsed before, so results are
+kept per import and set of already parsed imports, along with path,
+modification time and hash of content of each file that was read. An
+entry is used while each of the files resolves to the same path and has
+the same content.
+
+Results are kept pickled and each use unpickles a fresh copy, which the
+compiler is free to mutate. The process keeps the MAX_PARSED_IMPORTS most
+recently used results, and fingerprints of the files they were read
+from. With LOGICA_IMPORT_CACHE_DIRECTORY set results are
+also saved to that directory for other processes.
+
+Imports are cached by the Python parser. The C++ parser, which is used by
+default when its library was built at install time, resolves imports
+itself and does not use the cache.
+"""
+
+import collections
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+# Fingerprints of files, as they were when last read.
+FILE_FINGERPRINTS = {}
+# Pickled results of parsing imports, by key, least recently used first.
+PARSED_IMPORTS = collections.OrderedDict()
+MAX_PARSED_IMPORTS = 256
+
+LOCK = threading.Lock()
+
+
+def ReadFile(file_path):
+  """Returns content of the file, remembering its fingerprint."""
+  # Stat goes first, so a change during reading makes mtime mismatch, and
+  # then the content hash is what gets compared.
+  stat = os.stat(file_path)
+  with open(file_path) as f:
+    content = f.read()
+  with LOCK:
+    FILE_FINGERPRINTS[file_path] = (
+      stat.st_mtime_ns, stat.st_size,
+      hashlib.sha256(content.encode()).hexdigest())
+  return content
+
+
+def IsFresh(file_path, fingerprint):
+  mtime_ns, size, content_hash = fingerprint
+  try:
+    stat = os.stat(file_path)
+    if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+      return True
+    with open(file_path, 'rb') as f:
+      return hashlib.sha256(f.read()).hexdigest() == content_hash
+  except OSError:
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def Version():
+  """Fingerprint of the parser, to not load results of other versions."""
+  h = hashlib.sha256(__name__.encode())
+  with open(os.path.join(os.path.dirname(__file__), 'parse.py'), 'rb') as f:
+    h.update(f.read())
+  return h.hexdigest()
+
+
+def Key(file_import_str, import_root, parsed_imports, syntax):
+  """Returns key of parsing the import in the state of the compilation."""
+  if isinstance(import_root, list):
+    import_root = tuple(import_root)
+  return repr((file_import_str, import_root, syntax,
+               sorted((name, parsed and parsed['predicates_prefix'])
+                      for name, parsed in parsed_imports.items())))
+
+
+def DiskFileName(key):
+  directory = os.environ.get('LOGICA_IMPORT_CACHE_DIRECTORY')
+  if not directory:
+    return None
+  h = hashlib.sha256((Version() + key).encode()).hexdigest()
+  return os.path.join(directory, h + '.pickle')
+
+
+def Load(key, resolve_path):
+  """Returns imports parsed for the key, or None.
+
+  Args:
+    key: Key of the import.
+    resolve_path: Function from an import to the path of its file or None,
+      to check that imports still resolve to the files that were read.
+  """
+  with LOCK:
+    entry = PARSED_IMPORTS.get(key)
+  if entry is None:
+    entry = LoadFromDisk(key)
+  if entry is None:
+    return None
+  files, pickled_imports = entry
+  for file_import_str, file_path, fingerprint in files:
+    if (resolve_path(file_import_str) != file_path or
+        not IsFresh(file_path, fingerprint)):
+      return None
+  Remember(key, entry)
+  return pickle.loads(pickled_imports)
+
+
+def Save(key, new_imports, resolve_path):
+  """Saves imports parsed for the key.
+
+  Args:
+    key: Key of the import.
+    new_imports: Dictionary from import to its parsed file, of all imports
+      that parsing of the import has added.
+    resolve_path: Function from an import to the path of its file.
+  """
+  files = []
+  for file_import_str in new_imports:
+    file_path = resolve_path(file_import_str)
+    with LOCK:
+      fingerprint = FILE_FINGERPRINTS.get(file_path)
+    if fingerprint is None:
+      return
+    files.append((file_import_str, file_path, fingerprint))
+  try:
+    entry = (files,
+             pickle.dumps(new_imports, protocol=pickle.HIGHEST_PROTOCOL))
+  except (RecursionError, pickle.PicklingError):
+    return
+  Remember(key, entry)
+  SaveToDisk(key, entry)
+
+
+def Remember(key, entry):
+  with LOCK:
+    PARSED_IMPORTS[key] = entry
+    PARSED_IMPORTS.move_to_end(key)
+    evicted_paths = set()
+    while len(PARSED_IMPORTS) > MAX_PARSED_IMPORTS:
+      _, (files, _) = PARSED_IMPORTS.popitem(last=False)
+      evicted_paths.update(file_path for _, file_path, _ in files)
+    if evicted_paths:
+      # Fingerprints are only needed to save entries, so the ones of files
+      # that no remaining entry was read from are dropped with the entries.
+      for files, _ in PARSED_IMPORTS.values():
+        evicted_paths.difference_update(file_path for _, file_path, _ in files)
+      for file_path in evicted_paths:
+        FILE_FINGERPRINTS.pop(file_path, None)
+
+
+def LoadFromDisk(key):
+  file_name = DiskFileName(key)
+  if file_name is None:
+    return None
+  try:
+    with open(file_name, 'rb') as f:
+      return pickle.load(f)
+  except (OSError, EOFError, pickle.UnpicklingError,
+          AttributeError, ImportError, IndexError):
+    return None
+
+
+def SaveToDisk(key, entry):
+  """Saves the entry atomically, failing to save is not an error."""
+  file_name = DiskFileName(key)
+  if file_name is None:
+    return
+  directory = os.path.dirname(file_name)
+  try:
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_file_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+  except OSError:
+    return
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      pickle.dump(entry, f)
+    os.replace(temporary_file_name, file_name)
+  except OSError:
+    if os.path.exists(temporary_file_name):
+      os.remove(temporary_file_name)
+
+
+def Clear():
+  with LOCK:
+    FILE_FINGERPRINTS.clear()
+    PARSED_IMPORTS.clear()
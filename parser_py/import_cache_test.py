@@ -0,0 +1,114 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from parser_py import import_cache
+from parser_py import parse
+
+FILES = {
+  'lib/util.l': 'Edge(1, 2);\nEdge(2, 3);\n',
+  'lib/closure.l': ('import lib.util.Edge;\n'
+                    'Path(x, y) distinct :- Edge(x, y);\n'
+                    'Path(x, z) distinct :- Path(x, y), Edge(y, z);\n'),
+}
+
+PROGRAM = 'import lib.closure.Path;\nQ(x) :- Path(x, 3);'
+
+
+class ImportCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    for name, content in FILES.items():
+      self.Write(name, content)
+    import_cache.Clear()
+    self.addCleanup(import_cache.Clear)
+    read_file = import_cache.ReadFile
+    self.read_files = []
+    def ReadFile(file_path):
+      self.read_files.append(os.path.relpath(file_path, self.directory.name))
+      return read_file(file_path)
+    patcher = mock.patch.object(import_cache, 'ReadFile', ReadFile)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def Write(self, name, content):
+    path = os.path.join(self.directory.name, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+      f.write(content)
+
+  def Parse(self, program=PROGRAM):
+    return parse.ParseFile(program, import_root=self.directory.name)
+
+  def testImportsAreParsedOnce(self):
+    first = self.Parse()
+    second = self.Parse()
+    self.assertEqual(second, first)
+    self.assertEqual(self.read_files, ['lib/closure.l', 'lib/util.l'])
+
+  def testCachedRulesAreCopies(self):
+    first = self.Parse()
+    for rule in first['rule']:
+      rule['head']['predicate_name'] = 'Changed'
+    second = self.Parse()
+    self.assertNotIn('Changed',
+                     [r['head']['predicate_name'] for r in second['rule']])
+    full_text = second['rule'][-1]['full_text']
+    self.assertIsInstance(full_text, parse.HeritageAwareString)
+    self.assertEqual(full_text.heritage[full_text.start:full_text.stop],
+                     full_text)
+
+  def testChangedFileIsParsedAgain(self):
+    self.Parse()
+    self.Write('lib/util.l', 'Edge(1, 2);\nEdge(2, 4);\n')
+    parsed = self.Parse()
+    self.assertEqual(self.read_files,
+                     ['lib/closure.l', 'lib/util.l',
+                      'lib/closure.l', 'lib/util.l'])
+    self.assertIn('Edge(2, 4)', [r['full_text'] for r in parsed['rule']])
+
+  def testImportsAreLoadedFromDisk(self):
+    with tempfile.TemporaryDirectory() as cache_directory:
+      with mock.patch.dict(os.environ,
+                           {'LOGICA_IMPORT_CACHE_DIRECTORY': cache_directory}):
+        first = self.Parse()
+        import_cache.Clear()
+        second = self.Parse()
+    self.assertEqual(second, first)
+    self.assertEqual(self.read_files, ['lib/closure.l', 'lib/util.l'])
+
+  def testLeastRecentlyUsedImportsAreEvicted(self):
+    with mock.patch.object(import_cache, 'MAX_PARSED_IMPORTS', 1):
+      self.Parse()
+      self.Parse()
+      self.Parse('import lib.util.Edge;\nQ(x) :- Edge(x, 3);')
+      self.assertEqual(len(import_cache.PARSED_IMPORTS), 1)
+      self.assertEqual(
+          [os.path.basename(f) for f in import_cache.FILE_FINGERPRINTS],
+          ['util.l'])
+      self.Parse()
+    self.assertEqual(self.read_files,
+                     ['lib/closure.l', 'lib/util.l', 'lib/util.l',
+                      'lib/closure.l', 'lib/util.l'])
+
+
+if __name__ == '__main__':
+  unittest.main()
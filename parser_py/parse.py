@@ -32,9 +32,13 @@ from typing import Dict, Iterator, List, Optional, Tuple
 if '.' not in __package__:
   from common import color
   from parser_cpp import logica_parse_cpp
+  from parser_py import compact_ast
+  from parser_py import import_cache
 else:
   from ..common import color
   from ..parser_cpp import logica_parse_cpp
+  from ..parser_py import compact_ast
+  from ..parser_py import import_cache
 
 CLOSE_TO_OPEN = {
     ')': '(',
@@ -1387,9 +1391,26 @@ def SplitImport(import_str):
   return ('.'.join(import_parts[:-1]), import_parts[-1], synonym)
 
 
+def ImportFileCandidates(file_import_str, import_root):
+  """Returns paths where the imported file is looked for, in order."""
+  file_import_parts = file_import_str.split('.')
+  if isinstance(import_root, str):
+    import_root = [import_root]
+  assert isinstance(import_root, list), 'import_root must be of type str or list.'
+  return [os.path.join(root, '/'.join(file_import_parts) + '.l')
+          for root in import_root]
+
+
+def FindImportFile(file_import_str, import_root):
+  """Returns path of the imported file, or None if it is not found."""
+  for file_path in ImportFileCandidates(file_import_str, import_root):
+    if os.path.exists(file_path):
+      return file_path
+  return None
+
+
 def ParseImport(file_import_str, parsed_imports, import_chain, import_root):
   """Parses an import, returns extracted rules."""
-  file_import_parts = file_import_str.split('.')
   if file_import_str in parsed_imports:
     if parsed_imports[file_import_str] is None:
       raise ParsingException(
@@ -1397,34 +1418,37 @@ def ParseImport(file_import_str, parsed_imports, import_chain, import_root):
                                                              [file_import_str]),
           HeritageAwareString(file_import_str))    
     return None
+  resolve_path = lambda f: FindImportFile(f, import_root)
+  cache_key = import_cache.Key(file_import_str, import_root, parsed_imports,
+                               TOO_MUCH)
+  cached_imports = import_cache.Load(cache_key, resolve_path)
+  if cached_imports is not None:
+    parsed_imports.update(cached_imports)
+    return parsed_imports[file_import_str]
+  previously_parsed = set(parsed_imports)
   parsed_imports[file_import_str] = None
-  if isinstance(import_root, str):
-    file_path = os.path.join(import_root, '/'.join(file_import_parts) + '.l')
-    if not os.path.exists(file_path):
-      raise ParsingException(
-          'Imported file not found: %s.' % file_path,
-          HeritageAwareString(
-              'import ' + file_import_str + '.<PREDICATE>')[7:-11])
-  else:
-    assert isinstance(import_root, list), 'import_root must be of type str or list.'
-    considered_files = []
-    for root in import_root:
-      file_path = os.path.join(root, '/'.join(file_import_parts) + '.l')
-      considered_files.append(file_path)
-      if os.path.exists(file_path):
-        break
-    else:
+  file_path = resolve_path(file_import_str)
+  if file_path is None:
+    if isinstance(import_root, str):
       raise ParsingException(
-          'Imported file not found. Considered: \n- %s.' % '\n- '.join(
-              considered_files),
+          'Imported file not found: %s.' % ImportFileCandidates(
+              file_import_str, import_root)[0],
           HeritageAwareString(
               'import ' + file_import_str + '.<PREDICATE>')[7:-11])
+    raise ParsingException(
+        'Imported file not found. Considered: \n- %s.' % '\n- '.join(
+            ImportFileCandidates(file_import_str, import_root)),
+        HeritageAwareString(
+            'import ' + file_import_str + '.<PREDICATE>')[7:-11])
 
-  with open(file_path) as f:
-    file_content = f.read()
+  file_content = import_cache.ReadFile(file_path)
   parsed_file = ParseFile(file_content, file_import_str, parsed_imports,
                           import_chain, import_root)
   parsed_imports[file_import_str] = parsed_file
+  import_cache.Save(
+      cache_key,
+      {f: p for f, p in parsed_imports.items() if f not in previously_parsed},
+      resolve_path)
   return parsed_file
 
 
@@ -1771,8 +1795,16 @@ def AnnotationsFromDenotations(rule):
 
 
 def ParseFile(s, this_file_name=None, parsed_imports=None, import_chain=None,
-              import_root=None):
-  """Parsing logica.Logica."""
+              import_root=None, compact=False):
+  """Parsing logica.Logica.
+
+  With compact=True the program is returned in the compact form, see
+  compact_ast, which takes less memory to keep and which LogicaProgram
+  compiles as well.
+  """
+  if compact:
+    return compact_ast.Compact(ParseFile(s, this_file_name, parsed_imports,
+                                         import_chain, import_root))
   if logica_parse_cpp.UseCppParser():
     return logica_parse_cpp.ParseFile(
         s,
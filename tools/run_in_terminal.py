@@ -138,7 +138,7 @@ def Run(filename, predicate_name,
 
 
   try:
-    program = universe.LogicaProgram(rules)
+    program = universe.LogicaProgram(rules, main_predicates=[predicate_name])
     engine = program.annotations.Engine()
 
     # This is needed to build the program execution.
@@ -175,7 +175,7 @@ def RunMany(filename, predicate_names,
     sys.exit(1)
 
   try:
-    program = universe.LogicaProgram(rules)
+    program = universe.LogicaProgram(rules, main_predicates=predicate_names)
     engine = program.annotations.Engine()
 
     executions = []
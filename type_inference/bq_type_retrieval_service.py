@@ -32,11 +32,12 @@ class BigQueryTypeRetrievalService(
     else:
       from . import bq_type_retriever
     bq_type_retriever = bq_type_retriever.BigQueryTypeRetriever()
-    super().__init__(parsed_rules, predicate_names, bq_type_retriever)
+    super().__init__(parsed_rules, predicate_names, bq_type_retriever,
+                     connection=project)
     self.project = project
     self.credentials = credentials
 
-  def GetColumns(self):
+  def GetColumns(self, table_names):
     from google.cloud import bigquery
 
     # it works for us even if we don't give any credentials
@@ -44,15 +45,15 @@ class BigQueryTypeRetrievalService(
                              project=self.project) 
     job_config = bigquery.QueryJobConfig(
       query_parameters=[
-        bigquery.ArrayQueryParameter("tables", "STRING", self.table_names),
+        bigquery.ArrayQueryParameter("tables", "STRING", table_names),
       ]
     )
     query = client.query('''
 SELECT table_name, JSON_OBJECT(ARRAY_AGG(column_name), ARRAY_AGG(data_type)) 
                    AS columns
 FROM logica_test.INFORMATION_SCHEMA.COLUMNS
-GROUP BY table_name
-HAVING table_name IN UNNEST(@tables);''', job_config)
+WHERE table_name IN UNNEST(@tables)
+GROUP BY table_name;''', job_config)
     data_by_table_name = query.to_dataframe().set_index('table_name')
     columns_by_table_name = data_by_table_name.to_dict()['columns'].items()
     return {table: json.loads(type)
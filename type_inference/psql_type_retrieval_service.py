@@ -30,17 +30,18 @@ class PostgresqlTypeRetrievalService(
     else:
         from . import psql_type_retriever
     psql_type_retriever = psql_type_retriever.PostgresqlTypeRetriever()
-    super().__init__(parsed_rules, predicate_names, psql_type_retriever, lower_table_name=True)
+    super().__init__(parsed_rules, predicate_names, psql_type_retriever, lower_table_name=True,
+                     connection=connection_string or '')
     self.connection_string = connection_string
-    psql_type_retriever.ExtractTypeInfo(self.connection_string)
+    psql_type_retriever.ExtractTypeInfo(self.connection_string, self.schema_cache)
 
-  def GetColumns(self):
+  def GetColumns(self, table_names):
     import psycopg2
     with psycopg2.connect(self.connection_string) as conn:
       with conn.cursor() as cursor:
         cursor.execute('''
 SELECT table_name, jsonb_object_agg(column_name, udt_name)
 FROM information_schema.columns
-GROUP BY table_name
-HAVING table_name IN %s;''', (tuple(self.table_names.values()),))
+WHERE table_name IN %s
+GROUP BY table_name;''', (tuple(table_names),))
         return {table: columns for table, columns in cursor.fetchall()}
@@ -28,10 +28,22 @@ class PostgresqlTypeRetriever(type_retriever_base.TypeRetrieverBase):
     self.built_in_types = set()
     self.user_defined_types = dict()
 
-  def ExtractTypeInfo(self, connection_string: str):
+  def ExtractTypeInfo(self, connection_string: str, schema_cache=None):
     if self.built_in_types and self.user_defined_types:
       return
 
+    if schema_cache is not None:
+      built_in_types, user_defined_types = schema_cache.GetTypes(
+        lambda: self.RetrieveTypeInfo(connection_string))
+    else:
+      built_in_types, user_defined_types = self.RetrieveTypeInfo(connection_string)
+    self.built_in_types = set(built_in_types)
+    self.user_defined_types = user_defined_types
+
+  def RetrieveTypeInfo(self, connection_string: str):
+    """Returns names of built in types and fields of user defined types."""
+    built_in_types = []
+    user_defined_types = {}
     with psycopg2.connect(connection_string) as conn:
       with conn.cursor() as cur:
         # this SQL query takes all types and returns them
@@ -64,9 +76,10 @@ GROUP BY t.typname, n.nspname;''')
 
         for type, is_built_in, fields in cur.fetchall():
           if is_built_in:
-            self.built_in_types.add(type)
+            built_in_types.append(type)
           else:
-            self.user_defined_types[type] = {field['field_name']: field['field_type'] for field in fields} if fields else {}
+            user_defined_types[type] = {field['field_name']: field['field_type'] for field in fields} if fields else {}
+    return built_in_types, user_defined_types
   
   def UnpackType(self, type: str) -> str:
     if type.startswith('_'):
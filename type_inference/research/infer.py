@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import concurrent.futures
 import hashlib
 import json
 import sys
@@ -122,6 +124,39 @@ def Walk(node, act):
         Walk(node[k], act)
 
 
+# Keys of nodes that inference acts on.
+NODE_KINDS = ['literal', 'record', 'unification', 'subscript', 'inclusion',
+              'combine', 'implication']
+
+
+def BucketNodes(root):
+  """Collects nodes in the order Walk visits them, bucketed by kind.
+
+  Bucket 'all' has every node, 'expressions' has nodes with expressions,
+  'calls' has nodes that may call predicates and a bucket of each kind has
+  nodes with the key of the kind. Acting on a bucket is equivalent to
+  walking the whole tree with an act that ignores other nodes.
+  """
+  buckets = {k: [] for k in NODE_KINDS + ['all', 'expressions', 'calls']}
+  stack = [root]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, list):
+      stack.extend(reversed(node))
+    elif isinstance(node, dict):
+      buckets['all'].append(node)
+      has_expressions = any(True for _ in ExpressionsIterator(node))
+      if has_expressions:
+        buckets['expressions'].append(node)
+      if has_expressions or 'predicate' in node or 'head' in node:
+        buckets['calls'].append(node)
+      for k in NODE_KINDS:
+        if k in node:
+          buckets[k].append(node)
+      stack.extend(reversed([v for k, v in node.items() if k != 'type']))
+  return buckets
+
+
 def ActMindingPodLiterals(node):
   for e in ExpressionsIterator(node):
     if 'literal' in e:
@@ -150,16 +185,34 @@ def ActRecallingTypes(node):
     )
 
 class TypesInferenceEngine:
-  def __init__(self, parsed_rules, dialect):
+  def __init__(self, parsed_rules, dialect, processes=1, cache=None):
     self.parsed_rules = parsed_rules
     self.predicate_argumets_types = {}
     self.dependencies = BuildDependencies(self.parsed_rules)
+    rules_of_predicate = collections.defaultdict(list)
+    for rule in self.parsed_rules:
+      rules_of_predicate[rule['head']['predicate_name']].append(rule)
+    # Within mutual recursion rules see only what is known of signatures so
+    # far, rules of a component are ordered by complexity of their
+    # predicates, as rules of the whole program used to be.
     self.complexities = BuildComplexities(self.dependencies)
-    self.parsed_rules = list(sorted(self.parsed_rules, key=lambda x: self.complexities[x['head']['predicate_name']]))
+    # Levels of components of rules, components of a level are independent.
+    self.levels = [
+      [sorted([r for p in component for r in rules_of_predicate[p]],
+              key=lambda r: self.complexities[r['head']['predicate_name']])
+       for component in level]
+      for level in BuildComponentLevels(self.dependencies)]
+    self.parsed_rules = [r
+                         for level in self.levels
+                         for component in level
+                         for r in component]
     self.predicate_signature = types_of_builtins.TypesOfBultins()
     self.typing_preamble = None
     self.collector = None
     self.dialect = dialect
+    self.processes = processes
+    # Optional signature_cache.SignatureCache.
+    self.cache = cache
 
   def CollectTypes(self):
     collector = TypeCollector(self.parsed_rules, self.dialect)
@@ -168,54 +221,108 @@ class TypesInferenceEngine:
     self.collector = collector
 
   def UpdateTypes(self, rule):
-    predicate_name = rule['head']['predicate_name']
-    if predicate_name in self.predicate_signature:
-       predicate_signature = self.predicate_signature[predicate_name]
-    else:
-      predicate_signature = {}
-      for fv in rule['head']['record']['field_value']:
-        field_name = fv['field']
-        predicate_signature[field_name] = reference_algebra.TypeReference('Any')
-      self.predicate_signature[predicate_name] = predicate_signature
-
-    for fv in rule['head']['record']['field_value']:
-      field_name = fv['field']
-      v = fv['value']
-      if 'expression' in v:
-        value = v['expression']
-      else:
-        value = v['aggregation']['expression']
-      value_type = value['type']['the_type']
-      if field_name not in predicate_signature:
-        raise TypeErrorCaughtException(
-          ContextualizedError.BuildNiceMessage(
-            rule['full_text'],
-            color.Format(
-              'Predicate {warning}%s{end} has ' % predicate_name +
-              'inconcistent rules, some include field ') +
-              color.Format('{warning}%s{end}' % field_name) + ' while others do not.'))
-      reference_algebra.Unify(
-        predicate_signature[field_name],
-        value_type)
-
-
-  def InferTypes(self):
-    for rule in self.parsed_rules:
+    UpdateSignature(self.predicate_signature, rule)
+
+  def UsedSignatures(self, components):
+    """Signatures of predicates that the components use or override."""
+    used_predicates = set(
+      d
+      for component in components
+      for rule in component
+      for d in (self.dependencies[rule['head']['predicate_name']] +
+                [rule['head']['predicate_name']]))
+    return {p: self.predicate_signature[p]
+            for p in used_predicates
+            if p in self.predicate_signature}
+
+  def ApplyComponentTypes(self, component, types_and_signatures):
+    """Assigns types inferred elsewhere to the nodes of the component."""
+    types_of_rules, signatures = types_and_signatures
+    types_of_rules = iter(types_of_rules)
+    inferences = []
+    for rule in component:
       if rule['head']['predicate_name'][0] == '@':
         continue
+      types = next(types_of_rules)
       t = TypeInferenceForRule(rule, self.predicate_signature)
-      t.PerformInference()
-      self.UpdateTypes(rule)
+      for node, node_type in zip(t.nodes['all'], types):
+        if node_type is not None:
+          node['type'] = node_type
+      inferences.append(t)
+    for rule in component:
+      p = rule['head']['predicate_name']
+      if p in signatures:
+        self.predicate_signature[p] = signatures[p]
+    return inferences
+
+  def InferLevel(self, level, pool=None):
+    """Infers types of independent components of the level.
+
+    Components found in the cache are loaded. If pool is given, the rest
+    is inferred in parallel processes, each process gets copies of
+    signatures that its components use and sends back types of all nodes
+    of the rules along with new signatures, pickled together, so that the
+    types keep referring to the signatures.
+    """
+    keys = [None] * len(level)
+    results = {}
+    if self.cache:
+      for i, component in enumerate(level):
+        keys[i] = self.cache.Key(component, self.UsedSignatures([component]))
+        if keys[i]:
+          loaded = self.cache.Load(keys[i])
+          if loaded is not None:
+            results[i] = loaded
+    remaining = [i for i in range(len(level)) if i not in results]
+    inferred = set()
+    if pool is not None and len(remaining) > 1:
+      chunks = [remaining[i::self.processes] for i in range(self.processes)]
+      jobs = []
+      for chunk in chunks:
+        if not chunk:
+          continue
+        components = [level[i] for i in chunk]
+        jobs.append((chunk, pool.submit(InferComponentsTypes, components,
+                                        self.UsedSignatures(components))))
+      for chunk, job in jobs:
+        results.update(zip(chunk, job.result()))
+      inferred = set(remaining)
+
+    # Signatures are added in the order sequential inference would add them.
+    inferences = []
+    for i, component in enumerate(level):
+      if i in results:
+        inferences.extend(self.ApplyComponentTypes(component, results[i]))
+        if i in inferred and keys[i]:
+          self.cache.Save(keys[i], results[i])
+      else:
+        component_inferences = InferComponentTypes(component,
+                                                    self.predicate_signature)
+        inferences.extend(component_inferences)
+        if keys[i]:
+          self.cache.Save(keys[i], ComponentTypes(component_inferences,
+                                                  self.predicate_signature))
+    return inferences
+
+  def InferTypes(self):
+    inferences = []
+    if self.processes > 1 and any(len(level) > 1 for level in self.levels):
+      with concurrent.futures.ProcessPoolExecutor(self.processes) as pool:
+        for level in self.levels:
+          inferences.extend(self.InferLevel(level, pool))
+    else:
+      for level in self.levels:
+        inferences.extend(self.InferLevel(level))
 
     # Resolve TypeRepr now that all predicates are typed.
-    for rule in self.parsed_rules:
-      if rule['head']['predicate_name'][0] == '@':
-        continue
-      t = TypeInferenceForRule(rule, self.predicate_signature)
-      Walk(rule, t.ActMindingTypeRepr)
+    for t in inferences:
+      t.MindTypeRepr()
 
+    for t in inferences:
+      t.ConcretizeTypes()
     for rule in self.parsed_rules:
-      Walk(rule, ConcretizeTypes)
+      if rule['head']['predicate_name'][0] == '@':
+        Walk(rule, ConcretizeTypes)
     self.CollectTypes()
 
   def ShowPredicateTypes(self):
@@ -225,6 +332,71 @@ class TypesInferenceEngine:
     return '\n'.join(result_lines)
 
 
+def UpdateSignature(signatures, rule):
+  """Unifies signature of the predicate with the head of its rule."""
+  predicate_name = rule['head']['predicate_name']
+  if predicate_name in signatures:
+    predicate_signature = signatures[predicate_name]
+  else:
+    predicate_signature = {}
+    for fv in rule['head']['record']['field_value']:
+      field_name = fv['field']
+      predicate_signature[field_name] = reference_algebra.TypeReference('Any')
+    signatures[predicate_name] = predicate_signature
+
+  for fv in rule['head']['record']['field_value']:
+    field_name = fv['field']
+    v = fv['value']
+    if 'expression' in v:
+      value = v['expression']
+    else:
+      value = v['aggregation']['expression']
+    value_type = value['type']['the_type']
+    if field_name not in predicate_signature:
+      raise TypeErrorCaughtException(
+        ContextualizedError.BuildNiceMessage(
+          rule['full_text'],
+          color.Format(
+            'Predicate {warning}%s{end} has ' % predicate_name +
+            'inconcistent rules, some include field ') +
+            color.Format('{warning}%s{end}' % field_name) + ' while others do not.'))
+    reference_algebra.Unify(
+      predicate_signature[field_name],
+      value_type)
+
+
+def ComponentTypes(inferences, signatures):
+  """Types of nodes of each rule, in the order of BucketNodes, and signatures.
+
+  Signatures are of the predicates of the rules of the inferences.
+  """
+  types_of_rules = [[node.get('type') for node in t.nodes['all']]
+                    for t in inferences]
+  defined_predicates = set(t.rule['head']['predicate_name']
+                           for t in inferences)
+  return types_of_rules, {p: signatures[p] for p in defined_predicates}
+
+
+def InferComponentsTypes(components, signatures):
+  """Infers types of components in a worker process."""
+  return [ComponentTypes(InferComponentTypes(component, signatures),
+                         signatures)
+          for component in components]
+
+
+def InferComponentTypes(component, signatures):
+  """Infers types of rules of a strongly connected component in order."""
+  inferences = []
+  for rule in component:
+    if rule['head']['predicate_name'][0] == '@':
+      continue
+    t = TypeInferenceForRule(rule, signatures)
+    t.PerformInference()
+    UpdateSignature(signatures, rule)
+    inferences.append(t)
+  return inferences
+
+
 def ConcretizeTypes(node):
   if isinstance(node, dict):
     if 'type' in node:
@@ -248,19 +420,109 @@ def BuildDependencies(rules):
   return result
 
 def BuildComplexities(dependencies):
+  """Complexity of a predicate is one plus complexities of its dependencies.
+
+  A dependency that is being computed counts as one. Iterative to not hit
+  recursion limit on deep programs.
+  """
   result = {}
-  def GetComplexity(p):
-    if p not in dependencies:
-      return 0
-    if p not in result:
-      result[p] = 1
-      result[p] = 1 + sum(GetComplexity(x) for x in dependencies[p]) 
-    return result[p]
-  for p in dependencies:
-    GetComplexity(p)
+  for start in dependencies:
+    if start in result:
+      continue
+    result[start] = 1
+    # Predicate, iterator over its dependencies and sum of their complexities.
+    work = [[start, iter(dependencies[start]), 0]]
+    while work:
+      entry = work[-1]
+      p, children = entry[0], entry[1]
+      for d in children:
+        if d not in dependencies:
+          continue
+        if d in result:
+          entry[2] += result[d]
+          continue
+        result[d] = 1
+        work.append([d, iter(dependencies[d]), 0])
+        break
+      else:
+        work.pop()
+        result[p] = 1 + entry[2]
+        if work:
+          work[-1][2] += result[p]
   return result
 
 
+def BuildComponentLevels(dependencies):
+  """Groups predicates into strongly connected components of dependencies.
+
+  Returns list of levels, each level is a list of components, each
+  component is a list of predicates. Components only depend on components
+  of earlier levels, so components of the same level are independent.
+  """
+  # Tarjan's algorithm, iterative to not hit recursion limit on deep
+  # programs. Components come out after all components they depend on,
+  # predicates within a component come deepest first.
+  index = {}
+  low = {}
+  stack = []
+  on_stack = set()
+  components = []
+  for start in dependencies:
+    if start in index:
+      continue
+    work = [(start, iter(sorted(dependencies[start])))]
+    index[start] = low[start] = len(index)
+    stack.append(start)
+    on_stack.add(start)
+    while work:
+      p, children = work[-1]
+      for d in children:
+        if d not in dependencies:
+          continue
+        if d not in index:
+          index[d] = low[d] = len(index)
+          stack.append(d)
+          on_stack.add(d)
+          work.append((d, iter(sorted(dependencies[d]))))
+          break
+        if d in on_stack:
+          low[p] = min(low[p], index[d])
+      else:
+        work.pop()
+        if work:
+          parent = work[-1][0]
+          low[parent] = min(low[parent], low[p])
+        if low[p] == index[p]:
+          component = []
+          while True:
+            q = stack.pop()
+            on_stack.remove(q)
+            component.append(q)
+            if q == p:
+              break
+          components.append(component)
+
+  order = {p: i for i, p in enumerate(dependencies)}
+  component_of = {}
+  level_of = {}
+  levels = []
+  for component in components:
+    level = 0
+    for p in component:
+      for d in dependencies[p]:
+        if d in component_of and component_of[d] is not component:
+          level = max(level, level_of[id(component_of[d])] + 1)
+    for p in component:
+      component_of[p] = component
+    level_of[id(component)] = level
+    if level == len(levels):
+      levels.append([])
+    levels[level].append(component)
+  for level in levels:
+    level.sort(key=lambda component: order[component[0]])
+  return levels
+
+
 class TypeInferenceForRule:
   def __init__(self, rule, types_of_builtins):
     self.rule = rule
@@ -268,6 +530,8 @@ class TypeInferenceForRule:
     self.type_id_counter = 0
     self.found_error = None
     self.types_of_builtins = types_of_builtins
+    # Single traversal of the rule, inference then acts on buckets of nodes.
+    self.nodes = BucketNodes(rule)
 
   def PerformInference(self):
     self.InitTypes()
@@ -289,10 +553,14 @@ class TypeInferenceForRule:
 
   def InitTypes(self):
     WalkInitializingVariables(self.rule, self.GetTypeId)
-    Walk(self.rule, self.ActInitializingTypes)
+    self.ActOn('expressions', self.ActInitializingTypes)
 
   def MindPodLiterals(self):
-    Walk(self.rule, ActMindingPodLiterals)
+    self.ActOn('expressions', ActMindingPodLiterals)
+
+  def ActOn(self, kind, act):
+    for node in self.nodes[kind]:
+      act(node)
 
   def ActMindingBuiltinFieldTypes(self, node):
     def InstillTypes(predicate_name,
@@ -388,7 +656,7 @@ class TypeInferenceForRule:
 
 
   def MindBuiltinFieldTypes(self):
-    Walk(self.rule, self.ActMindingBuiltinFieldTypes)
+    self.ActOn('calls', self.ActMindingBuiltinFieldTypes)
 
   def ActUnifying(self, node):
     if 'unification' in node:
@@ -498,15 +766,22 @@ class TypeInferenceForRule:
           e['type']['the_type'],
           copier.CopyConcreteOrReferenceType(sig[field]))
 
+  def MindTypeRepr(self):
+    self.ActOn('expressions', self.ActMindingTypeRepr)
+
+  def ConcretizeTypes(self):
+    self.ActOn('all', ConcretizeTypes)
+
   def IterateInference(self):
-    Walk(self.rule, self.ActMindingTypingPredicateLiterals)
-    Walk(self.rule, self.ActMindingRecordLiterals)
-    Walk(self.rule, self.ActUnifying)
-    Walk(self.rule, self.ActUnderstandingSubscription)
-    Walk(self.rule, self.ActMindingListLiterals)
-    Walk(self.rule, self.ActMindingInclusion)
-    Walk(self.rule, self.ActMindingCombine)
-    Walk(self.rule, self.ActMindingImplications)
+    # Order of acts matters: records are closed before they are unified.
+    self.ActOn('literal', self.ActMindingTypingPredicateLiterals)
+    self.ActOn('record', self.ActMindingRecordLiterals)
+    self.ActOn('unification', self.ActUnifying)
+    self.ActOn('subscript', self.ActUnderstandingSubscription)
+    self.ActOn('literal', self.ActMindingListLiterals)
+    self.ActOn('inclusion', self.ActMindingInclusion)
+    self.ActOn('combine', self.ActMindingCombine)
+    self.ActOn('implication', self.ActMindingImplications)
 
 def RenderPredicateSignature(predicate_name, signature):
   def FieldValue(f, v):
@@ -535,17 +810,22 @@ class TypeInferenceForStructure:
     self.collector = None
     self.quazy_rule = None
     self.dialect = dialect
+    self.inferred = False
 
   def PerformInference(self):
     quazy_rule = self.BuildQuazyRule()
     self.quazy_rule = quazy_rule
-    Walk(quazy_rule, ActRememberingTypes)
-    Walk(quazy_rule, ActClearingTypes)
+    if self.IsTypedByProgram():
+      # Whole program inference has already typed and checked all of it.
+      return
+    self.inferred = True
     inferencer = TypeInferenceForRule(quazy_rule, self.signatures)
+    inferencer.ActOn('all', ActRememberingTypes)
+    inferencer.ActOn('all', ActClearingTypes)
     inferencer.PerformInference()
-    Walk(quazy_rule, ActRecallingTypes)
+    inferencer.ActOn('all', ActRecallingTypes)
 
-    Walk(quazy_rule, ConcretizeTypes)
+    inferencer.ConcretizeTypes()
     collector = TypeCollector([quazy_rule], self.dialect)
     collector.CollectTypes()
     self.collector = collector
@@ -554,6 +834,26 @@ class TypeInferenceForStructure:
     # 
     # print('>> quazy rule:', json.dumps(quazy_rule, indent=' '))
 
+  def IsTypedByProgram(self):
+    """Tells whether all expressions of the structure came fully typed.
+
+    Expressions keep types from the whole program inference. Those that
+    injections and functions bring in have types of the rules they came
+    from, which can be generic, or no types at all. Only if every expression
+    type is fully defined there is nothing left to infer. Predicate calls of
+    the quazy body are typed by signatures and are not checked.
+    """
+    nodes = BucketNodes({k: v for k, v in self.quazy_rule.items()
+                         if k != 'quazy_body'})
+    for node in nodes['expressions']:
+      for e in ExpressionsIterator(node):
+        if 'type' not in e:
+          return False
+        t = reference_algebra.VeryConcreteType(e['type']['the_type'])
+        if not reference_algebra.IsFullyDefined(t):
+          return False
+    return True
+
   def BuildQuazyRule(self):
     result = {}
     result['quazy_body'] = self.BuildQuazyBody()
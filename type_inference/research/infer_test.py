@@ -0,0 +1,87 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from parser_py import parse
+from type_inference.research import infer
+
+# Cycle A -> B -> D -> F -> A and A -> C -> E -> F, with dependents.
+PROGRAM = """
+A(x) :- B(x), C(x);
+B(x) :- D(x);
+C(x) :- E(x);
+D(x) :- F(x);
+E(x) :- F(x);
+F(x) :- G(x);
+G(x) :- x == "g";
+F(x) :- A(x);
+J(x) :- C(x);
+N(x) :- x == 1;
+M(x, y) :- J(x), N(y);
+"""
+
+
+def InferTypes(processes=1):
+  rules = parse.ParseFile(PROGRAM)['rule']
+  engine = infer.TypesInferenceEngine(rules, dialect='psql',
+                                      processes=processes)
+  engine.InferTypes()
+  return rules, engine
+
+
+class ComponentLevelsTest(unittest.TestCase):
+  def testComponentsAreLevelledByDependencies(self):
+    levels = infer.BuildComponentLevels({
+        'A': ['B'], 'B': ['A', 'C'], 'C': [], 'D': ['C'], 'E': ['B', 'D'],
+        'F': ['Builtin']})
+    self.assertEqual([[sorted(c) for c in level] for level in levels],
+                     [[['C'], ['F']], [['A', 'B'], ['D']], [['E']]])
+
+  def testDeepProgramsDoNotRecurse(self):
+    depth = 20000
+    dependencies = {'P%d' % i: ['P%d' % (i + 1)] for i in range(depth)}
+    dependencies['P%d' % depth] = ['P0']
+    [[component]] = infer.BuildComponentLevels(dependencies)
+    self.assertEqual(len(component), depth + 1)
+    complexities = infer.BuildComplexities(dependencies)
+    self.assertEqual(complexities['P0'], depth + 2)
+
+  def testComplexitiesCountDependencies(self):
+    self.assertEqual(
+        infer.BuildComplexities({'A': ['B', 'C'], 'B': ['C'], 'C': ['A'],
+                                 'D': ['A', 'Builtin']}),
+        {'A': 6, 'B': 3, 'C': 2, 'D': 7})
+
+
+class TypesInferenceEngineTest(unittest.TestCase):
+  def testRecursiveComponentIsInferredInOrderOfComplexity(self):
+    _, engine = InferTypes()
+    signatures = engine.ShowPredicateTypes()
+    for p in 'ABCDEFGJ':
+      self.assertIn('type %s(Str);' % p, signatures)
+    self.assertIn('type M(Str, Num);', signatures)
+
+  def testProcessPoolInfersTypesOfSequentialInference(self):
+    rules, engine = InferTypes()
+    pooled_rules, pooled_engine = InferTypes(processes=2)
+    self.assertEqual(pooled_engine.ShowPredicateTypes(),
+                     engine.ShowPredicateTypes())
+    self.assertEqual(pooled_rules, rules)
+
+
+if __name__ == '__main__':
+  unittest.main()
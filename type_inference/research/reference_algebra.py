@@ -83,17 +83,31 @@ class BadType(tuple):
     return str(self)
 
 class TypeReference:
+  """Node of union-find forest of types.
+
+  Target of a root reference is the type, target of any other reference is
+  its parent. Find compresses paths and Link unites by rank, so chains of
+  references stay short no matter how many times types are unified.
+  """
   def __init__(self, target):
     self.target = target
+    self.rank = 0
   
   def WeMustGoDeeper(self):
     return isinstance(self.target, TypeReference)
 
+  def Find(self):
+    """Returns the root reference, pointing the path straight to it."""
+    root = self
+    while root.WeMustGoDeeper():
+      root = root.target
+    node = self
+    while node is not root:
+      node.target, node = root, node.target
+    return root
+
   def Target(self):
-    result = self
-    while result.WeMustGoDeeper():
-      result = result.target
-    return result.target
+    return self.Find().target
 
   def TargetTypeClassName(self):
     target = self.Target()
@@ -115,9 +129,7 @@ class TypeReference:
     return str(self)
   
   def CloseRecord(self):
-    a = self
-    while a.WeMustGoDeeper():
-      a = a.target
+    a = self.Find()
     if isinstance(a.target, BadType):
       return
     assert isinstance(a.target, dict), a.target
@@ -225,18 +237,25 @@ def Incompatible(a, b):
   return BadType((a, b))
 
 
+def Link(a, b):
+  """Makes root a refer to root b, so they have the type of b.
+
+  Union by rank: if a is the taller tree, then a takes the type of b and
+  b refers to a instead.
+  """
+  if a.rank > b.rank:
+    a.target = b.target
+    b.target = a
+    return
+  if a.rank == b.rank:
+    b.rank += 1
+  a.target = b
+
+
 def Unify(a, b):
   """Unifies type reference a with type reference b."""
-  original_a = a
-  original_b = b
-  while a.WeMustGoDeeper():
-    a = a.target
-  while b.WeMustGoDeeper():
-    b = b.target
-  if original_a != a:
-    original_a.target = a
-  if original_b != b:
-    original_b.target = b
+  a = a.Find()
+  b = b.Find()
   if id(a) == id(b):
     return
   assert isinstance(a, TypeReference)
@@ -252,7 +271,7 @@ def Unify(a, b):
     concrete_a, concrete_b = concrete_b, concrete_a
 
   if concrete_a == 'Any':
-    a.target = b
+    Link(a, b)
     return
   
   if concrete_a == 'Singular':
@@ -262,15 +281,15 @@ def Unify(a, b):
           Incompatible(b.target, a.target))
       return
     if concrete_b == 'Sequential':
-      a.target = b
       b.target = 'Str'
+      Link(a, b)
       return
-    a.target = b
+    Link(a, b)
     return
 
   if concrete_a == 'Sequential':
     if concrete_b in ('Str', 'Sequential') or isinstance(concrete_b, list):
-      a.target = b
+      Link(a, b)
       return
     # Type error: a is incompatible with b.
     a.target, b.target = (
@@ -349,8 +368,12 @@ def UnifyFriendlyRecords(a, b, record_type):
       a.target = Incompatible(a, b)
       b.target = Incompatible(b, a)
     result[f] = x
-  a.target = TypeReference(record_type(result))
-  b.target = a.target
+  a.target = record_type(result)
+  if b.WeMustGoDeeper():
+    # Unifying fields of recursive records could have linked b somewhere.
+    b.target = a
+  else:
+    Link(b, a)
 
 
 def UnifyListElement(a_list, b_element):
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent cache of inferred types.
+
+Types of a strongly connected component of predicates depend only on its
+rules and on signatures of the predicates it uses. Types of components are
+stored in a directory keyed by exactly that, so later compilations load
+types of imported files and of the library of the dialect instead of
+inferring them again, and infer only what has changed.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+if '.' not in __package__:
+  from type_inference.research import reference_algebra
+else:
+  from ..research import reference_algebra
+
+
+def RenderSharedType(t, numbering):
+  """Renders type keeping track of which references are the same.
+
+  Signatures whose fields share a reference make inference of their users
+  different from signatures with equal, but separate types.
+  """
+  if isinstance(t, reference_algebra.TypeReference):
+    root = t.Find()
+    if id(root) in numbering:
+      return '#%d' % numbering[id(root)]
+    numbering[id(root)] = len(numbering)
+    return '#%d=%s' % (numbering[id(root)],
+                       RenderSharedType(root.target, numbering))
+  if isinstance(t, str):
+    return t
+  if isinstance(t, list):
+    return '[%s]' % ', '.join(RenderSharedType(e, numbering) for e in t)
+  if isinstance(t, reference_algebra.BadType):
+    return '(%s != %s)' % tuple(RenderSharedType(e, numbering) for e in t)
+  if isinstance(t, dict):
+    return '%s{%s}' % (
+      type(t).__name__,
+      ', '.join('%s: %s' % (k, RenderSharedType(v, numbering))
+                for k, v in sorted(t.items(),
+                                   key=reference_algebra.StrIntKey)))
+  assert False, type(t)
+
+
+def RenderSignature(signature):
+  numbering = {}
+  return '(%s)' % ', '.join(
+    '%s: %s' % (f, RenderSharedType(v, numbering))
+    for f, v in sorted(signature.items(), key=reference_algebra.StrIntKey))
+
+
+def InferenceVersion():
+  """Fingerprint of the code of type inference, to not load stale types."""
+  h = hashlib.sha256()
+  for module in ['infer', 'reference_algebra', 'types_of_builtins']:
+    with open(os.path.join(os.path.dirname(__file__),
+                           module + '.py'), 'rb') as f:
+      h.update(f.read())
+  return h.hexdigest()
+
+
+class SignatureCache:
+  """Directory with types of components of programs."""
+
+  def __init__(self, directory):
+    self.directory = directory
+    self.version = InferenceVersion()
+
+  def Key(self, component, signatures):
+    """Returns key of the component, or None if it is not to be cached.
+
+    Args:
+      component: Rules of the component.
+      signatures: Signatures of predicates the component uses, which
+        includes builtin predicates that its rules override.
+    """
+    if all(rule['head']['predicate_name'][0] == '@' for rule in component):
+      return None
+    h = hashlib.sha256()
+    h.update(self.version.encode())
+    # Rules are hashed as they are passed to inference, i.e. after flags are
+    # substituted and functors are made.
+    h.update(json.dumps(component, sort_keys=True, default=str).encode())
+    for p in sorted(signatures):
+      h.update(('%s%s;' % (p, RenderSignature(signatures[p]))).encode())
+    return h.hexdigest()
+
+  def FileName(self, key):
+    return os.path.join(self.directory, key + '.pickle')
+
+  def Load(self, key):
+    """Returns types and signatures saved for the key, or None."""
+    try:
+      with open(self.FileName(key), 'rb') as f:
+        return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError,
+            AttributeError, ImportError, IndexError):
+      return None
+
+  def Save(self, key, types_and_signatures):
+    """Saves types and signatures, atomically for concurrent compilations.
+
+    Failing to save is not an error, types are inferred again next time.
+    """
+    try:
+      os.makedirs(self.directory, exist_ok=True)
+      fd, temporary_file_name = tempfile.mkstemp(dir=self.directory,
+                                                 suffix='.tmp')
+    except OSError:
+      return
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump(types_and_signatures, f)
+      os.replace(temporary_file_name, self.FileName(key))
+    except (OSError, RecursionError, pickle.PicklingError):
+      if os.path.exists(temporary_file_name):
+        os.remove(temporary_file_name)
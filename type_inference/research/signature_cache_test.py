@@ -0,0 +1,75 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from parser_py import parse
+from type_inference.research import infer
+from type_inference.research import reference_algebra
+from type_inference.research import signature_cache
+
+PROGRAM = """
+Person(name: "Alice", age: 30);
+Older(name:, age: age + 1, tags: ["older"]) :- Person(name:, age:);
+Anc(a, b) distinct :- Older(name: a), Older(name: b);
+Anc(a, c) distinct :- Anc(a, b), Anc(b, c);
+"""
+
+
+def InferTypes(cache):
+  rules = parse.ParseFile(PROGRAM)['rule']
+  engine = infer.TypesInferenceEngine(rules, dialect='psql', cache=cache)
+  engine.InferTypes()
+  return rules, engine.ShowPredicateTypes()
+
+
+class SignatureCacheTest(unittest.TestCase):
+  def testLoadedTypesAreInferredTypes(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = signature_cache.SignatureCache(directory)
+      _, inferred_signatures = InferTypes(cache)
+      self.assertEqual(len(os.listdir(directory)), 3)
+      loaded = []
+      load = cache.Load
+      def Load(key):
+        loaded.append(key)
+        return load(key)
+      cache.Load = Load
+      rules, loaded_signatures = InferTypes(cache)
+      self.assertEqual(len(loaded), 3)
+      self.assertEqual(loaded_signatures, inferred_signatures)
+      self.assertEqual(
+        rules, InferTypes(None)[0])
+
+  def testKeyDependsOnSignatures(self):
+    cache = signature_cache.SignatureCache(tempfile.gettempdir())
+    [rule] = [r for r in parse.ParseFile(PROGRAM)['rule']
+              if r['head']['predicate_name'] == 'Older']
+    x = reference_algebra.TypeReference('Num')
+    y = reference_algebra.TypeReference('Num')
+    keys = set(
+      cache.Key([rule], {'Person': signature})
+      for signature in [{'name': 'Str', 'age': x},
+                        {'name': 'Str', 'age': 'Str'},
+                        {'name': x, 'age': x},
+                        {'name': x, 'age': y}])
+    self.assertEqual(len(keys), 4)
+
+
+if __name__ == '__main__':
+  unittest.main()
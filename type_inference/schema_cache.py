@@ -0,0 +1,133 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Logica Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local cache of schemas retrieved from databases.
+
+Columns are kept per connection and table, catalog of types per
+connection, each for LOGICA_SCHEMA_CACHE_TTL seconds. The cache is off
+unless the TTL is set, as schemas changed within the TTL are served stale.
+Cache lives in LOGICA_SCHEMA_CACHE_DIRECTORY, or in logica/schema of the
+user's cache directory.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterable
+
+DEFAULT_TTL_SECONDS = 0
+
+
+def DefaultDirectory() -> str:
+  directory = os.environ.get('LOGICA_SCHEMA_CACHE_DIRECTORY')
+  if directory:
+    return directory
+  xdg_cache = os.environ.get('XDG_CACHE_HOME')
+  if xdg_cache:
+    return os.path.join(os.path.expanduser(xdg_cache), 'logica', 'schema')
+  home = os.path.expanduser('~')
+  if home and home != '~':
+    return os.path.join(home, '.cache', 'logica', 'schema')
+  return os.path.join(tempfile.gettempdir(), 'logica_cache', 'schema')
+
+
+def DefaultTtl() -> float:
+  return float(os.environ.get('LOGICA_SCHEMA_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+
+class SchemaCache:
+  """Columns of tables and catalog of types of a connection."""
+  def __init__(self, connection: str, directory: str = None, ttl: float = None):
+    self.directory = directory or DefaultDirectory()
+    self.ttl = DefaultTtl() if ttl is None else ttl
+    # Connection strings may hold passwords, so only the hash is stored.
+    self.file_name = os.path.join(
+      self.directory,
+      hashlib.sha256(connection.encode()).hexdigest()[:32] + '.json')
+
+  def Load(self) -> dict:
+    try:
+      with open(self.file_name) as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+
+  def Save(self, content: dict):
+    """Saves the cache atomically, failing to save is not an error."""
+    try:
+      os.makedirs(self.directory, exist_ok=True)
+      fd, temporary_file_name = tempfile.mkstemp(dir=self.directory,
+                                                 suffix='.tmp')
+    except OSError:
+      return
+    try:
+      with os.fdopen(fd, 'w') as f:
+        json.dump(content, f)
+      os.replace(temporary_file_name, self.file_name)
+    except OSError:
+      if os.path.exists(temporary_file_name):
+        os.remove(temporary_file_name)
+
+  def IsFresh(self, entry) -> bool:
+    return entry is not None and time.time() - entry['time'] < self.ttl
+
+  def GetColumns(self, tables: Iterable[str],
+                 retrieve: Callable[[list], Dict[str, dict]]) -> Dict[str, dict]:
+    """Returns columns of the tables, retrieving missing ones in one call.
+
+    Args:
+      tables: Names of the tables.
+      retrieve: Function from a list of names of tables to a dictionary
+        from table name to its columns.
+    """
+    if self.ttl <= 0:
+      return retrieve(sorted(set(tables)))
+    content = self.Load()
+    cached_tables = content.get('tables', {})
+    result = {}
+    missing = []
+    for table in sorted(set(tables)):
+      entry = cached_tables.get(table)
+      if self.IsFresh(entry):
+        result[table] = entry['columns']
+      else:
+        missing.append(table)
+    if missing:
+      retrieved = retrieve(missing)
+      result.update(retrieved)
+      # Reloading in case another process saved the cache meanwhile.
+      content = self.Load()
+      content.setdefault('tables', {})
+      now = time.time()
+      for table, columns in retrieved.items():
+        content['tables'][table] = {'time': now, 'columns': columns}
+      self.Save(content)
+    return result
+
+  def GetTypes(self, retrieve: Callable[[], object]):
+    """Returns catalog of types of the connection, retrieving if stale."""
+    if self.ttl <= 0:
+      return retrieve()
+    entry = self.Load().get('types')
+    if self.IsFresh(entry):
+      return entry['types']
+    types = retrieve()
+    content = self.Load()
+    content['types'] = {'time': time.time(), 'types': types}
+    self.Save(content)
+    return types
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+#
+# Copyright 2026 Logica Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from type_inference.schema_cache import SchemaCache
+
+COLUMNS = {
+  'person': {'name': 'text', 'age': 'int4'},
+  'city': {'name': 'text'},
+  'road': {'length': 'float8'},
+}
+
+
+class TestSchemaCache(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.requests = []
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def retrieve(self, tables):
+    self.requests.append(tables)
+    return {t: COLUMNS[t] for t in tables if t in COLUMNS}
+
+  def cache(self, connection='db', ttl=600):
+    return SchemaCache(connection, self.directory.name, ttl)
+
+  def test_when_retrieved_only_missing_tables(self):
+    self.cache().GetColumns(['person', 'city'], self.retrieve)
+    columns = self.cache().GetColumns(['person', 'road', 'city'], self.retrieve)
+
+    self.assertEqual(columns, COLUMNS)
+    self.assertEqual(self.requests, [['city', 'person'], ['road']])
+
+  def test_when_expired(self):
+    self.cache(ttl=0).GetColumns(['person'], self.retrieve)
+    self.cache(ttl=0).GetColumns(['person'], self.retrieve)
+
+    self.assertEqual(self.requests, [['person'], ['person']])
+
+  def test_when_ttl_is_not_set(self):
+    with mock.patch.dict(os.environ, {}, clear=True):
+      cache = SchemaCache('db', self.directory.name)
+    cache.GetColumns(['person'], self.retrieve)
+    cache.GetColumns(['person'], self.retrieve)
+
+    self.assertEqual(self.requests, [['person'], ['person']])
+    self.assertEqual(os.listdir(self.directory.name), [])
+
+  def test_when_other_connection(self):
+    self.cache('db').GetColumns(['person'], self.retrieve)
+    self.cache('other_db').GetColumns(['person'], self.retrieve)
+
+    self.assertEqual(self.requests, [['person'], ['person']])
+
+  def test_when_table_does_not_exist(self):
+    self.cache().GetColumns(['lake'], self.retrieve)
+    columns = self.cache().GetColumns(['lake'], self.retrieve)
+
+    self.assertEqual(columns, {})
+    self.assertEqual(self.requests, [['lake'], ['lake']])
+
+  def test_when_types_cached(self):
+    self.cache().GetTypes(lambda: [['int4'], {'point': {'x': 'int4'}}])
+    types = self.cache().GetTypes(lambda: self.fail('Retrieved again.'))
+
+    self.assertEqual(types, [['int4'], {'point': {'x': 'int4'}}])
+
+
+if __name__ == '__main__':
+  unittest.main()
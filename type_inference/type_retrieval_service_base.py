@@ -19,8 +19,10 @@ from typing import Dict
 
 if '.' not in __package__:
   from type_inference import bad_schema_exception
+  from type_inference import schema_cache
 else:
   from ..type_inference import bad_schema_exception
+  from ..type_inference import schema_cache
 
 
 def ValidateRuleAndGetTableName(rule: dict, lower_table_name: bool = False) -> str:
@@ -51,12 +53,15 @@ def ValidateRuleAndGetTableName(rule: dict, lower_table_name: bool = False) -> s
 
 class TypeRetrievalServiceBase(abc.ABC):
   """The class is an abstract base class for specific engine type retrieval services."""
-  def __init__(self, parsed_rules, predicate_names, type_retriever, lower_table_name=False):
+  def __init__(self, parsed_rules, predicate_names, type_retriever, lower_table_name=False,
+               connection=''):
     predicate_names_as_set = set(predicate_names)
     self.parsed_rules = [r for r in parsed_rules 
                          if r['head']['predicate_name'] in predicate_names_as_set]
     self.table_names = self.ValidateParsedRulesAndGetTableNames(lower_table_name)
     self.type_retriever = type_retriever
+    self.schema_cache = schema_cache.SchemaCache(
+      type(self).__name__ + ':' + connection)
 
   def ValidateParsedRulesAndGetTableNames(self, lower_table_name) -> Dict[str, str]:
     return {rule['head']['predicate_name']: ValidateRuleAndGetTableName(rule, lower_table_name) 
@@ -65,7 +70,8 @@ class TypeRetrievalServiceBase(abc.ABC):
   def RetrieveTypes(self, filename):
     filename = filename.replace('.l', '_schema.l')
 
-    columns = self.GetColumns()
+    columns = self.schema_cache.GetColumns(self.table_names.values(),
+                                           self.GetColumns)
 
     resulting_rule_lines = []
 
@@ -82,8 +88,9 @@ class TypeRetrievalServiceBase(abc.ABC):
       file.writelines('\n'.join(resulting_rule_lines))
 
   @abc.abstractmethod
-  def GetColumns(self):
+  def GetColumns(self, table_names):
     """
-    For each table this method returns json object 
-    where keys are names of columns in that table and values are corresponding types
+    For each of given tables this method returns json object 
+    where keys are names of columns in that table and values are corresponding types.
+    Columns of all tables are retrieved with a single query.
     """